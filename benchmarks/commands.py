@@ -0,0 +1,251 @@
+"""
+Offline microbenchmarks for the cog command handlers. Each handler is
+called directly with a fake Context against a throwaway database seeded
+with synthetic users, shop items and inventories, and timed over many
+iterations. Iterations rotate through the seeded users, so commands
+with cooldowns exercise both the award and the rejection path.
+
+Allocations are measured in a separate, shorter tracemalloc pass:
+`peak KiB` is the most memory held above the starting point during
+the pass and `kept B/op` is what was still held afterwards per call.
+
+Commands that need the network or a voice connection (play,
+discordstatus, ufc, translate) are not included.
+
+`--log` picks how the INFO lines commands write are handled: `off`
+(not emitted), `sync` (a plain FileHandler on the calling thread, as
+bot.py used to do) or `queue` (the background-thread pipeline in
+utils/logs.py). Compare runs to see what logging costs per command.
+
+Usage: python -m benchmarks.commands [--users N] [--items N] [--iterations N]
+           [--only points,shop] [--log off|sync|queue] [--output FILE] [--compare FILE]
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import logging
+import datetime
+import tracemalloc
+from collections import deque
+
+import utils
+from benchmarks.common import (temp_db_path, seed_database, percentile, git_revision,
+                               FakeGuild, FakeMember, FakeContext)
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def build_cases(cogs: dict, shop_item: str) -> dict:
+    """
+    Returns name: run(ctx) for every benchmarked command. Each run
+    awaits the undecorated handler with fixed arguments.
+    """
+    battlepass, shop, music, misc, basics = (cogs[name] for name in ('battlepass', 'shop', 'music', 'misc', 'basics'))
+
+    def case(cog, command, *args, **kwargs):
+        return lambda ctx: command.callback(cog, ctx, *args, **kwargs)
+
+    return {
+        'register': case(battlepass, battlepass.register),
+        'points': case(battlepass, battlepass.points),
+        'daily': case(battlepass, battlepass.daily),
+        'tierup': case(battlepass, battlepass.tierup),
+        'battlepass': case(battlepass, battlepass.battlepass),
+        'battlepass <user>': case(battlepass, battlepass.battlepass, 'user1'),
+        'top5': case(battlepass, battlepass.top5),
+        'top': case(battlepass, battlepass.top, 25),
+        'rank': case(battlepass, battlepass.rank),
+        'shop': case(shop, shop.shop),
+        'inventory': case(shop, shop.inventory),
+        'inventory <user>': case(shop, shop.inventory, 'user1'),
+        'buy': case(shop, shop.buy, item_name=shop_item),
+        'submissions': case(shop, shop.submissions),
+        'submit_item': case(shop, shop.submit_item, args='Bench Item, Rare'),
+        'queue': case(music, music.queue),
+        'skip': case(music, music.skip),
+        'pause': case(music, music.pause),
+        'resume': case(music, music.resume),
+        'stop': case(music, music.stop),
+        'help': case(misc, misc.help),
+        'help <command>': case(misc, misc.help, 'points'),
+        'game': case(misc, misc.game, args='Halo, Rocket League, Minecraft'),
+        'elijah': case(misc, misc.elijah),
+        'mark': case(misc, misc.mark),
+        'updates': case(misc, misc.updates),
+        'hello': case(basics, basics.hello),
+        'age': case(basics, basics.age),
+    }
+
+
+async def time_case(run, members: list, iterations: int) -> dict:
+    """
+    Times `iterations` calls after a short warm-up.
+    """
+    for i in range(min(50, iterations // 10)):
+        await run(FakeContext(members[i % len(members)]))
+
+    durations = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        ctx = FakeContext(members[i % len(members)])
+        call_start = time.perf_counter()
+        await run(ctx)
+        durations.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+
+    durations.sort()
+    return {
+        'iterations': iterations,
+        'ops_per_sec': iterations / elapsed,
+        'mean_us': sum(durations) / iterations * 1e6,
+        'p50_us': percentile(durations, 0.50) * 1e6,
+        'p99_us': percentile(durations, 0.99) * 1e6,
+    }
+
+
+async def measure_allocations(run, members: list, iterations: int) -> dict:
+    """
+    Runs the handler under tracemalloc and reports memory use.
+    """
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        for i in range(iterations):
+            await run(FakeContext(members[i % len(members)]))
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'peak_kib': (peak - baseline) / 1024,
+        'kept_bytes_per_op': (current - baseline) / iterations,
+    }
+
+
+async def run_suite(args) -> dict:
+    """
+    Builds the cogs against a seeded database and times every command.
+    """
+    from cogs.basics import BasicsCog
+    from cogs.battlepass import BattlepassCog
+    from cogs.misc import MiscCog
+    from cogs.music import MusicCog
+    from cogs import shop as shop_cog
+
+    db_file = temp_db_path('commands.db')
+    seed_database(db_file, users=args.users, items=args.items)
+    utils.configure_database(db_file)
+    await utils.run_migrations()
+    await utils.load_leaderboards()
+    await utils.load_cooldowns()
+
+    guild = FakeGuild(0)
+    rng = random.Random(0)
+    members = [FakeMember(user_id, guild) for user_id in rng.sample(range(1, args.users + 1), min(args.users, 1000))]
+
+    cogs = {
+        'battlepass': BattlepassCog(None),
+        'shop': shop_cog.ShopCog(None),
+        'music': MusicCog(None),
+        'misc': MiscCog(None),
+        'basics': BasicsCog(None),
+    }
+    # Pick the rotation now instead of waiting for the task loop
+    shop_cog.refresh_shop.cancel()
+    await shop_cog.refresh_shop()
+    shop_items, _ = await utils.get_state().get_shop()
+
+    cogs['music'].SONG_QUEUES[str(guild.id)] = deque(
+        {'title': f'Song {i}', 'requester': 'user1'} for i in range(10)
+        )
+
+    cases = build_cases(cogs, next(iter(shop_items)))
+    if args.only:
+        cases = {name: run for name, run in cases.items() if name.split()[0] in args.only.split(',')}
+
+    results = {}
+    for name, run in cases.items():
+        result = await time_case(run, members, args.iterations)
+        result.update(await measure_allocations(run, members, max(1, args.iterations // 10)))
+        results[name] = result
+        print(f'{name:<20} {result["ops_per_sec"]:>10.0f} {result["mean_us"]:>10.1f} {result["p99_us"]:>10.1f}'
+              f' {result["peak_kib"]:>10.1f} {result["kept_bytes_per_op"]:>10.0f}')
+
+    return results
+
+
+def configure_logging(mode: str) -> None:
+    """
+    Sends INFO logs to a throwaway file the way `mode` says.
+    """
+    if mode == 'off':
+        return
+
+    path = temp_db_path('bot.log')
+    if mode == 'sync':
+        handler = logging.FileHandler(path)
+        handler.setFormatter(utils.logs.make_formatter('text'))
+        logging.getLogger().addHandler(handler)
+        logging.getLogger().setLevel(logging.INFO)
+    else:
+        utils.configure_logging(path, console=False)
+
+
+def compare(results: dict, previous_file: str) -> None:
+    """
+    Prints the change in throughput against an earlier results file.
+    """
+    with open(previous_file) as f:
+        previous = json.load(f)['results']
+
+    print(f'\nvs. {previous_file}')
+    for name, result in results.items():
+        if name in previous:
+            ratio = result['ops_per_sec'] / previous[name]['ops_per_sec']
+            print(f'{name:<20} {ratio:>8.2f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--items', type=int, default=500)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--only', help='comma separated command names')
+    parser.add_argument('--log', choices=('off', 'sync', 'queue'), default='off', help='how INFO logs are written')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/commands-<time>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    args = parser.parse_args()
+
+    configure_logging(args.log)
+    print(f'{"command":<20} {"ops/s":>10} {"mean us":>10} {"p99 us":>10} {"peak KiB":>10} {"kept B/op":>10}')
+    results = asyncio.run(run_suite(args))
+    utils.shutdown_db_worker()
+    utils.stop_logging()
+
+    started = datetime.datetime.now()
+    output = args.output or os.path.join(RESULTS_DIR, f'commands-{started:%Y%m%d-%H%M%S}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'revision': git_revision(),
+            'time': started.isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'users': args.users,
+            'items': args.items,
+            'iterations': args.iterations,
+            'logging': args.log,
+            'results': results,
+        }, f, indent=2)
+    print(f'\nSaved results to {output}')
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
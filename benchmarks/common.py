@@ -0,0 +1,127 @@
+"""
+Helpers shared by the benchmark scripts.
+"""
+import os
+import random
+import asyncio
+import sqlite3
+import datetime
+import tempfile
+import subprocess
+
+import utils
+
+
+RARITIES = ['Legendary', 'Very Rare', 'Rare', 'Uncommon', 'Common']
+
+
+def temp_db_path(name: str) -> str:
+    """
+    Returns a path for a throwaway database file.
+    """
+    directory = tempfile.mkdtemp(prefix='gummybot-bench-')
+    return os.path.join(directory, name)
+
+
+def seed_database(db_file: str, users: int = 1000, items: int = 500,
+                  inventory_per_user: int = 3, guilds: int = 1, seed: int = 0) -> None:
+    """
+    Creates the bot tables and fills them with synthetic users,
+    shop items and inventories.
+    """
+    rng = random.Random(seed)
+    last_week = int((datetime.datetime.now() - datetime.timedelta(days=7)).timestamp())
+
+    conn = sqlite3.connect(db_file)
+    utils.migrate(conn)
+
+    conn.executemany(
+        'INSERT INTO battlepass VALUES (?, ?, ?, ?, ?, ?, ?)',
+        ((user_id, user_id % guilds, rng.randrange(0, 5000), last_week,
+          rng.randrange(1, 60), f'user{user_id}', last_week)
+         for user_id in range(1, users + 1))
+        )
+    conn.executemany(
+        'INSERT INTO shop (item_name, rarity, img_url) VALUES (?, ?, ?)',
+        ((f'item{i}', rng.choice(RARITIES), '') for i in range(items))
+        )
+    conn.executemany(
+        '''INSERT INTO inventory (user_id, guild_id, item_name, value, rarity, purchase_date)
+           VALUES (?, ?, ?, ?, ?, ?)''',
+        ((user_id, user_id % guilds, f'item{rng.randrange(items)}', 100, 'Common', last_week)
+         for user_id in range(1, users + 1)
+         for _ in range(inventory_per_user))
+        )
+    conn.commit()
+    conn.close()
+
+
+class FakeGuild:
+    """
+    Stand-in for discord.Guild with no voice connection.
+    """
+    def __init__(self, guild_id: int, name: str = 'bench-guild'):
+        self.id = guild_id
+        self.name = name
+        self.voice_client = None
+
+
+class FakeMember:
+    """
+    Stand-in for discord.Member, named like the seeded users.
+    """
+    def __init__(self, user_id: int, guild: FakeGuild):
+        self.id = user_id
+        self.name = f'user{user_id}'
+        self.display_name = self.name
+        self.guild = guild
+        self.avatar = None
+        self.voice = None
+        self.joined_at = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class FakeMessage:
+    """
+    Returned by FakeContext.send so commands can keep a handle on it.
+    """
+    async def edit(self, **kwargs) -> None:
+        pass
+
+
+class FakeContext:
+    """
+    Stand-in for commands.Context. Sent messages are counted rather
+    than delivered; `send_delay` simulates the Discord API round trip.
+    """
+    def __init__(self, author: FakeMember, send_delay: float = 0.0):
+        self.author = author
+        self.guild = author.guild
+        self.send_delay = send_delay
+        self.sent = 0
+
+    async def send(self, content=None, **kwargs) -> FakeMessage:
+        self.sent += 1
+        if self.send_delay:
+            await asyncio.sleep(self.send_delay)
+        return FakeMessage()
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """
+    Returns the q-quantile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def git_revision() -> str | None:
+    """
+    Returns the checked out commit, for labelling saved results.
+    """
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return result.stdout.strip() or None
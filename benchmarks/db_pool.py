@@ -0,0 +1,141 @@
+"""
+Compares the old connect-per-call database access against the pooled
+connection manager on the `$points` workload: read the redemption time,
+points and level, then write new points and a new redemption time.
+
+Usage: python -m benchmarks.db_pool [--users N] [--iterations N] [--concurrency N]
+"""
+import time
+import random
+import sqlite3
+import asyncio
+import argparse
+
+import utils
+from benchmarks.common import temp_db_path, seed_database
+
+
+def per_call_points(db_file: str, user_id: int) -> None:
+    """
+    One `$points` redemption using a fresh connection per statement,
+    the way db_interface worked before pooling.
+    """
+    def read(query):
+        conn = sqlite3.connect(db_file)
+        result = conn.execute(query, (user_id,)).fetchone()
+        conn.close()
+        return result
+
+    def write(query, value):
+        conn = sqlite3.connect(db_file)
+        conn.execute(query, (value, user_id))
+        conn.commit()
+        conn.close()
+
+    read('SELECT redemption_time FROM battlepass WHERE user_id = ?')
+    points = read('SELECT points FROM battlepass WHERE user_id = ?')[0]
+    read('SELECT level FROM battlepass WHERE user_id = ?')
+    write('UPDATE battlepass SET points = ? WHERE user_id = ?', points + 15)
+    write('UPDATE battlepass SET redemption_time = ? WHERE user_id = ?', int(time.time()))
+
+
+def pooled_points(user_id: int) -> None:
+    """
+    One `$points` redemption on the pooled connections.
+    """
+    manager = utils.get_manager()
+
+    def read(query):
+        return manager.reader().execute(query, (user_id,)).fetchone()
+
+    def write(query, value):
+        conn = manager.writer()
+        with conn:
+            conn.execute(query, (value, user_id))
+
+    read('SELECT redemption_time FROM battlepass WHERE user_id = ?')
+    points = read('SELECT points FROM battlepass WHERE user_id = ?')[0]
+    read('SELECT level FROM battlepass WHERE user_id = ?')
+    write('UPDATE battlepass SET points = ? WHERE user_id = ?', points + 15)
+    write('UPDATE battlepass SET redemption_time = ? WHERE user_id = ?', int(time.time()))
+
+
+async def async_points(user_id: int) -> None:
+    """
+    One `$points` redemption through the awaitable API, including
+    the read-through cache.
+    """
+    await utils.retrieve_redemption_time(user_id)
+    await utils.retrieve_points(user_id)
+    await utils.retrieve_level(user_id)
+    await utils.add_points(user_id, 15)
+    await utils.update_redemption_time(user_id, int(time.time()))
+
+
+async def run_async(user_ids: list, concurrency: int) -> None:
+    """
+    Drives async_points with a fixed number of concurrent callers.
+    """
+    queue = iter(user_ids)
+
+    async def caller():
+        for user_id in queue:
+            await async_points(user_id)
+
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+
+
+def report(name: str, iterations: int, elapsed: float, baseline: float = None) -> None:
+    """
+    Prints throughput for one mode.
+    """
+    line = f'{name:<28} {iterations / elapsed:>10.0f} redemptions/s'
+    if baseline:
+        line += f'  ({baseline / elapsed:.1f}x)'
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    user_ids = [rng.randrange(1, args.users + 1) for _ in range(args.iterations)]
+
+    baseline_db = temp_db_path('per_call.db')
+    seed_database(baseline_db, users=args.users)
+    start = time.perf_counter()
+    for user_id in user_ids:
+        per_call_points(baseline_db, user_id)
+    baseline = time.perf_counter() - start
+    report('per-call connect', args.iterations, baseline)
+
+    pooled_db = temp_db_path('pooled.db')
+    seed_database(pooled_db, users=args.users)
+    utils.configure_database(pooled_db)
+    start = time.perf_counter()
+    for user_id in user_ids:
+        pooled_points(user_id)
+    report('pooled (blocking)', args.iterations, time.perf_counter() - start, baseline)
+
+    start = time.perf_counter()
+    asyncio.run(run_async(user_ids, args.concurrency))
+    report(f'pooled (async, {args.concurrency} callers)', args.iterations, time.perf_counter() - start, baseline)
+
+    async def run_write_behind():
+        await utils.start_write_behind()
+        await run_async(user_ids, args.concurrency)
+        await utils.stop_write_behind()
+
+    start = time.perf_counter()
+    asyncio.run(run_write_behind())
+    report('pooled (async, write-behind)', args.iterations, time.perf_counter() - start, baseline)
+
+    utils.shutdown_db_worker()
+
+
+if __name__ == '__main__':
+    main()
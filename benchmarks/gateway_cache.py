@@ -0,0 +1,214 @@
+"""
+Measures what the gateway cache policy costs on a large synthetic
+guild: resident memory held by the member cache and the time from
+GUILD_CREATE until every member chunk has been processed, plus the
+CPU cost of the presence updates that the presences intent streams.
+
+No connection is made to Discord. Each policy runs in a fresh
+interpreter and feeds discord.py's connection state the payloads the
+gateway would send: GUILD_CREATE (with the voice members Discord
+includes for large guilds) and, when guilds are chunked, one
+GUILD_MEMBERS_CHUNK per 1000 members, with presences for online
+members when that intent is on.
+
+Policies: before = members and presences intents, full member cache,
+chunking (the old bot.py); joined = every member cached, no presences;
+lean = the defaults in utils/gateway.py; none = no member cache.
+
+Usage: python -m benchmarks.gateway_cache [--members N] [--policies before,lean]
+           [--online 0.2] [--voice N] [--presence-updates N]
+"""
+import gc
+import sys
+import json
+import time
+import asyncio
+import argparse
+import resource
+import subprocess
+
+
+# name: (MEMBER_CACHE, presences intent, chunk at startup)
+POLICIES = {
+    'before': ('full', True, True),
+    'joined': ('joined', False, True),
+    'lean': ('voice', False, False),
+    'none': ('none', False, False),
+}
+
+GUILD_ID = 1
+CHUNK_SIZE = 1000
+
+
+def rss_kib() -> int:
+    """
+    Returns the current resident set size in KiB.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # Peak rather than current outside Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def member_payload(user_id: int) -> dict:
+    return {
+        'user': {'id': str(user_id), 'username': f'user{user_id}', 'discriminator': '0',
+                 'global_name': f'User {user_id}', 'avatar': None},
+        'roles': [],
+        'nick': None,
+        'joined_at': '2024-01-01T00:00:00+00:00',
+        'deaf': False,
+        'mute': False,
+        'flags': 0,
+    }
+
+
+def presence_payload(user_id: int, status: str = 'online') -> dict:
+    return {
+        'user': {'id': str(user_id)},
+        'guild_id': str(GUILD_ID),
+        'status': status,
+        'activities': [{'name': 'Rocket League', 'type': 0, 'created_at': 0}],
+        'client_status': {'desktop': status},
+    }
+
+
+def guild_payload(members: int, voice: int, presences: bool) -> dict:
+    """
+    GUILD_CREATE for a large guild: members and voice states only for
+    users in voice, presences only with that intent.
+    """
+    voice_ids = range(1, voice + 1)
+    return {
+        'id': str(GUILD_ID),
+        'name': 'bench-guild',
+        'member_count': members,
+        'large': True,
+        'owner_id': '1',
+        'roles': [{'id': str(GUILD_ID), 'name': '@everyone', 'permissions': '0', 'position': 0,
+                   'color': 0, 'hoist': False, 'managed': False, 'mentionable': False}],
+        'channels': [{'id': '10', 'type': 0, 'name': 'general', 'position': 0},
+                     {'id': '11', 'type': 2, 'name': 'voice', 'position': 1, 'bitrate': 64000, 'user_limit': 0}],
+        'voice_states': [{'user_id': str(user_id), 'channel_id': '11', 'session_id': 'x', 'deaf': False,
+                          'mute': False, 'self_deaf': False, 'self_mute': False, 'suppress': False}
+                         for user_id in voice_ids],
+        'members': [member_payload(user_id) for user_id in voice_ids],
+        'presences': [presence_payload(user_id) for user_id in voice_ids] if presences else [],
+        'emojis': [],
+        'stickers': [],
+        'threads': [],
+        'stage_instances': [],
+        'guild_scheduled_events': [],
+        'features': [],
+    }
+
+
+def chunk_payloads(members: int, nonce: str, presences: bool, online: float):
+    """
+    Yields GUILD_MEMBERS_CHUNK payloads one at a time, as they arrive.
+    """
+    chunk_count = (members + CHUNK_SIZE - 1) // CHUNK_SIZE
+    online_every = max(1, round(1 / online)) if online else 0
+    for index in range(chunk_count):
+        user_ids = range(index * CHUNK_SIZE + 1, min(members, (index + 1) * CHUNK_SIZE) + 1)
+        yield {
+            'guild_id': str(GUILD_ID),
+            'members': [member_payload(user_id) for user_id in user_ids],
+            'presences': [presence_payload(user_id) for user_id in user_ids
+                          if online_every and user_id % online_every == 0] if presences else [],
+            'chunk_index': index,
+            'chunk_count': chunk_count,
+            'nonce': nonce,
+        }
+
+
+async def measure(policy: str, args) -> dict:
+    """
+    Runs one policy in this process and returns its measurements.
+    """
+    from discord.ext import commands
+    from discord.state import ChunkRequest
+    import utils
+
+    member_cache, presences, chunk_guilds = POLICIES[policy]
+    bot = commands.Bot(command_prefix='$', **utils.gateway_options(member_cache, presences, chunk_guilds))
+    state = bot._connection
+
+    gc.collect()
+    baseline = rss_kib()
+    start = time.perf_counter()
+
+    guild = state._get_create_guild(guild_payload(args.members, args.voice, presences))
+    if state._guild_needs_chunking(guild):
+        request = ChunkRequest(guild.id, 0, asyncio.get_running_loop(), state._get_guild, cache=member_cache != 'none')
+        state._chunk_requests[request.nonce] = request
+        for chunk in chunk_payloads(args.members, request.nonce, presences, args.online):
+            state.parse_guild_members_chunk(chunk)
+        request.buffer.clear()
+
+    startup = time.perf_counter() - start
+    gc.collect()
+    held = rss_kib() - baseline
+
+    # Without the intent Discord sends no presence updates at all
+    presence_cpu = 0.0
+    if presences and args.presence_updates:
+        updates = [presence_payload(user_id % args.members + 1, 'idle' if i % 2 else 'online')
+                   for i, user_id in enumerate(range(args.presence_updates))]
+        start = time.process_time()
+        for update in updates:
+            state.parse_presence_update(update)
+        presence_cpu = time.process_time() - start
+
+    return {
+        'policy': policy,
+        'cached_members': len(guild.members),
+        'startup_ms': startup * 1000,
+        'rss_mib': held / 1024,
+        'presence_cpu_ms': presence_cpu * 1000,
+    }
+
+
+def run_child(policy: str, args) -> dict:
+    """
+    Measures a policy in a fresh interpreter so memory is not shared.
+    """
+    command = [sys.executable, '-m', 'benchmarks.gateway_cache', '--child', policy,
+               '--members', str(args.members), '--voice', str(args.voice),
+               '--online', str(args.online), '--presence-updates', str(args.presence_updates)]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--members', type=int, default=100000)
+    parser.add_argument('--voice', type=int, default=50, help='members in voice channels')
+    parser.add_argument('--online', type=float, default=0.2, help='share of members with a presence')
+    parser.add_argument('--presence-updates', type=int, default=50000)
+    parser.add_argument('--policies', default=','.join(POLICIES))
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(measure(args.child, args))))
+        return
+
+    print(f'{args.members} members, {args.voice} in voice, {args.online:.0%} online')
+    print(f'{"policy":<8} {"cached":>8} {"startup ms":>11} {"RSS MiB":>9} {"presence CPU ms":>16}')
+    for policy in args.policies.split(','):
+        if policy not in POLICIES:
+            raise SystemExit(f'Unknown policy {policy!r}, choose from {", ".join(POLICIES)}')
+        result = run_child(policy, args)
+        print(f'{policy:<8} {result["cached_members"]:>8} {result["startup_ms"]:>11.1f}'
+              f' {result["rss_mib"]:>9.1f} {result["presence_cpu_ms"]:>16.1f}')
+    print(f'presence CPU is for {args.presence_updates} PRESENCE_UPDATE events')
+
+
+if __name__ == '__main__':
+    main()
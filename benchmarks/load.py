@@ -0,0 +1,231 @@
+"""
+Concurrent load generator for the battlepass and shop commands.
+Simulated members fire commands at a target arrival rate (Poisson
+arrivals, each command in its own task, like gateway messages), and
+every stage reports throughput, latency percentiles, event-loop lag
+and errors, including SQLite "database is locked" failures.
+Run several --rates to find where the stack saturates: achieved
+throughput stops following the offered rate and tail latency and
+loop lag climb.
+
+`--contenders N` adds N threads that write to the database through
+their own connections, standing in for other processes sharing the
+file, to surface lock contention.
+
+Usage: python -m benchmarks.load [--users N] [--rates 100,200,400]
+           [--duration S] [--mix points=60,buy=20,shop=20]
+           [--send-delay S] [--contenders N] [--write-behind]
+"""
+import time
+import random
+import sqlite3
+import asyncio
+import argparse
+import threading
+from collections import defaultdict
+
+import utils
+from benchmarks.common import temp_db_path, seed_database, percentile, FakeGuild, FakeMember, FakeContext
+
+
+COMMANDS = ('points', 'daily', 'buy', 'shop', 'inventory', 'battlepass', 'tierup', 'top5', 'rank')
+
+
+def parse_mix(mix: str) -> tuple:
+    """
+    Parses 'points=60,buy=20' into (names, weights).
+    """
+    names, weights = [], []
+    for part in mix.split(','):
+        name, weight = part.split('=')
+        if name not in COMMANDS:
+            raise SystemExit(f'Unknown command {name!r}, choose from {", ".join(COMMANDS)}')
+        names.append(name)
+        weights.append(float(weight))
+    return names, weights
+
+
+class Stats:
+    """
+    Latencies and failures for one stage.
+    """
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.locked = 0
+        self.loop_lag = []
+
+    def report(self, offered: float, elapsed: float) -> None:
+        completed = sum(len(values) for values in self.latencies.values())
+        lag = sorted(self.loop_lag)
+        print(f'\noffered {offered:.0f}/s  achieved {completed / elapsed:.0f}/s  '
+              f'locked {self.locked}  other errors {sum(self.errors.values())}  '
+              f'loop lag p99 {percentile(lag, 0.99) * 1000:.1f}ms max {(lag[-1] if lag else 0) * 1000:.1f}ms')
+        print(f'  {"command":<12} {"count":>7} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"max ms":>8}')
+        for name, values in sorted(self.latencies.items()):
+            values.sort()
+            print(f'  {name:<12} {len(values):>7} {percentile(values, 0.50) * 1000:>8.1f} {percentile(values, 0.95) * 1000:>8.1f}'
+                  f' {percentile(values, 0.99) * 1000:>8.1f} {values[-1] * 1000:>8.1f}')
+        for error, count in sorted(self.errors.items()):
+            print(f'  error: {error} x{count}')
+
+
+async def monitor_loop_lag(stats: Stats, interval: float = 0.01) -> None:
+    """
+    Measures how late a short sleep wakes up, i.e. how long the
+    event loop was busy with other work.
+    """
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        stats.loop_lag.append(max(0.0, time.perf_counter() - start - interval))
+
+
+def contend(db_file: str, stop: threading.Event, hold: float) -> None:
+    """
+    Repeatedly takes the write lock from a separate connection.
+    """
+    conn = sqlite3.connect(db_file, timeout=5.0, isolation_level=None)
+    rng = random.Random()
+    while not stop.is_set():
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('UPDATE battlepass SET points = points WHERE user_id = ?', (rng.randrange(1, 1000),))
+            time.sleep(hold)
+            conn.execute('COMMIT')
+        except sqlite3.OperationalError:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+        time.sleep(hold)
+    conn.close()
+
+
+async def run_stage(handlers: dict, names: list, weights: list, members: list,
+                    rate: float, duration: float, send_delay: float) -> Stats:
+    """
+    Fires commands at `rate` per second for `duration` seconds and
+    waits for them all to finish.
+    """
+    stats = Stats()
+    rng = random.Random(int(rate))
+    tasks = set()
+
+    async def invoke(name: str, member: FakeMember) -> None:
+        start = time.perf_counter()
+        try:
+            await handlers[name](FakeContext(member, send_delay=send_delay))
+        except sqlite3.OperationalError as e:
+            if 'locked' in str(e):
+                stats.locked += 1
+            else:
+                stats.errors[f'{type(e).__name__}: {e}'] += 1
+            return
+        except Exception as e:
+            stats.errors[f'{type(e).__name__}: {e}'] += 1
+            return
+        stats.latencies[name].append(time.perf_counter() - start)
+
+    lag_task = asyncio.create_task(monitor_loop_lag(stats))
+    start = time.perf_counter()
+    next_arrival = start
+    while next_arrival - start < duration:
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        name = rng.choices(names, weights)[0]
+        task = asyncio.create_task(invoke(name, rng.choice(members)))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        next_arrival += rng.expovariate(rate)
+
+    if tasks:
+        await asyncio.wait(tasks)
+    elapsed = time.perf_counter() - start
+    lag_task.cancel()
+
+    stats.report(rate, elapsed)
+    return stats
+
+
+async def run(args) -> None:
+    """
+    Seeds a database, builds the cogs and runs one stage per rate.
+    """
+    from cogs.battlepass import BattlepassCog
+    from cogs import shop as shop_cog
+
+    db_file = temp_db_path('load.db')
+    seed_database(db_file, users=args.users, items=args.items)
+    utils.configure_database(db_file)
+    await utils.run_migrations()
+    if args.write_behind:
+        await utils.start_write_behind()
+    await utils.load_leaderboards()
+    await utils.load_cooldowns()
+
+    guild = FakeGuild(0)
+    members = [FakeMember(user_id, guild) for user_id in range(1, args.users + 1)]
+
+    battlepass = BattlepassCog(None)
+    shop = shop_cog.ShopCog(None)
+    shop_cog.refresh_shop.cancel()
+    await shop_cog.refresh_shop()
+    shop_items, _ = await utils.get_state().get_shop()
+    item_names = list(shop_items)
+
+    handlers = {
+        'points': lambda ctx: battlepass.points.callback(battlepass, ctx),
+        'daily': lambda ctx: battlepass.daily.callback(battlepass, ctx),
+        'tierup': lambda ctx: battlepass.tierup.callback(battlepass, ctx),
+        'battlepass': lambda ctx: battlepass.battlepass.callback(battlepass, ctx),
+        'top5': lambda ctx: battlepass.top5.callback(battlepass, ctx),
+        'rank': lambda ctx: battlepass.rank.callback(battlepass, ctx),
+        'shop': lambda ctx: shop.shop.callback(shop, ctx),
+        'inventory': lambda ctx: shop.inventory.callback(shop, ctx),
+        'buy': lambda ctx: shop.buy.callback(shop, ctx, item_name=random.choice(item_names)),
+    }
+    names, weights = parse_mix(args.mix)
+
+    stop = threading.Event()
+    contenders = [threading.Thread(target=contend, args=(db_file, stop, args.contender_hold), daemon=True)
+                  for _ in range(args.contenders)]
+    for thread in contenders:
+        thread.start()
+
+    # Scheduler noise on this machine, for reading the loop lag figures
+    idle = Stats()
+    lag_task = asyncio.create_task(monitor_loop_lag(idle))
+    await asyncio.sleep(1.0)
+    lag_task.cancel()
+    lag = sorted(idle.loop_lag)
+    print(f'idle loop lag p99 {percentile(lag, 0.99) * 1000:.1f}ms')
+
+    try:
+        for rate in (float(rate) for rate in args.rates.split(',')):
+            await run_stage(handlers, names, weights, members, rate, args.duration, args.send_delay)
+    finally:
+        stop.set()
+        for thread in contenders:
+            thread.join()
+        await utils.stop_write_behind()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--items', type=int, default=500)
+    parser.add_argument('--rates', default='100,250,500,1000,2000', help='commands per second, one stage each')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per stage')
+    parser.add_argument('--mix', default='points=50,buy=20,shop=20,inventory=10')
+    parser.add_argument('--send-delay', type=float, default=0.0, help='simulated Discord API latency per message')
+    parser.add_argument('--contenders', type=int, default=0, help='threads writing through their own connections')
+    parser.add_argument('--contender-hold', type=float, default=0.005, help='seconds each contender holds the write lock')
+    parser.add_argument('--write-behind', action='store_true', help='enable write-behind buffering')
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+    utils.shutdown_db_worker()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Measures the cost of one shop rotation against catalog size: the old
+six ORDER BY RANDOM() queries vs. sampling the in-memory rarity pools.
+Also reports the one-off cost of loading the catalog into memory.
+
+Usage: python -m benchmarks.shop_rotation [--sizes 1000,10000,100000] [--rotations N]
+"""
+import time
+import sqlite3
+import asyncio
+import argparse
+
+import utils
+from benchmarks.common import temp_db_path, seed_database
+
+
+def order_by_random_rotation(conn: sqlite3.Connection) -> list:
+    """
+    One rotation the way retrieve_shop_items worked before the catalog.
+    """
+    selected_items = []
+    for rarity, count in utils.RARITY_COUNTS.items():
+        query = 'SELECT * FROM shop WHERE rarity = ? ORDER BY RANDOM() LIMIT ?'
+        selected_items.extend(conn.execute(query, (rarity, count)).fetchall())
+    return selected_items
+
+
+def time_per_call(func, rotations: int) -> float:
+    """
+    Returns the mean milliseconds per call.
+    """
+    start = time.perf_counter()
+    for _ in range(rotations):
+        func()
+    return (time.perf_counter() - start) / rotations * 1000
+
+
+async def time_async(func, rotations: int) -> float:
+    """
+    Returns the mean milliseconds per awaited call.
+    """
+    start = time.perf_counter()
+    for _ in range(rotations):
+        await func()
+    return (time.perf_counter() - start) / rotations * 1000
+
+
+async def warm_and_time(func, rotations: int) -> float:
+    """
+    Times `func` after one untimed call has loaded the catalog.
+    """
+    await func()
+    return await time_async(func, rotations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--rotations', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f'{"items":>8} {"ORDER BY RANDOM":>16} {"catalog load":>13} {"sample":>10} {"rotation":>10}')
+    for size in (int(size) for size in args.sizes.split(',')):
+        db_file = temp_db_path('shop.db')
+        seed_database(db_file, users=0, items=size)
+        conn = sqlite3.connect(db_file)
+
+        old = time_per_call(lambda: order_by_random_rotation(conn), args.rotations)
+
+        rows = conn.execute('SELECT item_name, rarity, img_url FROM shop').fetchall()
+        catalog = utils.ShopCatalog()
+        start = time.perf_counter()
+        catalog.load(rows, signature=None)
+        load = (time.perf_counter() - start) * 1000
+        sample = time_per_call(catalog.sample, args.rotations * 100)
+
+        # Steady-state rotation through the bot API: version check plus sampling
+        utils.configure_database(db_file)
+        utils.shop_catalog.invalidate()
+        rotation = asyncio.run(warm_and_time(utils.retrieve_shop_items, args.rotations))
+
+        print(f'{size:>8} {old:>14.3f}ms {load:>11.3f}ms {sample:>8.4f}ms {rotation:>8.3f}ms')
+        conn.close()
+
+    utils.shutdown_db_worker()
+
+
+if __name__ == '__main__':
+    main()
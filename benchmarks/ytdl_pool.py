@@ -0,0 +1,119 @@
+"""
+Extraction latency with a new YoutubeDL per call (how MusicCog used to
+work) vs. the per-thread instances of utils.YoutubeDLPool.
+
+By default yt-dlp extracts a direct audio link served by a local HTTP
+server, so the numbers show the per-call setup cost (extractor loading
+and a new HTTP session) without depending on YouTube. Pass --url to
+time real lookups instead, e.g. a YouTube link or "ytsearch:some song".
+
+Usage: python -m benchmarks.ytdl_pool [--calls N] [--threads N] [--url URL]
+"""
+import time
+import argparse
+import threading
+import http.server
+from concurrent.futures import ThreadPoolExecutor
+
+import utils
+from benchmarks.common import percentile
+
+
+YDL_OPTIONS = {
+    'format': 'bestaudio/best',
+    'noplaylist': True,
+    'quiet': True,
+    'no_warnings': True,
+}
+
+
+class AudioHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves a few bytes of fake MP3 for any path.
+    """
+    body = b'\xff\xfb\x90\x00' * 256
+
+    def _headers(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'audio/mpeg')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._headers()
+
+    def do_GET(self):
+        self._headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server() -> http.server.ThreadingHTTPServer:
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), AudioHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fresh_extract(url: str) -> dict:
+    import yt_dlp
+
+    with yt_dlp.YoutubeDL(YDL_OPTIONS) as ydl:
+        return ydl.extract_info(url, download=False)
+
+
+def run(extract, url: str, calls: int, threads: int) -> dict:
+    """
+    Times `calls` extractions spread over `threads` worker threads.
+    """
+    def timed_call(_):
+        start = time.perf_counter()
+        extract(url)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        # One warm-up per thread, as a running bot would have had
+        list(executor.map(timed_call, range(threads)))
+        start = time.perf_counter()
+        durations = sorted(executor.map(timed_call, range(calls)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        'calls_per_sec': calls / elapsed,
+        'mean_ms': sum(durations) / calls * 1000,
+        'p50_ms': percentile(durations, 0.50) * 1000,
+        'p99_ms': percentile(durations, 0.99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--url', help='real URL or search to extract instead of the local server')
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server = start_server()
+        url = f'http://127.0.0.1:{server.server_address[1]}/track.mp3'
+
+    pool = utils.YoutubeDLPool(YDL_OPTIONS)
+    try:
+        print(f'{args.calls} extractions of {url} on {args.threads} thread(s)')
+        print(f'{"mode":<10} {"calls/s":>9} {"mean ms":>9} {"p50 ms":>9} {"p99 ms":>9}')
+        for name, extract in (('fresh', fresh_extract), ('pooled', pool.extract_info)):
+            result = run(extract, url, args.calls, args.threads)
+            print(f'{name:<10} {result["calls_per_sec"]:>9.1f} {result["mean_ms"]:>9.2f}'
+                  f' {result["p50_ms"]:>9.2f} {result["p99_ms"]:>9.2f}')
+        print(f'pool: {pool.stats()}')
+    finally:
+        pool.close()
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
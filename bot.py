@@ -1,11 +1,18 @@
 """
 
 """
+import time
+STARTED = time.perf_counter()
+
 import os, logging, asyncio
 import discord
 from dotenv import load_dotenv
 from discord.ext import commands
 
+import utils
+
+utils.startup_timer.started = STARTED
+utils.startup_timer.record('imports', time.perf_counter() - STARTED)
 
 load_dotenv()
 
@@ -15,24 +22,14 @@ LOG_PATH = os.getenv('LOG_PATH', '/app/logs/bot.log')
 # Ensure dir for log file exists
 os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
 
-# Configure logging
-logging.basicConfig(format='[%(asctime)s] %(levelname)s: %(message)s [Line: %(lineno)d <%(filename)s>]',
-                    datefmt='%I:%M:%S %p',
-                    level=logging.INFO)
-
-file_handler = logging.FileHandler(LOG_PATH)
-file_handler.setFormatter((logging.Formatter(
-                    '[%(asctime)s] %(levelname)s: %(message)s [Line: %(lineno)d <%(filename)s>]',
-                    datefmt='%I:%M:%S %p')))
-logging.getLogger().addHandler(file_handler)
+# Console and file output are written from a background thread;
+# LOG_ROTATION, LOG_FORMAT and LOG_COMPRESS configure the file
+utils.configure_logging(LOG_PATH)
 
-intents = discord.Intents.default()
-intents.message_content = True
-intents.members = True
-intents.voice_states = True
-intents.presences = True
-
-bot = commands.Bot(command_prefix='$', intents=intents)
+# SHARD_MODE picks a single connection, auto sharding or one fixed shard;
+# MEMBER_CACHE and GATEWAY_PRESENCES pick what the gateway caches
+bot = utils.create_bot(command_prefix='$', **utils.gateway_options())
+utils.shard_monitor.install(bot)
 
 # Remove default help command
 bot.remove_command('help')
@@ -43,6 +40,31 @@ async def on_ready():
     Prints statment when bot is logged in.
     """
     logging.info('Success! Logged in as %s', bot.user.name)
+    utils.log_startup_report()
+
+
+@bot.before_invoke
+async def start_command_timer(ctx):
+    """
+    Marks when a command started running, for metrics and telemetry.
+    """
+    utils.command_started(ctx)
+
+
+@bot.after_invoke
+async def stop_command_timer(ctx):
+    """
+    Records command latency, whether or not the command failed.
+    """
+    utils.command_finished(ctx)
+
+
+@bot.event
+async def on_command_completion(ctx):
+    """
+    Records commands that finished without an error.
+    """
+    utils.record_command(ctx, 'ok')
 
 
 @bot.event
@@ -50,6 +72,9 @@ async def on_command_error(ctx, error):
     """
     Sends error message to user when command is not found.
     """
+    utils.record_command(ctx, type(getattr(error, 'original', error)).__name__)
+    utils.command_failed(ctx, error)
+
     if isinstance(error, commands.CommandNotFound):
         await ctx.send('Command not found. Type `$help` for a list of commands.')
         logging.error(error)
@@ -57,22 +82,53 @@ async def on_command_error(ctx, error):
 
 async def load():
     """
-    Loads cogs for bots.
+    Loads cogs for bots. Cogs do not depend on each other, so they
+    are loaded concurrently.
     """
     cogs_directory = os.path.join(os.path.dirname(__file__), 'cogs')
     cog_files = [f.split('.')[0] for f in os.listdir(cogs_directory) if f.endswith('.py')]
 
-    for cog in cog_files:
-        await bot.load_extension(f'cogs.{cog}')
+    async def load_cog(cog):
+        with utils.startup_timer.phase(f'cogs.{cog}'):
+            await bot.load_extension(f'cogs.{cog}')
+
+    await asyncio.gather(*(load_cog(cog) for cog in sorted(cog_files)))
 
 
 async def main():
     """
     Loads cogs and starts the bot login.
     """
-    async with bot:
-        await load()
-        await bot.start(os.getenv('BOT_TOKEN'))
+    try:
+        async with bot:
+            timer = utils.startup_timer
+            with timer.phase('migrations'):
+                await utils.run_migrations()
+            if utils.DB_WRITE_BEHIND and utils.get_state().shared:
+                # Other processes would read rows without this process's buffered updates
+                logging.warning('DB_WRITE_BEHIND is ignored when state is shared between processes')
+            elif utils.DB_WRITE_BEHIND:
+                await utils.start_write_behind()
+            with timer.phase('leaderboards'):
+                await utils.load_leaderboards()
+                await utils.load_cooldowns()
+            with timer.phase('services'):
+                if utils.COMMAND_TELEMETRY:
+                    await utils.start_command_telemetry()
+                if utils.METRICS_PORT:
+                    await utils.start_metrics_server()
+            with timer.phase('cogs'):
+                await load()
+            await bot.start(os.getenv('BOT_TOKEN'))
+    finally:
+        # Write out anything still held by write-behind buffering
+        await utils.stop_write_behind()
+        await utils.stop_command_telemetry()
+        await utils.stop_metrics_server()
+        await utils.close_state()
+        utils.extraction_executor.shutdown()
+        # Let queued database writes finish before exiting
+        utils.shutdown_db_worker()
 
 try:
     asyncio.run(main())
@@ -1,9 +1,11 @@
 import logging
 import discord
-import pytz
 import datetime
 from discord.ext import commands
 
+import utils
+
+
 class BasicsCog(commands.Cog):
     """
     Organizational class for basic commands.
@@ -29,7 +31,7 @@ class BasicsCog(commands.Cog):
 
 
     @commands.command()
-    async def age(self, ctx, user: discord.Member = None):
+    async def age(self, ctx, user: utils.CachedMember = None):
         """
         Returns days since joining server.
         """
@@ -37,6 +39,8 @@ class BasicsCog(commands.Cog):
             user = ctx.author
 
         if ctx.guild:
+            import pytz
+
             joined_at = user.joined_at
             timezone = pytz.timezone('America/Chicago')
 
@@ -40,19 +40,19 @@ class BattlepassCog(commands.Cog):
         guild_name = ctx.author.guild.name
 
         registration_timestamp = datetime.datetime.now()
-        daily_timestamp = datetime.datetime.now()
+        registration_epoch = int(registration_timestamp.timestamp())
 
-        user_exists = utils.get_user_id(user_id=user_id)
+        user_exists = await utils.get_user_id(user_id=user_id)
 
         if user_exists:
             await ctx.send("You are already registered.")
         else:
-            utils.create_user(
+            await utils.create_user(
                 user_id=user_id,
                 guild_id=guild_id,
-                redemption_time=registration_timestamp,
+                redemption_time=registration_epoch,
                 user_name=user_name,
-                daily_redemption=daily_timestamp
+                daily_redemption=registration_epoch
                 )
 
             embed = discord.Embed(title='Battlepass Registration', timestamp=registration_timestamp)
@@ -79,28 +79,39 @@ class BattlepassCog(commands.Cog):
         guild_id = ctx.author.guild.id
         guild_name = ctx.author.guild.name
 
-        redemption_time_str = utils.retrieve_redemption_time(user_id=user_id)
+        current_time = datetime.datetime.now()
+        current_epoch = int(current_time.timestamp())
 
-        if redemption_time_str:
-            last_redeemed = datetime.datetime.strptime(redemption_time_str, '%Y-%m-%d %H:%M:%S.%f')
-            current_time = datetime.datetime.now()
-            time_since_redemption = current_time - last_redeemed
-            next_redemption_time = (last_redeemed + datetime.timedelta(minutes=15)).strftime('%Y-%m-%d %I:%M %p')
+        # Users still on cooldown are turned away without reading their record
+        next_redemption = await utils.get_state().get_cooldown('points', user_id)
+        on_cooldown = next_redemption is not None and current_epoch < next_redemption
+        record = None if on_cooldown else await utils.get_battlepass_record(user_id=user_id)
+
+        if record or on_cooldown:
+            if record:
+                next_redemption = (record.redemption_time or 0) + utils.POINTS_COOLDOWN
+
+            # Another process or a concurrent command may have just redeemed
+            if current_epoch >= next_redemption:
+                running = await utils.get_state().acquire_cooldown('points', user_id, current_epoch + utils.POINTS_COOLDOWN)
+                if running is not None:
+                    next_redemption = running
+            elif record:
+                # Keep the cooldown the record shows, so repeat attempts are turned away without a read
+                await utils.get_state().acquire_cooldown('points', user_id, next_redemption)
 
             # Check if it has been at least 15 minutes
-            if time_since_redemption.total_seconds() >= 900: # 15 minutes
-                points = utils.retrieve_points(user_id=user_id)
-                level = utils.retrieve_level(user_id=user_id)
-                points_gained = utils.calculate_points(level=level)
+            if current_epoch >= next_redemption:
+                points_gained = utils.calculate_points(level=record.level)
 
-                utils.update_points(user_id=user_id, points=(points_gained + points))
-                utils.update_redemption_time(user_id=user_id, current_time=current_time)
+                points = await utils.add_points(user_id=user_id, points=points_gained)
+                await utils.update_redemption_time(user_id=user_id, current_time=current_epoch)
 
                 embed = discord.Embed(title='Battlepass Points', timestamp=current_time)
                 embed.set_author(name=f'Requested by {user_name}', icon_url=ctx.author.avatar)
                 embed.set_thumbnail(url='https://cdn4.iconfinder.com/data/icons/stack-of-coins/100/coin-03-512.png')
-                embed.add_field(name=f'You\'ve been awarded {points_gained} points!', value=f'Updated points: {points + points_gained}', inline=False)
-                embed.add_field(name='', value=f'Your next redemption time is: {(current_time + datetime.timedelta(minutes=15)).strftime("%Y-%m-%d %I:%M %p")}', inline=False)
+                embed.add_field(name=f'You\'ve been awarded {points_gained} points!', value=f'Updated points: {points}', inline=False)
+                embed.add_field(name='', value=f'Your next redemption time is: {utils.format_epoch(current_epoch + utils.POINTS_COOLDOWN)}', inline=False)
                 await ctx.send(embed=embed)
 
                 logging.info('Successfully awarded %d points to [%s:%s] in server [%s:%s].',
@@ -113,7 +124,7 @@ class BattlepassCog(commands.Cog):
                 embed = discord.Embed(title='Battlepass Points', timestamp=current_time)
                 embed.set_author(name=f'Requested by {ctx.author.name}', icon_url=ctx.author.avatar)
                 embed.add_field(name='', value='Sorry, you can only claim points every 15 minutes.', inline=False)
-                embed.add_field(name='', value=f'Your next redemption time is: {next_redemption_time}', inline=False)
+                embed.add_field(name='', value=f'Your next redemption time is: {utils.format_epoch(next_redemption)}', inline=False)
                 await ctx.send(embed=embed)
 
                 logging.info(
@@ -139,27 +150,39 @@ class BattlepassCog(commands.Cog):
         guild_id = ctx.author.guild.id
         guild_name = ctx.author.guild.name
 
-        daily_redemption_str = utils.retrieve_daily_redemption_time(user_id=user_id)
+        current_time = datetime.datetime.now()
+        current_epoch = int(current_time.timestamp())
+
+        # Users still on cooldown are turned away without reading their record
+        next_redemption = await utils.get_state().get_cooldown('daily', user_id)
+        on_cooldown = next_redemption is not None and current_epoch < next_redemption
+        record = None if on_cooldown else await utils.get_battlepass_record(user_id=user_id)
 
-        if daily_redemption_str:
-            last_redeemed = datetime.datetime.strptime(daily_redemption_str, '%Y-%m-%d %H:%M:%S.%f')
-            current_time = datetime.datetime.now()
-            time_since_redemption = current_time - last_redeemed
-            next_redemption_time = (last_redeemed + datetime.timedelta(hours=24)).strftime('%Y-%m-%d %I:%M %p')
+        if record or on_cooldown:
+            if record:
+                next_redemption = (record.daily_redemption or 0) + utils.DAILY_COOLDOWN
+
+            # Another process or a concurrent command may have just redeemed
+            if current_epoch >= next_redemption:
+                running = await utils.get_state().acquire_cooldown('daily', user_id, current_epoch + utils.DAILY_COOLDOWN)
+                if running is not None:
+                    next_redemption = running
+            elif record:
+                # Keep the cooldown the record shows, so repeat attempts are turned away without a read
+                await utils.get_state().acquire_cooldown('daily', user_id, next_redemption)
 
             # Check if it has been at least 24 hours
-            if time_since_redemption.total_seconds() >= 86400: # 24 hours = 86400 seconds
-                points = utils.retrieve_points(user_id=user_id)
+            if current_epoch >= next_redemption:
                 points_gained = 100
 
-                utils.update_points(user_id=user_id, points=(points_gained + points))
-                utils.update_daily_redemption_time(user_id=user_id, current_time=current_time)
+                points = await utils.add_points(user_id=user_id, points=points_gained)
+                await utils.update_daily_redemption_time(user_id=user_id, current_time=current_epoch)
 
                 embed = discord.Embed(title='Battlepass Points', timestamp=current_time)
                 embed.set_author(name=f'Requested by {user_name}', icon_url=ctx.author.avatar)
                 embed.set_thumbnail(url='https://cdn4.iconfinder.com/data/icons/stack-of-coins/100/coin-03-512.png')
-                embed.add_field(name=f'You\'ve been awarded {points_gained} points!', value=f'Updated points: {points + points_gained}', inline=False)
-                embed.add_field(name='', value=f'Your next redemption time is: {(current_time + datetime.timedelta(hours=24)).strftime("%Y-%m-%d %I:%M %p")}', inline=False)
+                embed.add_field(name=f'You\'ve been awarded {points_gained} points!', value=f'Updated points: {points}', inline=False)
+                embed.add_field(name='', value=f'Your next redemption time is: {utils.format_epoch(current_epoch + utils.DAILY_COOLDOWN)}', inline=False)
                 await ctx.send(embed=embed)
 
                 logging.info('Successfully awarded %d points to [%s:%s] in server [%s:%s].',
@@ -171,7 +194,7 @@ class BattlepassCog(commands.Cog):
                 embed = discord.Embed(title='Battlepass Points', timestamp=current_time)
                 embed.set_author(name=f'Requested by {ctx.author.name}', icon_url=ctx.author.avatar)
                 embed.add_field(name='', value='Sorry, you can only claim daily points every 24 hours.', inline=False)
-                embed.add_field(name='', value=f'Your next redemption time is: {next_redemption_time}', inline=False)
+                embed.add_field(name='', value=f'Your next redemption time is: {utils.format_epoch(next_redemption)}', inline=False)
                 await ctx.send(embed=embed)
 
                 logging.info(
@@ -197,20 +220,27 @@ class BattlepassCog(commands.Cog):
         guild_id = ctx.author.guild.id
         guild_name = ctx.author.guild.name
 
-        current_level = utils.retrieve_level(user_id=user_id)
-        points = utils.retrieve_points(user_id=user_id)
+        record = await utils.get_battlepass_record(user_id=user_id)
 
-        if points:
+        if record:
+            current_level = record.level
+            points = record.points
             points_to_level_up = utils.points_to_level_up(current_level)
             embed = discord.Embed(title='Battlepass Tier Up', timestamp=datetime.datetime.now())
             embed.set_author(name=user_name, icon_url=ctx.author.avatar)
 
+            leveled_up = False
             if points >= points_to_level_up:
-                utils.update_level(user_id=user_id, level=(current_level + 1))
-                utils.update_points(user_id=user_id, points=(points - points_to_level_up))
-
+                # Applied only if the level and balance still allow it
+                result = await utils.level_up(user_id=user_id, level=current_level, cost=points_to_level_up)
+                if result is not None:
+                    leveled_up, current_level, points = result
+                    if not leveled_up:
+                        points_to_level_up = utils.points_to_level_up(current_level)
+
+            if leveled_up:
                 embed.set_thumbnail(url='https://res.cloudinary.com/teepublic/image/private/s--V423wCbg--/t_Resized%20Artwork/c_fit,g_north_west,h_954,w_954/co_000000,e_outline:48/co_000000,e_outline:inner_fill:48/co_ffffff,e_outline:48/co_ffffff,e_outline:inner_fill:48/co_bbbbbb,e_outline:3:1000/c_mpad,g_center,h_1260,w_1260/b_rgb:eeeeee/t_watermark_lock/c_limit,f_auto,h_630,q_90,w_630/v1535464012/production/designs/3077990_0.jpg')
-                embed.add_field(name=f'You leveled up to level: {current_level + 1}', value=f'Points after tier up: {points - points_to_level_up}', inline=False)
+                embed.add_field(name=f'You leveled up to level: {current_level}', value=f'Points after tier up: {points}', inline=False)
 
                 logging.info('[%s:%s] spent %s points to level up in server [%s:%s]',
                              user_name, utils.decimal_to_hex(user_id),
@@ -240,15 +270,13 @@ class BattlepassCog(commands.Cog):
 
         if user:
             # Check if user is in same guild as ctx.author
-            user_id = utils.get_user_id(user_name=user, guild_id=ctx.author.guild.id)
+            user_id = await utils.get_user_id(user_name=user, guild_id=ctx.author.guild.id)
             if user_id:
-                user_id = int(user_id[0])
-                points = utils.retrieve_points(user_id=user_id)
-                level = utils.retrieve_level(user_id=user_id)
-                if points:
+                record = await utils.get_battlepass_record(user_id=int(user_id[0]))
+                if record:
                     embed = discord.Embed(title=f'[{guild_name}] Battlepass Progress', timestamp=datetime.datetime.now())
                     embed.set_author(name=user)
-                    embed.add_field(name=f'Level: {level}', value=f'Points: {points}', inline=False)
+                    embed.add_field(name=f'Level: {record.level}', value=f'Points: {record.points}', inline=False)
 
                     await ctx.send(embed=embed)
                 else:
@@ -257,14 +285,13 @@ class BattlepassCog(commands.Cog):
                 await ctx.send(f'`{user}` is either not in this guild or has not registered for the battlepass.')
         else:
             # Get user points and level
-            points = utils.retrieve_points(user_id=user_id)
-            level = utils.retrieve_level(user_id=user_id)
+            record = await utils.get_battlepass_record(user_id=user_id)
 
-            if points:
+            if record:
                 embed = discord.Embed(title=f'[{guild_name}] Battlepass Progress', timestamp=datetime.datetime.now())
                 embed.set_author(name=ctx.author.name)
                 embed.set_thumbnail(url=ctx.author.avatar)
-                embed.add_field(name=f'Level: {level}', value=f'Points: {points}', inline=False)
+                embed.add_field(name=f'Level: {record.level}', value=f'Points: {record.points}', inline=False)
 
                 await ctx.send(embed=embed)
             else:
@@ -282,7 +309,7 @@ class BattlepassCog(commands.Cog):
         embed = discord.Embed(title='Top 5 Battlepass Members', description='Sorted by level and points.', timestamp=datetime.datetime.now())
         embed.set_thumbnail(url='https://ih1.redbubble.net/image.660900869.4748/pp,504x498-pad,600x600,f8f8f8.u8.jpg')
 
-        results = utils.retrieve_top_five(guild_id=guild_id)
+        results = await utils.retrieve_top_five(guild_id=guild_id)
         for result in results:
             user_name, level, points = result
             embed.add_field(name=user_name, value=f'Level: {level} Points: {points}', inline=False)
@@ -290,5 +317,106 @@ class BattlepassCog(commands.Cog):
         await ctx.send(embed=embed)
 
 
+    @commands.command()
+    async def top(self, ctx, count: int = 10):
+        """
+        Returns the top battlepass members, ten per page.
+        """
+        logging.info('Top command submitted by [%s]', ctx.author.name)
+        guild_id = ctx.author.guild.id
+        size = await utils.retrieve_ranking_size(guild_id=guild_id)
+        count = max(1, min(count, TOP_MAX_COUNT, size or 1))
+
+        view = LeaderboardView(guild_id, count, ctx.author.id)
+        view.message = await ctx.send(embed=await view.build_embed(), view=view if view.pages > 1 else None)
+
+
+    @commands.command()
+    async def rank(self, ctx, user=None):
+        """
+        Returns a member's position on the guild leaderboard.
+        """
+        logging.info('Rank command submitted by [%s]', ctx.author.name)
+        guild_id = ctx.author.guild.id
+
+        if user:
+            user_id = await utils.find_ranked_user(guild_id=guild_id, user_name=user)
+            if user_id is None:
+                await ctx.send(f'`{user}` is either not in this guild or has not registered for the battlepass.')
+                return
+        else:
+            user_id = ctx.author.id
+
+        rank = await utils.retrieve_rank(guild_id=guild_id, user_id=user_id)
+        if rank is None:
+            await ctx.send('You\'re not registered in the battlepass yet. Use the `$register` command to get started.')
+            return
+
+        position, user_name, level, points = rank
+        size = await utils.retrieve_ranking_size(guild_id=guild_id)
+        embed = discord.Embed(title=f'[{ctx.author.guild.name}] Battlepass Rank', timestamp=datetime.datetime.now())
+        embed.set_author(name=user_name)
+        embed.add_field(name=f'Rank: #{position} of {size}', value=f'Level: {level} Points: {points}', inline=False)
+
+        await ctx.send(embed=embed)
+
+
+TOP_PAGE_SIZE = 10
+TOP_MAX_COUNT = 100
+
+class LeaderboardView(discord.ui.View):
+    """
+    Previous/next buttons for paging through `$top` results.
+    Pages are fetched from the guild's ranking on each click.
+    """
+    def __init__(self, guild_id: int, count: int, author_id: int):
+        super().__init__(timeout=120)
+        self.guild_id = guild_id
+        self.count = count
+        self.author_id = author_id
+        self.page = 0
+        self.pages = -(-count // TOP_PAGE_SIZE)
+        self.message = None
+        self._sync_buttons()
+
+    async def build_embed(self) -> discord.Embed:
+        """
+        Builds the embed for the current page.
+        """
+        start = self.page * TOP_PAGE_SIZE
+        size = min(TOP_PAGE_SIZE, self.count - start)
+
+        rows = await utils.retrieve_ranking(guild_id=self.guild_id, count=size, start=start)
+
+        embed = discord.Embed(title=f'Top {self.count} Battlepass Members', description='Sorted by level and points.', timestamp=datetime.datetime.now())
+        for position, (user_name, level, points) in enumerate(rows, start=start + 1):
+            embed.add_field(name=f'#{position} {user_name}', value=f'Level: {level} Points: {points}', inline=False)
+        embed.set_footer(text=f'Page {self.page + 1}/{self.pages}')
+        return embed
+
+    def _sync_buttons(self) -> None:
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.pages - 1
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.author_id
+
+    async def on_timeout(self) -> None:
+        if self.message:
+            await self.message.edit(view=None)
+
+    @discord.ui.button(label='Previous', style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page -= 1
+        self._sync_buttons()
+        await interaction.response.edit_message(embed=await self.build_embed(), view=self)
+
+    @discord.ui.button(label='Next', style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        self._sync_buttons()
+        await interaction.response.edit_message(embed=await self.build_embed(), view=self)
+
+
 async def setup(bot):
     await bot.add_cog(BattlepassCog(bot))
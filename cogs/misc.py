@@ -3,12 +3,10 @@ Misc commands for the bot that don't fit in other cogs.
 """
 import random
 import logging
-import requests
 import datetime
 
 import discord
 from discord.ext import commands
-from bs4 import BeautifulSoup
 
 import utils
 
@@ -52,7 +50,9 @@ class MiscCog(commands.Cog):
                         `$daily` - {utils.get_command_help('daily')['description']}\n
                         `$register` - {utils.get_command_help('register')['description']}\n
                         `$tierup` - {utils.get_command_help('tierup')['description']}\n
-                        `$top5` - {utils.get_command_help('top5')['description']}'''
+                        `$top5` - {utils.get_command_help('top5')['description']}\n
+                        `$top` - {utils.get_command_help('top')['description']}\n
+                        `$rank` - {utils.get_command_help('rank')['description']}'''
 
             shop_commands = f'''`$buy` - {utils.get_command_help('buy')['description']}\n
                         `$inventory` - {utils.get_command_help('inventory')['description']}\n
@@ -92,11 +92,16 @@ class MiscCog(commands.Cog):
         """
         logging.info('discordstatus command submitted by [%s]', ctx.author.name)
 
+        # Imported on first use to keep startup fast
+        import requests
+        from bs4 import BeautifulSoup
+
         # Define the URL of the Discord Status page
         url = "https://discordstatus.com/"
 
         # Send a GET request to the website
-        response = requests.get(url)
+        with utils.timed('http'):
+            response = requests.get(url)
 
         # Check if the request was successful (status code 200)
         if response.status_code == 200:
@@ -158,11 +163,15 @@ class MiscCog(commands.Cog):
         """
         logging.info('Ufc command submitted by [%s]', ctx.author.name)
 
+        import requests
+        from bs4 import BeautifulSoup
+
         url = 'https://www.espn.com/mma/schedule/_/league/ufc'
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36',
         }
-        response = requests.get(url, headers=headers)
+        with utils.timed('http'):
+            response = requests.get(url, headers=headers)
 
         if response.status_code == 200:
             soup = BeautifulSoup(response.text, 'html.parser')
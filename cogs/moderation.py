@@ -22,6 +22,139 @@ class ModerationCog(commands.Cog):
         logging.info('Moderation Cog loaded.')
 
 
+    @commands.command()
+    @commands.is_owner()
+    async def cachestats(self, ctx):
+        """
+        Shows read-through cache counters, used to size the caches.
+        """
+        embed = discord.Embed(title='Cache Stats')
+
+        for name, stats in utils.cache_stats().items():
+            lines = [f'Hits: {stats["hits"]} - Misses: {stats["misses"]} ({stats["hit_rate"]:.1%})']
+            # Sizes and evictions are only known for in-process caches
+            if 'size' in stats:
+                lines.insert(0, f'Size: {stats["size"]}/{stats["maxsize"]}')
+                lines.append(f'Evictions: {stats["evictions"]} - Expired: {stats["expirations"]}')
+            else:
+                lines.append(f'Backend: {stats["backend"]}')
+            embed.add_field(name=name.capitalize(), value='\n'.join(lines), inline=False)
+
+        members = utils.member_cache.stats()
+        embed.add_field(
+            name='Members',
+            value=(f'Size: {members["size"]}/{members["maxsize"]}\n'
+                   f'Hits: {members["hits"]} - Misses: {members["misses"]} ({members["hit_rate"]:.1%})'),
+            inline=False
+            )
+
+        media = utils.media_cache.stats()
+        embed.add_field(
+            name='Media',
+            value=(f'Size: {media["size"]}/{media["maxsize"]}\n'
+                   f'Hits: {media["hits"]} - Misses: {media["misses"]} ({media["hit_rate"]:.1%})\n'
+                   f'Stream URLs reused: {media["stream_hits"]} - Expired: {media["stream_expired"]}'),
+            inline=False
+            )
+
+        await ctx.send(embed=embed)
+
+
+    @commands.command()
+    @commands.is_owner()
+    async def stats(self, ctx, count: int = 10):
+        """
+        Shows latency percentiles and errors for the busiest commands.
+        """
+        embed = discord.Embed(title='Command Stats')
+        metrics = utils.metrics
+
+        busiest = sorted(metrics.commands.items(), key=lambda item: item[1].count, reverse=True)
+        for (command, cog), histogram in busiest[:max(1, min(count, 20))]:
+            errors = sum(total for (name, _), total in metrics.errors.items() if name == command)
+            p50, p95, p99 = (histogram.quantile(q) * 1000 for q in (0.5, 0.95, 0.99))
+            embed.add_field(
+                name=f'${command} ({cog})',
+                value=f'Calls: {histogram.count} - Errors: {errors}\np50 {p50:.1f}ms - p95 {p95:.1f}ms - p99 {p99:.1f}ms',
+                inline=False
+                )
+
+        # Sub-timings summed over every command
+        calls = {}
+        for (_, kind), histogram in metrics.timings.items():
+            total = calls.setdefault(kind, [0, 0.0])
+            total[0] += histogram.count
+            total[1] += histogram.sum
+        if calls:
+            embed.add_field(
+                name='Calls',
+                value='\n'.join(f'{kind}: {n} ({seconds / n * 1000:.1f}ms avg)' for kind, (n, seconds) in sorted(calls.items())),
+                inline=False
+                )
+
+        extraction = utils.extraction_executor.stats()
+        if extraction['completed'] or extraction['waiting'] or extraction['running']:
+            wait_p50, wait_p99 = (extraction[key] * 1000 for key in ('wait_p50', 'wait_p99'))
+            embed.add_field(
+                name='Extraction',
+                value=(f'Queued: {extraction["waiting"]} - Running: {extraction["running"]}\n'
+                       f'Wait p50 {wait_p50:.1f}ms - p99 {wait_p99:.1f}ms\n'
+                       f'Timeouts: {extraction["timeouts"]} - Cancelled: {extraction["cancelled"]}'),
+                inline=False
+                )
+
+        if not embed.fields:
+            embed.description = 'No commands recorded yet.'
+        await ctx.send(embed=embed)
+
+
+    @commands.command()
+    @commands.is_owner()
+    async def reload(self, ctx, extension: str):
+        """
+        Reloads a cog in place, keeping its live state.
+        """
+        if not extension.startswith('cogs.'):
+            extension = f'cogs.{extension}'
+
+        try:
+            result = await utils.reload_cog(self.bot, extension)
+        except commands.ExtensionNotLoaded:
+            await ctx.send(f'`{extension}` is not loaded.')
+            return
+        except commands.ExtensionError as e:
+            logging.error('Reloading %s failed: %s', extension, e)
+            await ctx.send(f'Reloading `{extension}` failed, the previous version is still running: {e}')
+            return
+
+        handed_off = ', '.join(result['handed_off']) or 'none'
+        await ctx.send(f'Reloaded `{extension}` in {result["seconds"] * 1000:.1f}ms (state kept: {handed_off}).')
+
+
+    @commands.command()
+    @commands.is_owner()
+    async def shards(self, ctx):
+        """
+        Shows latency, guild count and message rate for each shard.
+        """
+        embed = discord.Embed(title='Shards')
+
+        for shard in utils.shard_monitor.snapshot():
+            latency = shard['latency']
+            latency = f'{latency * 1000:.0f}ms' if latency is not None and latency == latency and latency != float('inf') else 'n/a'
+            current = ' (this server)' if ctx.guild is not None and ctx.guild.shard_id == shard['shard_id'] else ''
+            embed.add_field(
+                name=f'Shard {shard["shard_id"]}{current}',
+                value=(f'Latency: {latency} - Guilds: {shard["guilds"]}\n'
+                       f'Messages: {shard["messages_per_sec"]:.2f}/s\n'
+                       f'Connects: {shard["connects"]} - Disconnects: {shard["disconnects"]} - Resumes: {shard["resumes"]}'),
+                inline=False
+                )
+
+        embed.set_footer(text=f'Gateway events: {utils.shard_monitor.gateway_events.rate():.1f}/s')
+        await ctx.send(embed=embed)
+
+
 async def setup(bot):
     """
     Adds moderation cog to bot.
@@ -3,14 +3,18 @@ import logging
 import asyncio
 import re
 import discord
-import spotipy
-import yt_dlp
 import traceback
 from dotenv import load_dotenv
-from spotipy.oauth2 import SpotifyClientCredentials
 from collections import deque
 from discord.ext import commands
 
+import utils
+
+
+YOUTUBE_URL_PATTERN = r'(https?://)?(www\.)?(youtube\.com|youtu\.be)/.+'
+# Queued tracks whose stream URLs are resolved ahead of time
+PREFETCH_TRACKS = int(os.getenv('MUSIC_PREFETCH_TRACKS', '2'))
+
 
 class MusicCog(commands.Cog):
     """
@@ -29,9 +33,44 @@ class MusicCog(commands.Cog):
             'youtube_include_dash_manifest': False,
             'youtube_include_hls_manifest': False,
             'default_search': 'ytsearch',
+            # Bounds how long a stalled request can hold an extraction thread
+            'socket_timeout': 10,
         }
+        # Extraction threads reuse their YoutubeDL instead of building one per search
+        self.ytdl = utils.YoutubeDLPool(self.YDL_OPTIONS)
+        # Searches for queued tracks only need the result list, not the streams
+        self.ytdl_flat = utils.YoutubeDLPool({**self.YDL_OPTIONS, 'extract_flat': 'in_playlist'})
+        self.prefetch_tasks = {}
         load_dotenv()
 
+    async def cog_load(self):
+        """
+        Takes over the queues of the cog this one replaced on reload.
+        """
+        utils.restore_state(self)
+
+    async def cog_unload(self):
+        """
+        Closes the yt-dlp instances; the reloaded cog starts its own.
+        """
+        for task in self.prefetch_tasks.values():
+            task.cancel()
+        self.ytdl.close()
+        self.ytdl_flat.close()
+
+    def export_state(self) -> dict:
+        """
+        Hands the song queues to the reloaded cog. Voice connections
+        belong to the guilds and stay connected.
+        """
+        return {'song_queues': self.SONG_QUEUES}
+
+    def import_state(self, state: dict) -> None:
+        """
+        Continues with the song queues of the cog this one replaced.
+        """
+        self.SONG_QUEUES = state['song_queues']
+
     @commands.Cog.listener()
     async def on_ready(self):
         """
@@ -39,19 +78,64 @@ class MusicCog(commands.Cog):
         """
         logging.info('Music Cog loaded.')
 
-    async def search_ytdlp_async(self, query, ydl_opts):
+    async def search_ytdlp_async(self, query, guild_id: str, flat: bool = False):
         """
-        Routine to search for YouTube stream.
+        Routine to search for YouTube stream on the extraction threads,
+        within the guild's limit. Flat searches list the results without
+        resolving their streams.
         """
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, lambda: self._extract(query, ydl_opts))
+        with utils.timed('ytdlp'):
+            return await utils.extraction_executor.run(guild_id, self._extract, query, flat)
 
-    def _extract(self, query, ydl_opts):
+    def _extract(self, query, flat: bool = False):
         """
         Extracts YouTube info from search query.
         """
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            return ydl.extract_info(query, download=False)
+        ytdl = self.ytdl_flat if flat else self.ytdl
+        return ytdl.extract_info(query, download=False)
+
+    async def resolve_track(self, query: str, guild_id: str, stream: bool = True) -> dict | None:
+        """
+        Returns title, duration, thumbnail, webpage_url and audio_url
+        for a $play argument, or None if a search found nothing.
+        Repeat lookups are answered from utils.media_cache.
+
+        With `stream=False` only the metadata is looked up, for tracks
+        that are queued behind others: searches skip resolving the
+        stream, so `audio_url` may be None. Links are always extracted
+        in full, since that is the only way to learn their title.
+        """
+        track = utils.media_cache.get(query)
+        if track is not None and (track['audio_url'] is not None or not stream):
+            return track
+
+        if not stream and track is None and not re.match(YOUTUBE_URL_PATTERN, query):
+            lookup = self.get_search_terms(query) if self.is_spotify_url(query) else query
+            results = await self.search_ytdlp_async(lookup, guild_id, flat=True)
+            entries = results.get('entries') or []
+            if not entries:
+                return None
+            return utils.media_cache.put(query, entries[0], stream=False)
+
+        if track is not None and track['webpage_url']:
+            # Only the stream URL expired, extract the known video again
+            lookup = track['webpage_url']
+        elif self.is_spotify_url(query):
+            lookup = self.get_search_terms(query)
+        else:
+            lookup = query
+
+        info = await self.search_ytdlp_async(lookup, guild_id)
+        # Searches return a list of results, direct links a single video
+        if 'entries' in info:
+            entries = info.get('entries') or []
+            if not entries:
+                return None
+            info = entries[0]
+
+        if not info.get('webpage_url') and re.match(YOUTUBE_URL_PATTERN, query):
+            info = {**info, 'webpage_url': query}
+        return utils.media_cache.put(query, info)
 
     @commands.command(name='play')
     async def play(self, ctx: commands.Context, *, query: str):
@@ -74,52 +158,40 @@ class MusicCog(commands.Cog):
             elif voice_channel != voice_client.channel:
                 await voice_client.move_to(voice_channel)
 
-            # Check if the input is a direct YouTube URL
-            youtube_url_pattern = r'(https?://)?(www\.)?(youtube\.com|youtu\.be)/.+'
-            if re.match(youtube_url_pattern, query):
-                # Extract metadata from the direct YouTube link
-                metadata = await self.search_ytdlp_async(query, self.YDL_OPTIONS)
-                audio_url = metadata['url']
-                video_url = metadata.get('webpage_url', query)  # Use the video URL or fallback to the input URL
-                title = metadata.get('title', 'untitled')
-                song_duration = metadata.get('duration', 0)  # Duration in seconds
-                thumbnail = metadata.get('thumbnail', '')  # Thumbnail URL
-            else:
-                # If not a URL, treat it as a search query
-                if self.is_spotify_url(query):
-                    query = self.get_search_terms(query)
-
-                results = await self.search_ytdlp_async(query, self.YDL_OPTIONS)
-                tracks = results.get('entries', [])
-
-                # Check if tracks is empty
-                if not tracks:
-                    await ctx.send('No results found for your query.')
-                    return
-
-                first_track = tracks[0]
-                audio_url = first_track['url']
-                video_url = first_track.get('webpage_url', '')  # Extract the video URL
-                title = first_track.get('title', 'untitled')
-                song_duration = first_track.get('duration', 0)  # Duration in seconds
-                thumbnail = first_track.get('thumbnail', '')  # Thumbnail URL
-
+            # A track that will wait in the queue gets its stream resolved later
             guild_id = str(ctx.guild.id)
+            busy = voice_client.is_playing() or voice_client.is_paused()
+            try:
+                track = await self.resolve_track(query, guild_id, stream=not busy)
+            except utils.ExtractionCancelled:
+                # $stop was used while the song was looked up
+                return
+            except TimeoutError:
+                await ctx.send('Looking up that song took too long, try again.')
+                return
+            if track is None:
+                await ctx.send('No results found for your query.')
+                return
+
             if self.SONG_QUEUES.get(guild_id) is None:
                 self.SONG_QUEUES[guild_id] = deque()
 
-            # Add the song to the queue with all metadata
+            # Queue a reference to the track; the stream URL is resolved
+            # shortly before it plays, since it expires after a few hours
             self.SONG_QUEUES[guild_id].append({
-                'audio_url': audio_url,
-                'video_url': video_url,  # Add the video URL to the metadata
-                'title': title,
+                'query': track['webpage_url'] or query,
+                'audio_url': track['audio_url'],
+                'expires': track['expires'],
+                'video_url': track['webpage_url'],  # Add the video URL to the metadata
+                'title': track['title'],
                 'requester': ctx.author.display_name,
-                'song_duration': song_duration,
-                'thumbnail': thumbnail
+                'song_duration': track['duration'],
+                'thumbnail': track['thumbnail']
             })
 
-            if voice_client.is_playing() or voice_client.is_paused():
-                await ctx.send(f'Added to queue: **{title}** - *Requested by* {ctx.author.display_name}')
+            if busy:
+                await ctx.send(f'Added to queue: **{track["title"]}** - *Requested by* {ctx.author.display_name}')
+                self.start_prefetch(guild_id)
             else:
                 await self.play_next_song(voice_client, guild_id, ctx)
         except Exception as e:
@@ -196,6 +268,8 @@ class MusicCog(commands.Cog):
         guild_id_str = str(ctx.guild.id)
         if guild_id_str in self.SONG_QUEUES:
             self.SONG_QUEUES[guild_id_str].clear()
+        self.cancel_prefetch(guild_id_str)
+        utils.extraction_executor.cancel_guild(guild_id_str)
 
         # If something is playing or paused, stop it
         if voice_client.is_playing() or voice_client.is_paused():
@@ -213,6 +287,20 @@ class MusicCog(commands.Cog):
         if self.SONG_QUEUES[guild_id]:
             # Unpack all metadata from the deque
             song_metadata = self.SONG_QUEUES[guild_id].popleft()
+            try:
+                await self.ensure_stream(song_metadata, guild_id)
+            except utils.ExtractionCancelled:
+                return
+            except Exception as e:
+                log_error('play', e)
+                await ctx.send(f'Could not load **{song_metadata["title"]}**, skipping it.')
+                await self.play_next_song(voice_client, guild_id, ctx, send_message)
+                return
+
+            # $stop may have disconnected while the stream was resolved
+            if not voice_client.is_connected():
+                return
+
             audio_url = song_metadata['audio_url']
             video_url = song_metadata['video_url']  # Extract the video URL
             title = song_metadata['title']
@@ -225,11 +313,14 @@ class MusicCog(commands.Cog):
             def after_play(error):
                 if error:
                     print(f"Error playing {title}: {error}")
+                # The cog may have been reloaded while this song played
+                cog = self.bot.get_cog(self.qualified_name) or self
                 asyncio.run_coroutine_threadsafe(
-                    self.play_next_song(voice_client, guild_id, ctx, send_message=True), self.bot.loop
+                    cog.play_next_song(voice_client, guild_id, ctx, send_message=True), self.bot.loop
                 )
 
             voice_client.play(source, after=after_play)
+            self.start_prefetch(guild_id)
 
             # Only send the "Now Playing" message if send_message is True
             if send_message:
@@ -247,6 +338,74 @@ class MusicCog(commands.Cog):
             await voice_client.disconnect()
             self.SONG_QUEUES[guild_id] = deque()
 
+    async def ensure_stream(self, song_metadata: dict, guild_id: str) -> None:
+        """
+        Resolves the stream URL of a queued track if it has none yet or
+        it would expire before the track finishes, and fills in the
+        metadata of tracks queued by link.
+        """
+        # Prefetch and play_next_song share one lookup per track
+        resolving = song_metadata.get('resolving')
+        if resolving is None or resolving.done():
+            expires = song_metadata.get('expires') or utils.stream_expiry(song_metadata['audio_url'])
+            if song_metadata['audio_url'] is not None and utils.stream_usable(expires, song_metadata['song_duration']):
+                return
+            resolving = song_metadata['resolving'] = asyncio.ensure_future(self.resolve_stream(song_metadata, guild_id))
+            # Failures are reported to the waiters, if any are left
+            resolving.add_done_callback(lambda task: task.cancelled() or task.exception())
+        # Whoever stops waiting first must not cancel it for the other
+        await asyncio.shield(resolving)
+
+    async def resolve_stream(self, song_metadata: dict, guild_id: str) -> None:
+        """
+        Looks up a queued track again and stores its stream URL and
+        metadata on the queue entry.
+        """
+        # Tracks queued before references were stored only have their page URL
+        query = song_metadata.get('query') or song_metadata['video_url']
+        track = await self.resolve_track(query, guild_id)
+        if track is None:
+            raise LookupError(f'No results for {query}')
+        song_metadata.update(
+            audio_url=track['audio_url'],
+            expires=track['expires'],
+            video_url=track['webpage_url'] or song_metadata['video_url'],
+            title=track['title'],
+            song_duration=track['duration'],
+            thumbnail=track['thumbnail'],
+        )
+
+    def start_prefetch(self, guild_id: str) -> None:
+        """
+        Resolves the streams of the next PREFETCH_TRACKS queued tracks
+        in the background, unless that is already running.
+        """
+        task = self.prefetch_tasks.get(guild_id)
+        if PREFETCH_TRACKS and (task is None or task.done()):
+            self.prefetch_tasks[guild_id] = asyncio.create_task(self.prefetch(guild_id))
+
+    def cancel_prefetch(self, guild_id: str) -> None:
+        """
+        Stops resolving streams for a guild whose queue was cleared.
+        """
+        task = self.prefetch_tasks.pop(guild_id, None)
+        if task is not None:
+            task.cancel()
+
+    async def prefetch(self, guild_id: str) -> None:
+        """
+        Resolves upcoming streams one at a time. A track that fails is
+        left for play_next_song to retry or skip.
+        """
+        queue = self.SONG_QUEUES.get(guild_id)
+        for song_metadata in list(queue or ())[:PREFETCH_TRACKS]:
+            try:
+                await self.ensure_stream(song_metadata, guild_id)
+            except utils.ExtractionCancelled:
+                return
+            except Exception as e:
+                logging.warning('Prefetching %s failed: %s', song_metadata['title'], e)
+
     @commands.command(name='queue')
     async def queue(self, ctx: commands.Context):
         """
@@ -284,13 +443,17 @@ class MusicCog(commands.Cog):
         """
         Extracts artist and song name from spotify url.
         """
+        import spotipy
+        from spotipy.oauth2 import SpotifyClientCredentials
+
         client_id = os.getenv('SPOTIFY_CLIENT_ID')
         client_secret = os.getenv('SPOTIFY_CLIENT_SECRET')
 
         auth_manager = SpotifyClientCredentials(client_id=client_id, client_secret=client_secret)
         sp = spotipy.Spotify(auth_manager=auth_manager)
 
-        track = sp.track(url)
+        with utils.timed('http'):
+            track = sp.track(url)
         logging.info('Converting spotify url %s to [%s %s]', url, track['name'], track['artists'][0]['name'])
         return f"{track['name']} {track['artists'][0]['name']}"
 
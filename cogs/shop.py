@@ -4,14 +4,14 @@ import math
 import random
 
 import discord
-import pytz
 from discord.ext import commands, tasks
 import discord.ext
 
 import utils
 
-shop = {}
-refresh_time = datetime.datetime.now()
+SHOP_REFRESH_MINUTES = 30
+SHOP_TIMEZONE = 'US/Central'
+
 
 class ShopCog(commands.Cog):
     """
@@ -19,9 +19,51 @@ class ShopCog(commands.Cog):
     """
     def __init__(self, bot):
         self.bot = bot
+        self.next_rotation = None
+
+
+    async def cog_load(self):
+        """
+        Starts the shop rotation. The first rotation waits until the
+        bot is ready, so it does not hold up startup, and after a
+        reload it waits for the rotation the old cog had scheduled.
+        """
+        utils.restore_state(self)
+        refresh_shop.before_loop(self.wait_for_rotation)
         refresh_shop.start()
 
 
+    async def cog_unload(self):
+        """
+        Stops the shop rotation.
+        """
+        refresh_shop.cancel()
+
+
+    def export_state(self) -> dict:
+        """
+        Hands the scheduled rotation time to the reloaded cog.
+        """
+        # Still waiting for a handed-off rotation if reloaded twice in a row
+        return {'next_rotation': refresh_shop.next_iteration or self.next_rotation}
+
+
+    def import_state(self, state: dict) -> None:
+        """
+        Keeps the rotation schedule of the cog this one replaced.
+        """
+        self.next_rotation = state['next_rotation']
+
+
+    async def wait_for_rotation(self):
+        """
+        Runs before the first rotation.
+        """
+        await self.bot.wait_until_ready()
+        if self.next_rotation is not None:
+            await discord.utils.sleep_until(self.next_rotation)
+
+
     @commands.Cog.listener()
     async def on_ready(self):
         """
@@ -35,6 +77,15 @@ class ShopCog(commands.Cog):
         """
         Prints the shop items and values.
         """
+        import pytz
+
+        timezone = pytz.timezone(SHOP_TIMEZONE)
+        shop, refresh_epoch = await utils.get_state().get_shop()
+        if refresh_epoch is None:
+            refresh_time = datetime.datetime.now(timezone)
+        else:
+            refresh_time = datetime.datetime.fromtimestamp(refresh_epoch, timezone)
+
         embed = discord.Embed(title='Item Shop', description=f'Refreshes at {refresh_time.strftime("%H:%M %Z")}', timestamp=datetime.datetime.now())
         embed.set_author(name=f'Requested by {ctx.author.name}', icon_url=ctx.author.avatar)
         embed.set_thumbnail(url='https://wallpapercave.com/wp/wp7879327.jpg')
@@ -55,10 +106,10 @@ class ShopCog(commands.Cog):
         logging.info('Inventory command submitted by [%s:%s]', ctx.author, ctx.author.id)
         if user_name:
             # Check if user is in same guild as ctx.author
-            user_id = utils.get_user_id(user_name=user_name, guild_id=ctx.author.guild.id)
+            user_id = await utils.get_user_id(user_name=user_name, guild_id=ctx.author.guild.id)
             if user_id:
                 user_id = int(user_id[0])
-                items = utils.retrieve_inventory(user_id=user_id)
+                items = await utils.retrieve_inventory(user_id=user_id)
                 if items:
                     embed = discord.Embed(title='Inventory', timestamp=datetime.datetime.now())
                     embed.set_author(name=user_name)
@@ -72,7 +123,7 @@ class ShopCog(commands.Cog):
                 await ctx.send(f'The user [{user_name}] is not in this guild or has not registered for the battlepass.')
         else:
             user_id = ctx.author.id
-            items = utils.retrieve_inventory(user_id=user_id)
+            items = await utils.retrieve_inventory(user_id=user_id)
 
             if items:
                 embed = discord.Embed(title='Inventory', timestamp=datetime.datetime.now())
@@ -93,55 +144,47 @@ class ShopCog(commands.Cog):
         user_id = ctx.author.id
         guild_id = ctx.author.guild.id
 
-        # Check if user is registered for battlepass
-        user = utils.get_user_id(user_id=user_id)
-        if user is None:
+        # Check if item is currently in shop
+        shop, _ = await utils.get_state().get_shop()
+        item = shop.get(item_name)
+        if item is None:
+            await ctx.send(f'{item_name} is not in the shop. Use `$shop` to see items in the shop.')
+            return
+
+        rarity = item[0]
+        value = item[1]
+
+        # Ownership check, point deduction and inventory insert happen in one transaction
+        result = await utils.purchase_item(
+            user_id=user_id,
+            guild_id=guild_id,
+            item_name=item_name,
+            value=value,
+            rarity=rarity,
+            purchase_date=datetime.datetime.now()
+            )
+
+        if result.status == utils.PurchaseResult.NOT_REGISTERED:
             await ctx.send('''Register for the battlepass to earn 
                            points and purchase items by using the 
                            `$register` command.''')
             return
 
-        # Check if item is currently in shop
-        item = shop.get(item_name)
-        if item:
-            # Check if user already owns the item
-            owned_item = utils.retrieve_owned_item(user_id=user_id, item_name=item_name)
-            if owned_item:
-                await ctx.send('You already own this item.')
-                return
+        if result.status == utils.PurchaseResult.ALREADY_OWNED:
+            await ctx.send('You already own this item.')
+            return
 
-            # Check if user has enough points to purchase item
-            points = int(utils.retrieve_points(user_id=user_id))
-            rarity = item[0]
-            value = item[1]
-
-            embed = discord.Embed(title='Item Purchase', timestamp=datetime.datetime.now())
-            embed.set_author(name=f'Requested by {ctx.author.name}', icon_url=ctx.author.avatar)
-
-            if points >= value:
-                # Deduct item value from user points
-                utils.update_points(user_id=user_id, points=points - value)
-
-                # Add item to user inventory
-                utils.update_inventory(
-                    user_id=user_id,
-                    guild_id=guild_id,
-                    item_name=item_name,
-                    value=value,
-                    rarity=rarity,
-                    purchase_date=datetime.datetime.now()
-                    )
-
-                embed.add_field(name=f'{item_name} has been added to your inventory', value='View your inventory by using `$inventory`.', inline=False)
-                embed.add_field(name='', value=f'Points after purchase: {points - value}', inline=False)
-            else:
-                embed.add_field(name=f'You do not have enough points to purchase {item_name}.', value='', inline=False)
-                embed.add_field(name='', value=f'Your points: {points}', inline=False)
-                embed.add_field(name='', value=f'{item_name}: {value} points.', inline=False)
-            await ctx.send(embed=embed)
+        embed = discord.Embed(title='Item Purchase', timestamp=datetime.datetime.now())
+        embed.set_author(name=f'Requested by {ctx.author.name}', icon_url=ctx.author.avatar)
+
+        if result.status == utils.PurchaseResult.PURCHASED:
+            embed.add_field(name=f'{item_name} has been added to your inventory', value='View your inventory by using `$inventory`.', inline=False)
+            embed.add_field(name='', value=f'Points after purchase: {result.points}', inline=False)
         else:
-            await ctx.send(f'{item_name} is not in the shop. Use `$shop` to see items in the shop.')
-            return
+            embed.add_field(name=f'You do not have enough points to purchase {item_name}.', value='', inline=False)
+            embed.add_field(name='', value=f'Your points: {result.points}', inline=False)
+            embed.add_field(name='', value=f'{item_name}: {value} points.', inline=False)
+        await ctx.send(embed=embed)
 
 
     @commands.command()
@@ -181,7 +224,7 @@ class ShopCog(commands.Cog):
                 return
 
             # If all args are valid, add to shop_submission table
-            utils.create_shop_submission(
+            await utils.create_shop_submission(
                 user_id=user_id,
                 user_name=user_name,
                 submit_time=datetime.datetime.now(),
@@ -212,38 +255,34 @@ class ShopCog(commands.Cog):
         embed = discord.Embed(title='Item Submissions', timestamp=datetime.datetime.now())
         # embed.set_thumbnail(url='')
 
-        items = utils.retrieve_shop_submissions()
+        items = await utils.retrieve_shop_submissions()
         for item in items:
             embed.add_field(name=f'{item[5]}: {item[4]}', value=f'Submitted by: {item[2]}', inline=False)
 
         await ctx.send(embed=embed)
 
 
-@tasks.loop(minutes=30)
+@tasks.loop(minutes=SHOP_REFRESH_MINUTES)
 async def refresh_shop():
     """
     Updates shop with ten new items every thirty minutes.
+    When several bot processes share state, only the one
+    that claims the rotation picks the new items.
     """
-    global shop
-    shop.clear()
+    state = utils.get_state()
+    if not await state.claim('shop_rotation', ttl=SHOP_REFRESH_MINUTES * 60 - 60):
+        return
 
-    shop_items = utils.retrieve_shop_items()
+    shop = {}
+    shop_items = await utils.retrieve_shop_items()
     for item in shop_items:
         item_name = item[0]
         rarity = item[1]
         value = calculate_value(rarity)
         shop[item_name] = [rarity, value]
 
-    current_time = datetime.datetime.now(pytz.timezone('US/Central'))
-    set_shop_refresh_time(current_time + datetime.timedelta(minutes=30))
-
-
-def set_shop_refresh_time(timestamp):
-    """
-    Updates shop refresh time whenever refresh_shop task runs.
-    """
-    global refresh_time
-    refresh_time = timestamp
+    refresh_time = int(datetime.datetime.now().timestamp()) + SHOP_REFRESH_MINUTES * 60
+    await state.set_shop(shop, refresh_time)
 
 
 def calculate_value(rarity: str) -> int:
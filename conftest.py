@@ -0,0 +1,3 @@
+"""
+Keeps the repository root importable when running `pytest` directly.
+"""
@@ -0,0 +1,98 @@
+"""
+Tests for the Redis state backend against fakeredis. Two RedisState
+instances sharing one fake server stand in for two bot processes.
+"""
+import time
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+from utils.cache import MISSING
+from utils.records import BattlepassRecord
+from utils.state import RedisState
+
+
+RECORD = BattlepassRecord(1, 1, 1000, 1, 0, 0, 'user1')
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def fields(record):
+    return [getattr(record, name) for name in BattlepassRecord.__slots__]
+
+
+@pytest.fixture
+def processes():
+    server = fakeredis.FakeServer()
+    return RedisState(fakeredis.FakeAsyncRedis(server=server)), RedisState(fakeredis.FakeAsyncRedis(server=server))
+
+
+def test_fill_is_stored_when_nothing_was_written(processes):
+    first, second = processes
+
+    async def scenario():
+        token = await first.cache_token('battlepass', 1)
+        await first.cache_fill('battlepass', 1, RECORD, token)
+        return await second.cache_get('battlepass', 1)
+
+    assert fields(run(scenario())) == fields(RECORD)
+
+
+def test_fill_is_rejected_after_cache_update_in_other_process(processes):
+    first, second = processes
+
+    async def scenario():
+        token = await first.cache_token('battlepass', 1)
+        # The other process writes the row after this one read it
+        await second.cache_update('battlepass', 1, lambda record: record)
+        await first.cache_fill('battlepass', 1, RECORD, token)
+        return await first.cache_get('battlepass', 1)
+
+    assert run(scenario()) is MISSING
+
+
+def test_fill_is_rejected_after_invalidate_in_other_process(processes):
+    first, second = processes
+
+    async def scenario():
+        token = await first.cache_token('inventory', 1)
+        await second.cache_invalidate('inventory', 1)
+        await first.cache_fill('inventory', 1, (('item1', 10, 'Common'),), token)
+        return await second.cache_get('inventory', 1)
+
+    assert run(scenario()) is MISSING
+
+
+def test_write_to_other_key_does_not_reject_fill(processes):
+    first, second = processes
+
+    async def scenario():
+        token = await first.cache_token('battlepass', 1)
+        await second.cache_invalidate('battlepass', 2)
+        await first.cache_fill('battlepass', 1, RECORD, token)
+        return await first.cache_get('battlepass', 1)
+
+    assert fields(run(scenario())) == fields(RECORD)
+
+
+def test_acquire_cooldown_is_set_once(processes):
+    first, second = processes
+    until = int(time.time()) + 60
+
+    async def scenario():
+        acquired = await first.acquire_cooldown('points', 1, until)
+        # A later redemption from any process sees the running cooldown
+        running = await second.acquire_cooldown('points', 1, until + 30)
+        stored = await second.get_cooldown('points', 1)
+        ttl = await first.client.ttl(first._key('cooldown', 'points', 1))
+        return acquired, running, stored, ttl
+
+    acquired, running, stored, ttl = run(scenario())
+    assert acquired is None
+    assert running == until
+    assert stored == until
+    assert 0 < ttl <= 60
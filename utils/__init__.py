@@ -1,12 +1,34 @@
 from .change_tables import add_column_to_table, print_table_columns
 from .modify_db import set_daily_redemption, update_user_points, create_battlepass_entry
-from .misc import decimal_to_hex
-from .commands import calculate_points, points_to_level_up, get_command_help
+from .misc import decimal_to_hex, format_epoch
+from .commands import calculate_points, points_to_level_up, get_command_help, POINTS_COOLDOWN, DAILY_COOLDOWN
+from .db_connection import ConnectionManager, configure_database, get_manager, close_database
+from .db_worker import run_in_db_thread, shutdown_db_worker
+from .migrations import MIGRATIONS, migrate, run_migrations, schema_version
+from .metrics import metrics, timed, command_started, command_finished, command_failed, render_prometheus, start_metrics_server, stop_metrics_server, METRICS_PORT
+from .telemetry import COMMAND_TELEMETRY, CommandRecorder, record_command, start_command_telemetry, stop_command_telemetry, flush_command_requests, get_command_recorder
+from .write_behind import DB_WRITE_BEHIND, WriteBehindBuffer, start_write_behind, stop_write_behind, flush_write_behind, get_write_behind
 
 from .db_interface import get_user_id, create_user, retrieve_points, update_points, retrieve_level, create_shop_item, create_shop_submission
 from .db_interface import retrieve_redemption_time, retrieve_daily_redemption_time, update_redemption_time, update_daily_redemption_time
 from .db_interface import update_level, retrieve_inventory, update_inventory, retrieve_top_five, retrieve_shop_items, retrieve_owned_item
-from .db_interface import retrieve_shop_submission, retrieve_shop_submissions, create_command_request
+from .db_interface import retrieve_shop_submission, retrieve_shop_submissions, create_command_request, get_battlepass_record
+from .db_interface import purchase_item, add_points, level_up, cache_stats, load_leaderboards, load_cooldowns
+from .db_interface import retrieve_ranking, retrieve_ranking_size, retrieve_rank, find_ranked_user
+from .leaderboard import Leaderboard, leaderboards
+from .shop_catalog import RARITY_COUNTS, ShopCatalog, shop_catalog
+from .cache import LRUCache, MISSING
+from .cooldowns import COOLDOWNS, CooldownEngine
+from .gateway import MEMBER_CACHE, GATEWAY_PRESENCES, CachedMember, gateway_options, member_cache
+from .ytdl_pool import YoutubeDLPool
+from .extraction import EXTRACT_TIMEOUT, ExtractionCancelled, ExtractionExecutor, extraction_executor
+from .media_cache import MediaCache, media_cache, normalize_query, stream_expiry, stream_usable
+from .logs import JsonFormatter, configure_logging, stop_logging
+from .reload import reload_cog, restore_state
+from .startup import StartupTimer, startup_timer, log_startup_report
+from .shards import SHARD_MODE, IdentifyLimiter, ShardMonitor, create_bot, shard_monitor
+from .state import StateBackend, MemoryState, RedisState, configure_state, get_state, close_state
+from .records import BattlepassRecord, PurchaseResult
 
 __version__ = '0.0.1'
 __author__ = 'dewisbrown'
@@ -0,0 +1,148 @@
+"""
+Bounded in-memory cache used in front of database reads.
+"""
+import time
+import threading
+from collections import OrderedDict
+
+
+MISSING = object()
+
+
+class LRUCache:
+    """
+    Least-recently-used cache with an optional time-to-live.
+    Every write or invalidation bumps `generation` and records it as
+    the key's last write. A reader passes the generation it saw before
+    reading to `fill`, which is refused only if that key was written
+    since, so writes to other keys do not discard the fill.
+    """
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = 0
+        # key: generation of its last write, oldest first. Keys dropped
+        # from here count as written at `_written_floor`
+        self._written = OrderedDict()
+        self._written_floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _expired(self, expires_at) -> bool:
+        return expires_at is not None and expires_at <= time.monotonic()
+
+    def get(self, key, default=MISSING):
+        """
+        Returns the cached value for key, or `default` on a miss.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if not self._expired(expires_at):
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def peek(self, key, default=MISSING):
+        """
+        Returns the cached value for key without counting a lookup or
+        refreshing its position, or `default`.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or self._expired(entry[0]):
+                return default
+            return entry[1]
+
+    def _mark_written(self, key) -> None:
+        self.generation += 1
+        self._written[key] = self.generation
+        self._written.move_to_end(key)
+        # Bounded like the data; forgetting a key only makes fills of
+        # it that started before the forgotten write back off
+        while len(self._written) > self.maxsize:
+            _, self._written_floor = self._written.popitem(last=False)
+
+    def _store(self, key, value) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def set(self, key, value) -> None:
+        """
+        Stores a value, evicting the least recently used entry if full.
+        """
+        with self._lock:
+            self._mark_written(key)
+            self._store(key, value)
+
+    def fill(self, key, value, generation: int) -> bool:
+        """
+        Stores a value read from the database, unless the key was
+        written or invalidated since `generation` was observed.
+        """
+        with self._lock:
+            if self._written.get(key, self._written_floor) > generation:
+                return False
+            self._store(key, value)
+            return True
+
+    def update(self, key, func) -> bool:
+        """
+        Replaces a cached value with func(value) if the key is cached.
+        """
+        with self._lock:
+            self._mark_written(key)
+            entry = self._data.get(key)
+            if entry is None or self._expired(entry[0]):
+                return False
+            self._data[key] = (entry[0], func(entry[1]))
+            return True
+
+    def invalidate(self, key) -> None:
+        """
+        Drops a key from the cache.
+        """
+        with self._lock:
+            self._mark_written(key)
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Drops every entry. Counters are kept.
+        """
+        with self._lock:
+            self.generation += 1
+            self._written.clear()
+            self._written_floor = self.generation
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns size and hit/miss/eviction counters.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
@@ -39,6 +39,16 @@ top5 = {
     'syntax': '`$top5`',
     'example': '`$top5`',
 }
+top = {
+    'description': 'Displays the top battlepass members, ten per page.',
+    'syntax': '`$top`\n`$top <count>`',
+    'example': '`$top 25`',
+}
+rank = {
+    'description': 'Displays your (or another member\'s) leaderboard rank.',
+    'syntax': '`$rank`\n`$rank <user_name>`',
+    'example': '`$rank`',
+}
 buy = {
     'description': 'Purchase item from item shop.',
     'syntax': '`$buy <item_name>`',
@@ -118,6 +128,8 @@ command_help_dicts = {
     'register': register,
     'tierup': tierup,
     'top5': top5,
+    'top': top,
+    'rank': rank,
     'buy': buy,
     'inventory': inventory,
     'shop': shop,
@@ -134,6 +146,10 @@ command_help_dicts = {
     'mark': mark
 }
 
+# Seconds between redemptions
+POINTS_COOLDOWN = 15 * 60
+DAILY_COOLDOWN = 24 * 60 * 60
+
 def calculate_points(level: int) -> int:
     """
     Points awarded to user for battlepass. Double points
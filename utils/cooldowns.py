@@ -0,0 +1,72 @@
+"""
+In-memory command cooldowns keyed by (command, user_id).
+Expiry times are kept in a min-heap, so expired cooldowns are dropped
+as time passes and memory only grows with users who are currently
+on cooldown.
+"""
+import time
+import heapq
+
+from .commands import POINTS_COOLDOWN, DAILY_COOLDOWN
+
+
+# command: (battlepass column holding the last redemption, cooldown seconds)
+COOLDOWNS = {
+    'points': ('redemption_time', POINTS_COOLDOWN),
+    'daily': ('daily_redemption', DAILY_COOLDOWN),
+}
+
+
+class CooldownEngine:
+    """
+    Active cooldowns with their end times in epoch seconds.
+    """
+    def __init__(self):
+        self._until = {}
+        self._heap = []
+
+    def __len__(self) -> int:
+        self._expire(time.time())
+        return len(self._until)
+
+    def _expire(self, now: float) -> None:
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            until, key = heapq.heappop(heap)
+            # Skip heap entries left behind by a later set()
+            if self._until.get(key) == until:
+                del self._until[key]
+
+    def get(self, command: str, user_id: int) -> int | None:
+        """
+        Returns when the user's cooldown for a command ends, or None
+        if it is not on cooldown.
+        """
+        self._expire(time.time())
+        return self._until.get((command, user_id))
+
+    def set(self, command: str, user_id: int, until: int) -> None:
+        """
+        Puts a user on cooldown until epoch `until`.
+        """
+        key = (command, user_id)
+        if self._until.get(key) == until:
+            return
+        self._until[key] = until
+        heapq.heappush(self._heap, (until, key))
+
+        # Rebuild once replaced entries make up most of the heap
+        if len(self._heap) > 2 * len(self._until) + 64:
+            self._heap = [(until, key) for key, until in self._until.items()]
+            heapq.heapify(self._heap)
+
+    def acquire(self, command: str, user_id: int, until: int) -> int | None:
+        """
+        Starts a cooldown unless one is running. Returns None if it
+        was started, otherwise the epoch the running cooldown ends.
+        """
+        current = self.get(command, user_id)
+        if current is not None:
+            return current
+        self.set(command, user_id, until)
+        return None
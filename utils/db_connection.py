@@ -0,0 +1,113 @@
+"""
+Long-lived SQLite connections shared by the database workers.
+One writer connection serializes all writes, and each reader thread
+keeps its own connection so reads never wait on each other.
+"""
+import os
+import sqlite3
+import threading
+
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+)
+
+
+class ConnectionManager:
+    """
+    Hands out persistent connections to the database file. The writer is
+    only used from the write worker; readers are one per reader thread.
+    """
+    def __init__(self, db_file: str, cached_statements: int = 256, busy_timeout: float = 5.0):
+        self.db_file = db_file
+        self.cached_statements = cached_statements
+        self.busy_timeout = busy_timeout
+        self._writer = None
+        self._readers = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        Opens a new connection with the tuned pragmas applied.
+        """
+        conn = sqlite3.connect(
+            self.db_file,
+            timeout=self.busy_timeout,
+            cached_statements=self.cached_statements,
+            check_same_thread=False
+            )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def writer(self) -> sqlite3.Connection:
+        """
+        Returns the single writer connection.
+        """
+        with self._lock:
+            if self._writer is None:
+                self._writer = self.connect()
+            return self._writer
+
+    def reader(self) -> sqlite3.Connection:
+        """
+        Returns the reader connection owned by the calling thread.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self.connect()
+            self._local.conn = conn
+            with self._lock:
+                self._readers.append(conn)
+        return conn
+
+    def close(self) -> None:
+        """
+        Closes every connection opened by this manager.
+        """
+        with self._lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        self._local = threading.local()
+
+
+_manager = None
+
+def configure_database(db_file: str, **kwargs) -> ConnectionManager:
+    """
+    Points the shared connection manager at a database file.
+    Any connections to the previous file are closed.
+    """
+    global _manager
+    if _manager is not None:
+        _manager.close()
+    _manager = ConnectionManager(db_file, **kwargs)
+    return _manager
+
+def get_manager() -> ConnectionManager:
+    """
+    Returns the shared connection manager, using DB_PATH by default.
+    """
+    if _manager is None:
+        configure_database(os.getenv('DB_PATH'))
+    return _manager
+
+def close_database() -> None:
+    """
+    Closes the shared connection manager's connections.
+    """
+    global _manager
+    if _manager is not None:
+        _manager.close()
+        _manager = None
@@ -1,24 +1,42 @@
 """
-Using to minimize re-written code in cog files. 
+Using to minimize re-written code in cog files.
 Provides a way to input and retreive data from database.
+Every function is a coroutine that runs on a database worker thread,
+so cogs must await them. Reads use the calling worker's reader
+connection and writes go through the single writer connection.
+Battlepass column updates may be held in the write-behind buffer, so
+reads of a user's row overlay any values that are still pending.
+Battlepass rows and inventories are also served from read-through
+caches held by the state backend, which the write functions keep
+up to date.
 """
-import sqlite3
-import os
+import time
 
-from dotenv import load_dotenv
+from .cache import MISSING
+from .cooldowns import COOLDOWNS
+from .db_connection import get_manager
+from .db_worker import db_read, db_write, run_in_db_thread
+from .leaderboard import leaderboards
+from .records import BattlepassRecord, PurchaseResult
+from .shop_catalog import RARITY_COUNTS, shop_catalog
+from .state import get_state
+from .write_behind import get_write_behind, flush_write_behind, claim_pending, stage_delta, stage_update
 
 
-load_dotenv()
-DB_FILE = os.getenv('DB_PATH')
+def cache_stats() -> dict:
+    """
+    Returns hit/miss/eviction counters for the read-through caches.
+    """
+    return get_state().cache_stats()
+
 
+@db_read
 def get_user_id(**kwargs):
     """
     Retrieves user id from battlepass table.
     Used to check if user is enrolled already.
     """
-    # Connect to the database
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    conn = get_manager().reader()
 
     conditions = []
     values = []
@@ -35,258 +53,559 @@ def get_user_id(**kwargs):
         query += f' WHERE {where_clause}'
 
     # Execute query with values from kwargs
-    cursor.execute(query, tuple(values))
+    return conn.execute(query, tuple(values)).fetchone()
+
+@db_write
+def _insert_user(user_id: int, redemption_time, user_name: str, guild_id: int, daily_redemption):
+    conn = get_manager().writer()
+
+    with conn:
+        conn.execute('''INSERT INTO battlepass (
+                     user_id, guild_id, points, redemption_time,
+                     level, user_name, daily_redemption) VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                     (user_id, guild_id, 120, redemption_time, 1, user_name, daily_redemption))
+
+async def create_user(user_id: int, redemption_time, user_name: str, guild_id: int, daily_redemption):
+    """
+    Enters user into battlepass table, and starts the cooldowns its
+    redemption times imply so early attempts skip the database.
+    """
+    state = get_state()
+    try:
+        await _insert_user(user_id, redemption_time, user_name, guild_id, daily_redemption)
+    finally:
+        # Drop any cached "not registered" answer
+        await state.cache_invalidate('battlepass', user_id)
+    leaderboards.set(user_id, guild_id, user_name, level=1, points=120)
+
+    redeemed = {'redemption_time': redemption_time, 'daily_redemption': daily_redemption}
+    for command, (column, cooldown) in COOLDOWNS.items():
+        if redeemed[column]:
+            await state.load_cooldowns(command, [(user_id, redeemed[column] + cooldown)])
+
+def _fetch_record(user_id: int) -> BattlepassRecord | None:
+    """
+    Reads a battlepass row on the calling reader thread, with any
+    updates still waiting in the write-behind buffer applied.
+    """
+    conn = get_manager().reader()
+    query = '''SELECT user_id, guild_id, points, level,
+                      redemption_time, daily_redemption, user_name
+               FROM battlepass WHERE user_id = ?'''
+
+    buffer = get_write_behind()
+    if buffer is None:
+        result = conn.execute(query, (user_id,)).fetchone()
+        pending = None
+    else:
+        with buffer.lock:
+            result = conn.execute(query, (user_id,)).fetchone()
+            pending = buffer.pending_for(user_id)
 
-    return cursor.fetchone()
+    if result is None:
+        return None
 
-def create_user(user_id: int, redemption_time, user_name: str, guild_id: int, daily_redemption):
+    record = BattlepassRecord(*result)
+    if pending:
+        values = buffer.apply({column: getattr(record, column) for column in pending}, pending)
+        for column, value in values.items():
+            setattr(record, column, value)
+    return record
+
+async def get_battlepass_record(user_id: int) -> BattlepassRecord | None:
     """
-    Enters user into battlepass table.
+    Retrieves a user's whole battlepass row in one query, served from
+    the record cache when possible. Returns None if the user is not
+    registered.
     """
-    # Connect to the database
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    state = get_state()
+    record = await state.cache_get('battlepass', user_id)
+    if record is not MISSING:
+        return record
 
-    cursor.execute('''INSERT INTO battlepass (
-                   user_id, guild_id, points, redemption_time, 
-                   level, user_name, daily_redemption) VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                   (user_id, guild_id, 120, redemption_time, 1, user_name, daily_redemption))
-    conn.commit()
+    token = await state.cache_token('battlepass', user_id)
+    record = await run_in_db_thread(_fetch_record, user_id, write=False)
+    await state.cache_fill('battlepass', user_id, record, token)
+    return record
 
-def retrieve_points(user_id: int):
+async def retrieve_points(user_id: int):
     """
     Retrieves user points from battlepass table.
     """
-    # Connect to the database
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    # Check the last awarded timestamp for the user
-    cursor.execute('SELECT points FROM battlepass WHERE user_id = ?', (user_id,))
-    result = cursor.fetchone()
-    conn.close()
+    record = await get_battlepass_record(user_id)
 
-    return result[0]
+    if record:
+        return record.points
+    else:
+        return None
 
-def retrieve_redemption_time(user_id: int):
+async def retrieve_redemption_time(user_id: int):
     """
     Retrieves timestamp of last point redemption for a user.
     """
-    # Connect to the database
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
     # Check the last awarded timestamp for the user
-    cursor.execute('SELECT redemption_time FROM battlepass WHERE user_id = ?', (user_id,))
-    result = cursor.fetchone()
-    conn.close()
+    record = await get_battlepass_record(user_id)
 
-    if result:
-        return result[0]
+    if record:
+        return record.redemption_time
     else:
         return None
 
-def retrieve_daily_redemption_time(user_id: int):
+async def retrieve_daily_redemption_time(user_id: int):
     """
     Retrieves timestamp of last daily point redemption for a user.
     """
-    # Connect to the database
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
     # Check the last awarded timestamp for the user
-    cursor.execute('SELECT daily_redemption FROM battlepass WHERE user_id = ?', (user_id,))
-    result = cursor.fetchone()
-    conn.close()
+    record = await get_battlepass_record(user_id)
 
-    if result:
-        return result[0]
+    if record:
+        return record.daily_redemption
     else:
         return None
 
-def update_redemption_time(user_id: int, current_time):
+async def retrieve_level(user_id: int):
     """
-    Updates timestamp for most recent point redemption for a user.
+    Retrieves user level.
     """
-    # Connect to the database
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    record = await get_battlepass_record(user_id)
 
-    # Check the last awarded timestamp for the user
-    cursor.execute('''UPDATE battlepass SET redemption_time = ?
-                   WHERE user_id = ?''', (current_time, user_id))
-    conn.commit()
-    conn.close()
+    if record:
+        return record.level
+    else:
+        return None
 
-def update_daily_redemption_time(user_id: int, current_time):
+@db_write
+def _write_column(user_id: int, column: str, value) -> None:
+    conn = get_manager().writer()
+
+    with conn:
+        conn.execute(f'UPDATE battlepass SET {column} = ? WHERE user_id = ?', (value, user_id))
+
+async def _update_column(user_id: int, column: str, value) -> None:
     """
-    Updates timestamp for most recent daily point redemption for a user.
+    Updates one battlepass column. The write is either staged for
+    write-behind or committed straight away, and only then is the
+    cached record updated, so another process cannot refill the cache
+    from the old row after it was invalidated.
     """
-    # Connect to the database
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    state = get_state()
+    if not stage_update(user_id, column, value):
+        try:
+            await _write_column(user_id, column, value)
+        except Exception:
+            await state.cache_invalidate('battlepass', user_id)
+            raise
 
-    # Check the last awarded timestamp for the user
-    cursor.execute('''UPDATE battlepass SET daily_redemption = ?
-                   WHERE user_id = ?''', (current_time, user_id))
-    conn.commit()
-    conn.close()
+    await state.cache_update('battlepass', user_id, lambda record: record and record.replace(**{column: value}))
+    if column in ('points', 'level'):
+        leaderboards.update(user_id, **{column: value})
 
-def update_points(user_id: int, points: int) -> None:
+async def update_redemption_time(user_id: int, current_time):
     """
-    Updates user points.
+    Updates timestamp for most recent point redemption for a user.
     """
-    # Connect to the database
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    await _update_column(user_id, 'redemption_time', current_time)
 
-    # Check the last awarded timestamp for the user
-    cursor.execute('UPDATE battlepass SET points = ? WHERE user_id = ?', (points, user_id))
-    conn.commit()
-    conn.close()
+async def update_daily_redemption_time(user_id: int, current_time):
+    """
+    Updates timestamp for most recent daily point redemption for a user.
+    """
+    await _update_column(user_id, 'daily_redemption', current_time)
 
-def retrieve_level(user_id: int):
+async def update_points(user_id: int, points: int) -> None:
     """
-    Retrieves user level.
+    Sets user points to an absolute value. Changes relative to the
+    current balance must use add_points or level_up instead, so they
+    cannot overwrite a concurrent purchase.
     """
-    # Connect to the database
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    await _update_column(user_id, 'points', points)
 
-    cursor.execute('SELECT level FROM battlepass WHERE user_id = ?', (user_id,))
-    result = cursor.fetchone()
-    conn.close()
+@db_write
+def _change_balance(user_id: int, points: int, levels: int, level: int | None, minimum: int | None) -> tuple | None:
+    conn = get_manager().writer()
 
-    if result:
-        return result[0]
-    else:
+    query = 'UPDATE battlepass SET points = points + ?, level = level + ? WHERE user_id = ?'
+    params = [points, levels, user_id]
+    if level is not None:
+        query += ' AND level = ?'
+        params.append(level)
+    if minimum is not None:
+        query += ' AND points >= ?'
+        params.append(minimum)
+
+    # The guard must see this user's buffered changes
+    with claim_pending(conn, user_id), conn:
+        changed = conn.execute(query, params).rowcount
+        result = conn.execute('SELECT level, points FROM battlepass WHERE user_id = ?', (user_id,)).fetchone()
+
+    if result is None:
+        return None
+    return bool(changed), result[0], result[1]
+
+async def _apply_balance_change(user_id: int, points: int, levels: int = 0,
+                                level: int | None = None, minimum: int | None = None) -> tuple | None:
+    """
+    Applies a points/level change in SQL and updates the cached record
+    and leaderboard from the balance the database returned.
+    """
+    state = get_state()
+    try:
+        result = await _change_balance(user_id, points, levels, level, minimum)
+    except Exception:
+        await state.cache_invalidate('battlepass', user_id)
+        raise
+
+    if result is not None:
+        _, new_level, new_points = result
+        await state.cache_update('battlepass', user_id,
+                                 lambda record: record and record.replace(level=new_level, points=new_points))
+        leaderboards.update(user_id, level=new_level, points=new_points)
+    return result
+
+async def add_points(user_id: int, points: int) -> int | None:
+    """
+    Adds points to a user's balance as an amount added in SQL, so it
+    cannot overwrite a concurrent purchase or tier up. With write-behind
+    the addition is buffered with the user's other pending changes.
+    Returns the new balance, or None if the user is not registered.
+    """
+    if not stage_delta(user_id, 'points', points):
+        result = await _apply_balance_change(user_id, points)
+        return None if result is None else result[2]
+
+    # Staging and patching the cached record happen without yielding,
+    # so no concurrent fill can already include the addition
+    await get_state().cache_update('battlepass', user_id,
+                                   lambda record: record and record.replace(points=record.points + points))
+    # Rows read now include the buffered addition
+    record = await get_battlepass_record(user_id)
+    if record is None:
         return None
+    leaderboards.update(user_id, points=record.points)
+    return record.points
 
-def update_level(user_id: int, level: int):
+async def level_up(user_id: int, level: int, cost: int) -> tuple | None:
+    """
+    Raises a user from `level` to the next one for `cost` points, only
+    if they are still at that level and can afford it. Returns
+    (leveled_up, level, points) with the values after the attempt, or
+    None if the user is not registered.
+    """
+    return await _apply_balance_change(user_id, -cost, levels=1, level=level, minimum=cost)
+
+async def update_level(user_id: int, level: int):
     """
     Update user level.
     """
-    # Connect to the database
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    await _update_column(user_id, 'level', level)
+
+@db_read
+def _fetch_inventory(user_id: int):
+    conn = get_manager().reader()
 
-    cursor.execute('UPDATE battlepass SET level = ? WHERE user_id = ?', (level, user_id,))
-    conn.commit()
-    conn.close()
+    # for item in items -> item_name = item[0], value = item[1], rarity = item[2]
+    return conn.execute('''SELECT item_name, value, rarity
+                        FROM inventory
+                        WHERE user_id = ?''', (user_id,)).fetchall()
 
-def retrieve_inventory(user_id: int):
+async def retrieve_inventory(user_id: int):
     """
-    Retrieves user inventory.
+    Retrieves user inventory, served from the inventory cache when possible.
     Format of each returned record: (item_name, value, rarity).
     """
-    # Connect to the database
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    state = get_state()
+    items = await state.cache_get('inventory', user_id)
+    if items is not MISSING:
+        return list(items)
 
-    # Return user inventory list
-    cursor.execute('''SELECT item_name, value, rarity
-                        FROM inventory
-                        WHERE user_id = ?''', (user_id,))
-    # for item in items -> item_name = item[0], value = item[1], rarity = item[2]
-    return cursor.fetchall()
+    token = await state.cache_token('inventory', user_id)
+    items = await _fetch_inventory(user_id)
+    await state.cache_fill('inventory', user_id, tuple(items), token)
+    return items
 
-def update_inventory(user_id: int,
-                     guild_id: int,
-                     item_name: str,
-                     value: int,
-                     rarity: str,
-                     purchase_date):
+@db_write
+def _insert_inventory(user_id: int, guild_id: int, item_name: str, value: int, rarity: str, purchase_date):
+    conn = get_manager().writer()
+
+    # Extract data from item_info and add to inventory
+    with conn:
+        conn.execute('''INSERT INTO inventory
+                     (user_id, guild_id, item_name, value, rarity, purchase_date)
+                     VALUES (?, ?, ?, ?, ?, ?)''',
+                     (user_id, guild_id, item_name, value, rarity, purchase_date))
+
+async def update_inventory(user_id: int,
+                           guild_id: int,
+                           item_name: str,
+                           value: int,
+                           rarity: str,
+                           purchase_date):
     """
     Creates inventory record.
     """
-    # Connect to the database
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    # Extract data from item_info and add to inventory
-    cursor.execute('''INSERT INTO inventory
-                   (user_id, guild_id, item_name, value, rarity, purchase_date) 
-                   VALUES (?, ?, ?, ?, ?, ?)''',
-                   (user_id, guild_id, item_name, value, rarity, purchase_date))
-    conn.commit()
-    conn.close()
-
-def retrieve_top_five(guild_id: int):
+    state = get_state()
+    try:
+        await _insert_inventory(user_id, guild_id, item_name, value, rarity, purchase_date)
+    except Exception:
+        await state.cache_invalidate('inventory', user_id)
+        raise
+    await state.cache_update('inventory', user_id, lambda items: items + ((item_name, value, rarity),))
+
+@db_write
+def _purchase_item(user_id: int,
+                   guild_id: int,
+                   item_name: str,
+                   value: int,
+                   rarity: str,
+                   purchase_date) -> PurchaseResult:
+    conn = get_manager().writer()
+
+    # Take the write lock up front so other processes cannot
+    # interleave between the balance check and the insert
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # The balance check below must see this user's buffered point updates
+        with claim_pending(conn, user_id):
+            owned = conn.execute('SELECT 1 FROM inventory WHERE user_id = ? AND item_name = ?',
+                                 (user_id, item_name)).fetchone()
+            if owned:
+                status = PurchaseResult.ALREADY_OWNED
+            else:
+                cursor = conn.execute('UPDATE battlepass SET points = points - ? WHERE user_id = ? AND points >= ?',
+                                      (value, user_id, value))
+                if cursor.rowcount:
+                    conn.execute('''INSERT INTO inventory
+                                 (user_id, guild_id, item_name, value, rarity, purchase_date)
+                                 VALUES (?, ?, ?, ?, ?, ?)''',
+                                 (user_id, guild_id, item_name, value, rarity, purchase_date))
+                    status = PurchaseResult.PURCHASED
+                else:
+                    status = PurchaseResult.INSUFFICIENT_POINTS
+
+            result = conn.execute('SELECT points FROM battlepass WHERE user_id = ?', (user_id,)).fetchone()
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if result is None:
+        return PurchaseResult(PurchaseResult.NOT_REGISTERED, None)
+    return PurchaseResult(status, result[0])
+
+async def purchase_item(user_id: int,
+                        guild_id: int,
+                        item_name: str,
+                        value: int,
+                        rarity: str,
+                        purchase_date) -> PurchaseResult:
+    """
+    Buys an item in one transaction: checks ownership, deducts the
+    value only if the user can afford it, and adds the item to the
+    inventory. Returns a PurchaseResult with the resulting balance.
+    """
+    state = get_state()
+    try:
+        result = await _purchase_item(user_id, guild_id, item_name, value, rarity, purchase_date)
+    except Exception:
+        await state.cache_invalidate('battlepass', user_id)
+        await state.cache_invalidate('inventory', user_id)
+        raise
+
+    if result.points is not None:
+        await state.cache_update('battlepass', user_id, lambda record: record and record.replace(points=result.points))
+        leaderboards.update(user_id, points=result.points)
+    if result.status == PurchaseResult.PURCHASED:
+        await state.cache_update('inventory', user_id, lambda items: items + ((item_name, value, rarity),))
+    return result
+
+def _ranks_in_memory() -> bool:
+    # The in-memory leaderboards only see this process's writes
+    return leaderboards.loaded and not get_state().shared
+
+async def _flush_for_ranking() -> None:
+    # Ranking reads every row in the guild, so write out buffered updates first
+    buffer = get_write_behind()
+    if buffer is not None and len(buffer):
+        await flush_write_behind()
+
+async def retrieve_top_five(guild_id: int):
     """
     Retrieve list of five highest point users.
     Format of each record returned: (user_name, level, points).
     """
-    # Connect to the database
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    return await retrieve_ranking(guild_id, 5)
 
-    # Checks top 5 users in given guild
-    query = 'SELECT user_name, level, points FROM battlepass WHERE guild_id = ? ORDER BY level DESC, points DESC LIMIT 5'
-    cursor.execute(query, (guild_id,))
-    return cursor.fetchall()
+async def retrieve_ranking(guild_id: int, count: int, start: int = 0) -> list:
+    """
+    Returns up to `count` members of a guild from zero-based position
+    `start`, ordered by level, then points.
+    Format of each record returned: (user_name, level, points).
+    """
+    if _ranks_in_memory():
+        return leaderboards.guild(guild_id).top(count, start=start)
+    await _flush_for_ranking()
+    return await _retrieve_ranking(guild_id, count, start)
 
-def retrieve_shop_items() -> list:
+async def retrieve_ranking_size(guild_id: int) -> int:
     """
-    Retrieves ten items at random from shop table. Format 
-    of each record returned: (item_name, rarity, img_url).
+    Returns how many members of a guild are ranked.
+    """
+    if _ranks_in_memory():
+        return len(leaderboards.guild(guild_id))
+    return await _retrieve_ranking_size(guild_id)
+
+async def retrieve_rank(guild_id: int, user_id: int) -> tuple | None:
+    """
+    Returns (position, user_name, level, points) of a member, with a
+    1-based position, or None if they are not ranked in the guild.
     """
-    # Can be rarity counts can be changed at any time
-    rarity_counts = {
-        'Legendary': 1,
-        'Exotic': 1,
-        'Very Rare': 1,
-        'Rare': 2,
-        'Uncommon': 2,
-        'Common': 3
-    }
+    if _ranks_in_memory():
+        leaderboard = leaderboards.guild(guild_id)
+        position = leaderboard.rank(user_id)
+        return None if position is None else (position, *leaderboard.entry(user_id))
+    await _flush_for_ranking()
+    return await _retrieve_rank(guild_id, user_id)
 
-    # Connect to sqlite database (make new if doesn't exist)
-    conn = sqlite3.connect(DB_FILE)
+async def find_ranked_user(guild_id: int, user_name: str) -> int | None:
+    """
+    Returns the id of the member of a guild with the given name, or None.
+    """
+    if _ranks_in_memory():
+        return leaderboards.guild(guild_id).find(user_name)
+    return await _find_ranked_user(guild_id, user_name)
 
-    # Create a cursor object to execute SQL commands
-    cursor = conn.cursor()
+@db_read
+def _retrieve_ranking(guild_id: int, count: int, start: int) -> list:
+    conn = get_manager().reader()
 
-    selected_items = []
+    # Ties break on user id, matching the in-memory leaderboards
+    query = '''SELECT user_name, level, points FROM battlepass WHERE guild_id = ?
+               ORDER BY level DESC, points DESC, user_id LIMIT ? OFFSET ?'''
+    return conn.execute(query, (guild_id, count, start)).fetchall()
 
-    for rarity, count in rarity_counts.items():
-        query = 'SELECT * FROM shop WHERE rarity = ? ORDER BY RANDOM() LIMIT ?'
-        cursor.execute(query, (rarity, count))
-        selected_items.extend(cursor.fetchall())
+@db_read
+def _retrieve_ranking_size(guild_id: int) -> int:
+    conn = get_manager().reader()
+    return conn.execute('SELECT COUNT(*) FROM battlepass WHERE guild_id = ?', (guild_id,)).fetchone()[0]
 
-    conn.close()
-    return selected_items
+@db_read
+def _retrieve_rank(guild_id: int, user_id: int) -> tuple | None:
+    conn = get_manager().reader()
 
-def retrieve_owned_item(user_id: int, item_name: str):
-    """
-    Retrieves item from user inventory. Returns None if user does not have item.
-    """
-    # Connect to sqlite database (make new if doesn't exist)
-    conn = sqlite3.connect(DB_FILE)
+    query = 'SELECT user_name, level, points FROM battlepass WHERE guild_id = ? AND user_id = ?'
+    row = conn.execute(query, (guild_id, user_id)).fetchone()
+    if row is None:
+        return None
 
-    # Create a cursor object to execute SQL commands
-    cursor = conn.cursor()
+    # Position is one more than the number of members ranked ahead
+    user_name, level, points = row
+    query = '''SELECT COUNT(*) FROM battlepass WHERE guild_id = ?
+               AND (level > ? OR (level = ? AND (points > ? OR (points = ? AND user_id < ?))))'''
+    ahead = conn.execute(query, (guild_id, level, level, points, points, user_id)).fetchone()[0]
+    return ahead + 1, user_name, level, points
+
+@db_read
+def _find_ranked_user(guild_id: int, user_name: str) -> int | None:
+    conn = get_manager().reader()
+    row = conn.execute('SELECT user_id FROM battlepass WHERE guild_id = ? AND user_name = ?',
+                       (guild_id, user_name)).fetchone()
+    return row[0] if row else None
+
+@db_read
+def _fetch_leaderboard_rows() -> list:
+    conn = get_manager().reader()
+    return conn.execute('SELECT user_id, guild_id, user_name, level, points FROM battlepass').fetchall()
+
+async def load_leaderboards() -> None:
+    """
+    Builds the in-memory guild leaderboards from the battlepass table.
+    Run once at startup; the write functions above keep them current.
+    Skipped when state is shared, since they would miss the writes of
+    other processes.
+    """
+    if get_state().shared:
+        return
+    buffer = get_write_behind()
+    if buffer is not None and len(buffer):
+        await flush_write_behind()
+    leaderboards.load(await _fetch_leaderboard_rows())
+
+@db_read
+def _fetch_recent_redemptions(column: str, since: int) -> list:
+    conn = get_manager().reader()
+    return conn.execute(f'SELECT user_id, {column} FROM battlepass WHERE {column} > ?', (since,)).fetchall()
+
+async def load_cooldowns() -> None:
+    """
+    Puts users who redeemed recently back on cooldown. Run once at
+    startup; afterwards the commands keep cooldowns current, so repeat
+    attempts are rejected without reading the database.
+    """
+    buffer = get_write_behind()
+    if buffer is not None and len(buffer):
+        await flush_write_behind()
+
+    state = get_state()
+    now = int(time.time())
+    for command, (column, cooldown) in COOLDOWNS.items():
+        rows = await _fetch_recent_redemptions(column, now - cooldown)
+        await state.load_cooldowns(command, [(user_id, redeemed + cooldown) for user_id, redeemed in rows])
+
+@db_read
+def _fetch_catalog_signature() -> int:
+    conn = get_manager().reader()
+    return conn.execute('SELECT version FROM shop_version').fetchone()[0]
+
+@db_read
+def _fetch_catalog() -> tuple:
+    conn = get_manager().reader()
+
+    # One transaction, so the rows match the version they are tagged with
+    with conn:
+        conn.execute('BEGIN')
+        signature = conn.execute('SELECT version FROM shop_version').fetchone()[0]
+        rows = conn.execute('SELECT item_name, rarity, img_url FROM shop').fetchall()
+    return rows, signature
+
+async def retrieve_shop_items() -> list:
+    """
+    Retrieves ten items at random from shop table. Format
+    of each record returned: (item_name, rarity, img_url).
+    Items are sampled from the in-memory catalog, which is only
+    reloaded when the shop table has changed.
+    """
+    signature = await _fetch_catalog_signature()
+    if shop_catalog.signature != signature:
+        rows, signature = await _fetch_catalog()
+        shop_catalog.load(rows, signature)
 
-    query = 'SELECT item_name FROM inventory WHERE user_id = ? AND item_name = ?'
-    cursor.execute(query, (user_id, item_name))
+    return shop_catalog.sample(RARITY_COUNTS)
 
-    return cursor.fetchone()
+async def retrieve_owned_item(user_id: int, item_name: str):
+    """
+    Retrieves item from user inventory. Returns None if user does not have item.
+    """
+    for item in await retrieve_inventory(user_id):
+        if item[0] == item_name:
+            return (item[0],)
+    return None
 
+@db_write
 def create_shop_item(item_name: str, rarity: str, img_url: str):
     """
     Enter shop item info to db table.
     """
-    # Connect to sqlite database (make new if doesn't exist)
-    conn = sqlite3.connect(DB_FILE)
-
-    # Create a cursor object to execute SQL commands
-    cursor = conn.cursor()
+    conn = get_manager().writer()
 
-    query = '''INSERT INTO shop (item_name, rarity, img_url) 
+    query = '''INSERT INTO shop (item_name, rarity, img_url)
                 VALUES (?, ?, ?)'''
-    cursor.execute(query, (item_name, rarity, img_url))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute(query, (item_name, rarity, img_url))
 
+    # Pick up the new item on the next rotation
+    shop_catalog.invalidate()
+
+@db_write
 def create_shop_submission(
         user_id: int,
         user_name: str,
@@ -296,55 +615,44 @@ def create_shop_submission(
     """
     Creates shop item in item_submissions table.
     """
-    # Connect to the database
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    conn = get_manager().writer()
 
     query = '''INSERT INTO shop_submissions
             (user_id, user_name, submit_time, item_name, rarity)
             VALUES (?, ?, ?, ?, ?)'''
 
-    cursor.execute(query,(user_id, user_name, submit_time, item_name, rarity))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute(query,(user_id, user_name, submit_time, item_name, rarity))
 
+@db_read
 def retrieve_shop_submission(item_name: str):
     """
     Retrieves shop submission by name.
     """
-    # Connect to the database
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    conn = get_manager().reader()
 
     query = 'SELECT * FROM shop_submissions WHERE item_name = ?'
-    cursor.execute(query, (item_name))
-    return cursor.fetchone()
+    return conn.execute(query, (item_name,)).fetchone()
 
+@db_read
 def retrieve_shop_submissions():
     """
     Retreives all shop submissions. Format of each returned record:
     (item_id, user_id, user_name, submit_time, item_name, rarity).
     """
-    # Connect to the database
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM shop_submissions')
-    return cursor.fetchall()
+    conn = get_manager().reader()
+    return conn.execute('SELECT * FROM shop_submissions').fetchall()
 
-# Currently not in use, not sure if needed or wanted.
+# Single inserts; command telemetry queues rows and writes them in batches instead.
+@db_write
 def create_command_request(user_id: int, guild_id: int, command: str, cog: str) -> None:
     """
     Creates record in command_request table.
     """
-    # Connect to sqlite database (make new if doesn't exist)
-    conn = sqlite3.connect(DB_FILE)
-
-    # Create a cursor object to execute SQL commands
-    cursor = conn.cursor()
+    conn = get_manager().writer()
 
     query = '''INSERT INTO command_requests
-            (user_id, guild_id, command, cog) 
+            (user_id, guild_id, command, cog)
             VALUES (?, ?, ?, ?)'''
-    cursor.execute(query, (user_id, guild_id, command, cog))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute(query, (user_id, guild_id, command, cog))
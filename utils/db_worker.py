@@ -0,0 +1,82 @@
+"""
+Runs blocking database work off the event loop.
+Reads go to a small pool of reader threads and writes to a single
+writer thread, so command handlers can await them without stalling
+the gateway.
+"""
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from .db_connection import close_database
+from .metrics import timed
+
+
+DB_READERS = int(os.getenv('DB_READERS', '4'))
+
+_read_executor = None
+_write_executor = None
+
+def get_read_executor() -> ThreadPoolExecutor:
+    """
+    Returns the reader pool, creating it on first use.
+    """
+    global _read_executor
+    if _read_executor is None:
+        _read_executor = ThreadPoolExecutor(max_workers=DB_READERS, thread_name_prefix='db-reader')
+    return _read_executor
+
+def get_write_executor() -> ThreadPoolExecutor:
+    """
+    Returns the writer thread, creating it on first use.
+    """
+    global _write_executor
+    if _write_executor is None:
+        _write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+    return _write_executor
+
+async def run_in_db_thread(func, *args, write: bool = True, **kwargs):
+    """
+    Runs func(*args, **kwargs) on a database worker and awaits the result.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_write_executor() if write else get_read_executor()
+    with timed('db_write' if write else 'db_read'):
+        return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+def _wrap(func, write: bool):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_in_db_thread(func, *args, write=write, **kwargs)
+
+    wrapper.blocking = func
+    return wrapper
+
+def db_read(func):
+    """
+    Decorator that turns a blocking read into a coroutine function
+    executed on the reader pool. The original function is kept as
+    `.blocking` for scripts that run outside the event loop.
+    """
+    return _wrap(func, write=False)
+
+def db_write(func):
+    """
+    Decorator that turns a blocking write into a coroutine function
+    executed on the writer thread.
+    """
+    return _wrap(func, write=True)
+
+def shutdown_db_worker() -> None:
+    """
+    Waits for queued database work to finish, stops the workers
+    and closes their connections.
+    """
+    global _read_executor, _write_executor
+    for executor in (_read_executor, _write_executor):
+        if executor is not None:
+            executor.shutdown(wait=True)
+    _read_executor = None
+    _write_executor = None
+    close_database()
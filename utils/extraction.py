@@ -0,0 +1,191 @@
+"""
+Dedicated worker threads for yt-dlp extraction, kept apart from the
+event loop's default executor so slow lookups cannot starve other
+blocking work. Each guild may only have a few extractions in flight,
+jobs time out, and a guild's pending jobs can be cancelled when its
+queue is cleared. Queue depth and wait times are exported as metrics.
+"""
+import os
+import time
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from .metrics import Histogram, render_histogram
+
+
+EXTRACT_WORKERS = int(os.getenv('EXTRACT_WORKERS', '4'))
+EXTRACT_PER_GUILD = int(os.getenv('EXTRACT_PER_GUILD', '2'))
+EXTRACT_TIMEOUT = float(os.getenv('EXTRACT_TIMEOUT', '30'))
+
+
+class ExtractionCancelled(Exception):
+    """
+    Raised to the caller of a job cancelled by `cancel_guild`.
+    """
+
+
+class ExtractionExecutor:
+    """
+    Runs blocking extraction calls on EXTRACT_WORKERS threads. A job
+    waits for a slot of its guild and then for a free worker, so jobs
+    queue on the event loop, where they can still be cancelled, rather
+    than inside the thread pool. A job that times out keeps its worker
+    until the call returns, since a thread cannot be interrupted.
+    """
+    def __init__(self, workers: int = EXTRACT_WORKERS, per_guild: int = EXTRACT_PER_GUILD,
+                 timeout: float = EXTRACT_TIMEOUT):
+        self.workers = workers
+        self.per_guild = per_guild
+        self.timeout = timeout
+        self._executor = None
+        self._worker_slots = None
+        self._guild_slots = {}
+        self._jobs = {}
+        self._dropped = set()
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.wait_times = Histogram()
+        self.run_times = Histogram()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ytdl')
+            self._worker_slots = asyncio.Semaphore(self.workers)
+        return self._executor
+
+    async def run(self, guild_id, func, *args, timeout: float | None = None, **kwargs):
+        """
+        Runs func(*args, **kwargs) on an extraction thread for a guild and
+        awaits the result. Raises TimeoutError when it takes longer than
+        `timeout` (EXTRACT_TIMEOUT by default) and ExtractionCancelled
+        when the guild's jobs are cancelled first.
+        """
+        call = functools.partial(func, *args, **kwargs)
+        job = asyncio.ensure_future(self._run(guild_id, call, self.timeout if timeout is None else timeout))
+        jobs = self._jobs.setdefault(guild_id, set())
+        jobs.add(job)
+        try:
+            return await job
+        except asyncio.CancelledError:
+            if job in self._dropped:
+                raise ExtractionCancelled(f'Extraction for guild {guild_id} was cancelled') from None
+            raise
+        finally:
+            jobs.discard(job)
+            self._dropped.discard(job)
+            if not jobs and self._jobs.get(guild_id) is jobs:
+                del self._jobs[guild_id]
+
+    async def _run(self, guild_id, call, timeout: float):
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        guild_slots = self._guild_slots.get(guild_id)
+        if guild_slots is None:
+            guild_slots = self._guild_slots[guild_id] = asyncio.Semaphore(self.per_guild)
+
+        worker_slots = self._worker_slots
+        queued = time.perf_counter()
+        self.waiting += 1
+        try:
+            async with guild_slots:
+                await worker_slots.acquire()
+                self.waiting -= 1
+                queued, waited = None, time.perf_counter() - queued
+                self.wait_times.observe(waited)
+
+                self.running += 1
+                started = time.perf_counter()
+                future = loop.run_in_executor(executor, call)
+                # The worker is only free again once the call returns,
+                # even if the caller stopped waiting for it
+                future.add_done_callback(lambda _: self._job_done(worker_slots, started))
+                try:
+                    return await asyncio.wait_for(asyncio.shield(future), timeout)
+                except TimeoutError:
+                    self.timeouts += 1
+                    raise
+                except asyncio.CancelledError:
+                    self.cancelled += 1
+                    raise
+        finally:
+            if queued is not None:
+                # Cancelled or failed before reaching a worker
+                self.waiting -= 1
+                self.cancelled += 1
+
+    def _job_done(self, worker_slots: asyncio.Semaphore, started: float) -> None:
+        self.running -= 1
+        self.completed += 1
+        self.run_times.observe(time.perf_counter() - started)
+        worker_slots.release()
+
+    def pending(self, guild_id) -> int:
+        """
+        Returns the number of jobs of a guild that have not finished.
+        """
+        return len(self._jobs.get(guild_id, ()))
+
+    def cancel_guild(self, guild_id) -> int:
+        """
+        Cancels every unfinished job of a guild and returns how many
+        there were. Their callers get ExtractionCancelled.
+        """
+        jobs = self._jobs.get(guild_id, set())
+        for job in jobs:
+            self._dropped.add(job)
+            job.cancel()
+        self._guild_slots.pop(guild_id, None)
+        return len(jobs)
+
+    def shutdown(self) -> None:
+        """
+        Cancels queued jobs and stops the worker threads without
+        waiting for running extractions.
+        """
+        for guild_id in list(self._jobs):
+            self.cancel_guild(guild_id)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._worker_slots = None
+
+    def stats(self) -> dict:
+        """
+        Returns queue depth, running jobs, totals and wait percentiles.
+        """
+        wait_p50, wait_p99 = (self.wait_times.quantile(q) for q in (0.5, 0.99))
+        return {
+            'waiting': self.waiting,
+            'running': self.running,
+            'completed': self.completed,
+            'timeouts': self.timeouts,
+            'cancelled': self.cancelled,
+            'wait_p50': wait_p50,
+            'wait_p99': wait_p99,
+        }
+
+    def prometheus_lines(self) -> list:
+        """
+        Returns the extraction gauges, counters and histograms in the
+        Prometheus text format.
+        """
+        lines = []
+        for name, value, help_text, kind in (
+                ('gummybot_extract_queue_depth', self.waiting, 'Extractions waiting for their guild limit or a worker.', 'gauge'),
+                ('gummybot_extract_running', self.running, 'Extractions running on a worker.', 'gauge'),
+                ('gummybot_extract_timeouts_total', self.timeouts, 'Extractions that timed out.', 'counter'),
+                ('gummybot_extract_cancelled_total', self.cancelled, 'Extractions cancelled before finishing.', 'counter')):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {value}']
+        for name, histogram, help_text in (
+                ('gummybot_extract_wait_seconds', self.wait_times, 'Time extractions waited for a worker.'),
+                ('gummybot_extract_run_seconds', self.run_times, 'Time extractions ran on a worker.')):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+            render_histogram(lines, name, {}, histogram)
+        return lines
+
+
+extraction_executor = ExtractionExecutor()
@@ -0,0 +1,89 @@
+"""
+Gateway cache policy: which intents the bot asks for, which members
+discord.py keeps in memory and whether guilds are chunked at startup.
+
+Only `$age` needs member data beyond the message author, so by default
+presences are off, only members in voice channels are cached and no
+guild is chunked. Members that are looked up by name or id are fetched
+on demand and kept in a small LRU cache instead.
+
+MEMBER_CACHE=none    cache no members
+MEMBER_CACHE=voice   members in voice channels (default)
+MEMBER_CACHE=joined  every member seen, needs the members intent
+MEMBER_CACHE=full    voice and joined, the discord.py default
+"""
+import os
+
+import discord
+from discord.ext import commands
+
+from .cache import LRUCache, MISSING
+
+
+GATEWAY_PRESENCES = os.getenv('GATEWAY_PRESENCES', '0') == '1'
+MEMBER_CACHE = os.getenv('MEMBER_CACHE', 'voice')
+CHUNK_GUILDS_AT_STARTUP = os.getenv('CHUNK_GUILDS_AT_STARTUP', '0') == '1'
+MEMBER_LRU_SIZE = int(os.getenv('MEMBER_LRU_SIZE', '1024'))
+# Nicknames and roles of fetched members go stale without the members intent
+MEMBER_LRU_TTL = float(os.getenv('MEMBER_LRU_TTL', '600'))
+
+MEMBER_CACHE_FLAGS = {
+    'none': discord.MemberCacheFlags.none,
+    'voice': lambda: discord.MemberCacheFlags(voice=True, joined=False),
+    'joined': lambda: discord.MemberCacheFlags(voice=False, joined=True),
+    'full': discord.MemberCacheFlags.all,
+}
+
+
+def gateway_options(member_cache: str = MEMBER_CACHE, presences: bool = GATEWAY_PRESENCES,
+                    chunk_guilds: bool = CHUNK_GUILDS_AT_STARTUP) -> dict:
+    """
+    Returns the intents, member_cache_flags and chunk_guilds_at_startup
+    keyword arguments for the bot.
+    """
+    try:
+        flags = MEMBER_CACHE_FLAGS[member_cache]()
+    except KeyError:
+        raise ValueError(f'Unknown MEMBER_CACHE {member_cache!r}, choose from {", ".join(MEMBER_CACHE_FLAGS)}') from None
+
+    intents = discord.Intents.default()
+    intents.message_content = True
+    intents.voice_states = True
+    intents.presences = presences
+    # Only needed to keep joined members current, or to chunk guilds
+    intents.members = flags.joined or chunk_guilds
+
+    return {
+        'intents': intents,
+        'member_cache_flags': flags,
+        'chunk_guilds_at_startup': chunk_guilds,
+    }
+
+
+member_cache = LRUCache(maxsize=MEMBER_LRU_SIZE, ttl=MEMBER_LRU_TTL)
+
+
+class CachedMember(commands.MemberConverter):
+    """
+    Member converter that keeps members fetched from Discord in
+    member_cache, so repeated lookups of an uncached member do not
+    query the gateway each time.
+    """
+    async def query_member_by_id(self, bot, guild, user_id):
+        key = (guild.id, user_id)
+        member = member_cache.get(key)
+        if member is MISSING:
+            member = await super().query_member_by_id(bot, guild, user_id)
+            if member is not None:
+                member_cache.set(key, member)
+        return member
+
+    async def query_member_named(self, guild, argument):
+        key = (guild.id, argument)
+        member = member_cache.get(key)
+        if member is MISSING:
+            member = await super().query_member_named(guild, argument)
+            if member is not None:
+                member_cache.set(key, member)
+                member_cache.set((guild.id, member.id), member)
+        return member
@@ -0,0 +1,281 @@
+"""
+In-memory battlepass leaderboards, one per guild.
+Each guild's members are kept ordered by (level, points) in an
+indexable skip list, so updates, rank lookups and page reads are
+O(log n) and never touch SQLite.
+"""
+import random
+
+
+MAX_LEVELS = 24
+
+
+class _Infinity:
+    """
+    Sorts after every key; used as the key of the tail sentinel.
+    """
+    def __lt__(self, other):
+        return False
+
+    def __le__(self, other):
+        return other is self
+
+    def __eq__(self, other):
+        return other is self
+
+    __hash__ = object.__hash__
+
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, next_nodes: list, widths: list):
+        self.key = key
+        self.next = next_nodes
+        self.width = widths
+
+
+_NIL = _Node(_Infinity(), [], [])
+
+
+class IndexableSkipList:
+    """
+    Sorted collection of unique keys supporting insert, remove,
+    positional access and position lookup in O(log n).
+    """
+    def __init__(self):
+        self.size = 0
+        self.head = _Node(None, [_NIL] * MAX_LEVELS, [1] * MAX_LEVELS)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def insert(self, key) -> None:
+        """
+        Adds a key in sorted position.
+        """
+        chain = [None] * MAX_LEVELS
+        steps_at_level = [0] * MAX_LEVELS
+        node = self.head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level].key <= key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        height = 1
+        while height < MAX_LEVELS and random.random() < 0.5:
+            height += 1
+
+        new_node = _Node(key, [None] * height, [None] * height)
+        steps = 0
+        for level in range(height):
+            prev_node = chain[level]
+            new_node.next[level] = prev_node.next[level]
+            prev_node.next[level] = new_node
+            new_node.width[level] = prev_node.width[level] - steps
+            prev_node.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(height, MAX_LEVELS):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key) -> None:
+        """
+        Removes a key. Raises KeyError if it is not present.
+        """
+        chain = [None] * MAX_LEVELS
+        node = self.head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is _NIL or target.key != key:
+            raise KeyError(key)
+
+        for level in range(len(target.next)):
+            prev_node = chain[level]
+            prev_node.width[level] += target.width[level] - 1
+            prev_node.next[level] = target.next[level]
+        for level in range(len(target.next), MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def index(self, key) -> int:
+        """
+        Returns the zero-based position of a key.
+        """
+        position = 0
+        node = self.head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+
+        target = node.next[0]
+        if target is _NIL or target.key != key:
+            raise KeyError(key)
+        return position
+
+    def slice(self, start: int, count: int) -> list:
+        """
+        Returns up to `count` keys starting at position `start`.
+        """
+        if start < 0 or start >= self.size or count <= 0:
+            return []
+
+        remaining = start + 1
+        node = self.head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+
+        keys = []
+        while node is not _NIL and len(keys) < count:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+
+class Leaderboard:
+    """
+    Members of one guild ordered by level, then points, highest first.
+    """
+    def __init__(self):
+        self._ranking = IndexableSkipList()
+        self._keys = {}
+        self._names = {}
+        self._ids_by_name = {}
+
+    def __len__(self) -> int:
+        return len(self._ranking)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._keys
+
+    def set(self, user_id: int, user_name: str, level: int, points: int) -> None:
+        """
+        Adds a member or moves them to their new position.
+        """
+        key = (-level, -points, user_id)
+        old_key = self._keys.get(user_id)
+        if old_key == key:
+            return
+        if old_key is not None:
+            self._ranking.remove(old_key)
+        self._ranking.insert(key)
+        self._keys[user_id] = key
+
+        old_name = self._names.get(user_id)
+        if old_name != user_name:
+            if old_name is not None:
+                self._ids_by_name.pop(old_name, None)
+            self._names[user_id] = user_name
+            if user_name is not None:
+                self._ids_by_name[user_name] = user_id
+
+    def update(self, user_id: int, level: int = None, points: int = None) -> bool:
+        """
+        Changes a member's level and/or points. Returns False if the
+        member is not on this leaderboard.
+        """
+        key = self._keys.get(user_id)
+        if key is None:
+            return False
+        level = -key[0] if level is None else level
+        points = -key[1] if points is None else points
+        self.set(user_id, self._names[user_id], level, points)
+        return True
+
+    def remove(self, user_id: int) -> None:
+        """
+        Drops a member from the leaderboard.
+        """
+        key = self._keys.pop(user_id, None)
+        if key is not None:
+            self._ranking.remove(key)
+            self._ids_by_name.pop(self._names.pop(user_id), None)
+
+    def rank(self, user_id: int) -> int | None:
+        """
+        Returns the member's 1-based rank, or None if not ranked.
+        """
+        key = self._keys.get(user_id)
+        if key is None:
+            return None
+        return self._ranking.index(key) + 1
+
+    def find(self, user_name: str) -> int | None:
+        """
+        Returns the user id for a member name, or None.
+        """
+        return self._ids_by_name.get(user_name)
+
+    def entry(self, user_id: int) -> tuple | None:
+        """
+        Returns (user_name, level, points) for a member, or None.
+        """
+        key = self._keys.get(user_id)
+        if key is None:
+            return None
+        return (self._names[user_id], -key[0], -key[1])
+
+    def top(self, count: int, start: int = 0) -> list:
+        """
+        Returns up to `count` entries starting at zero-based position
+        `start`. Format of each entry: (user_name, level, points).
+        """
+        return [(self._names[user_id], -level, -points)
+                for level, points, user_id in self._ranking.slice(start, count)]
+
+
+class LeaderboardIndex:
+    """
+    Every guild's leaderboard plus which guild each user belongs to.
+    """
+    def __init__(self):
+        self.loaded = False
+        self._guilds = {}
+        self._user_guilds = {}
+
+    def load(self, rows) -> None:
+        """
+        Rebuilds every leaderboard from battlepass rows of the form
+        (user_id, guild_id, user_name, level, points).
+        """
+        self._guilds = {}
+        self._user_guilds = {}
+        for user_id, guild_id, user_name, level, points in rows:
+            self.set(user_id, guild_id, user_name, level, points)
+        self.loaded = True
+
+    def set(self, user_id: int, guild_id: int, user_name: str, level: int, points: int) -> None:
+        """
+        Adds or repositions a user on their guild's leaderboard.
+        """
+        old_guild = self._user_guilds.get(user_id)
+        if old_guild is not None and old_guild != guild_id:
+            self._guilds[old_guild].remove(user_id)
+        self._user_guilds[user_id] = guild_id
+        self._guilds.setdefault(guild_id, Leaderboard()).set(user_id, user_name, level or 0, points or 0)
+
+    def update(self, user_id: int, level: int = None, points: int = None) -> bool:
+        """
+        Changes a known user's level and/or points.
+        """
+        guild_id = self._user_guilds.get(user_id)
+        if guild_id is None:
+            return False
+        return self._guilds[guild_id].update(user_id, level=level, points=points)
+
+    def guild(self, guild_id: int) -> Leaderboard:
+        """
+        Returns the leaderboard for a guild (empty if nobody is ranked).
+        """
+        return self._guilds.get(guild_id) or Leaderboard()
+
+
+leaderboards = LeaderboardIndex()
@@ -0,0 +1,147 @@
+"""
+Logging pipeline: log calls only put the record on a queue, and a
+background thread formats it and writes it to the console and the log
+file, so commands never wait on disk writes. The log file is rotated
+by size or time, optionally gzipped, and can be written as JSON lines.
+"""
+import os
+import gzip
+import json
+import queue
+import atexit
+import shutil
+import logging
+import datetime
+import logging.handlers
+
+
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+# size, time or none
+LOG_ROTATION = os.getenv('LOG_ROTATION', 'size')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN', 'midnight')
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+LOG_COMPRESS = os.getenv('LOG_COMPRESS', '0') == '1'
+
+TEXT_FORMAT = '[%(asctime)s] %(levelname)s: %(message)s [Line: %(lineno)d <%(filename)s>]'
+TEXT_DATE_FORMAT = '%I:%M:%S %p'
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats each record as one JSON object per line.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'file': record.filename,
+            'line': record.lineno,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves formatting to the listener thread. The
+    message is merged with its arguments here, since they may change
+    once the caller moves on, and tracebacks are rendered while the
+    frames still exist.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _gzip_namer(name: str) -> str:
+    return name + '.gz'
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def file_handler(path: str, rotation: str = LOG_ROTATION, compress: bool = LOG_COMPRESS) -> logging.Handler:
+    """
+    Returns the handler for the log file with the configured rotation.
+    """
+    if rotation == 'size':
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+    elif rotation == 'time':
+        handler = logging.handlers.TimedRotatingFileHandler(path, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT)
+    elif rotation == 'none':
+        return logging.FileHandler(path)
+    else:
+        raise ValueError(f'Unknown LOG_ROTATION {rotation!r}, choose from size, time, none')
+
+    if compress:
+        handler.namer = _gzip_namer
+        handler.rotator = _gzip_rotator
+    return handler
+
+
+def make_formatter(log_format: str = LOG_FORMAT) -> logging.Formatter:
+    """
+    Returns the formatter for the configured LOG_FORMAT.
+    """
+    if log_format == 'json':
+        return JsonFormatter()
+    return logging.Formatter(TEXT_FORMAT, datefmt=TEXT_DATE_FORMAT)
+
+
+_listener = None
+
+def configure_logging(path: str | None, level: int = logging.INFO, console: bool = True,
+                      log_format: str = LOG_FORMAT) -> logging.handlers.QueueListener:
+    """
+    Replaces the root handlers with a queue handler and starts the
+    listener thread that writes to the console and `path`.
+    """
+    global _listener
+    stop_logging()
+
+    handlers = []
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(make_formatter('text'))
+        handlers.append(console_handler)
+    if path is not None:
+        handler = file_handler(path)
+        handler.setFormatter(make_formatter(log_format))
+        handlers.append(handler)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(_QueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def stop_logging() -> None:
+    """
+    Writes out queued records and stops the listener thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+atexit.register(stop_logging)
@@ -0,0 +1,139 @@
+"""
+Cache of yt-dlp lookups for the music cog. Track metadata (title,
+duration, thumbnail, page URL) is kept for MEDIA_CACHE_TTL seconds,
+keyed by the normalized URL or search text. The direct audio URL is
+kept only until the expiry YouTube embeds in it, so a repeat play
+within that window needs no extraction at all, and a later one only
+re-extracts the known video instead of searching again.
+"""
+import os
+import time
+from urllib.parse import urlsplit, parse_qs
+
+from .cache import LRUCache, MISSING
+
+
+MEDIA_CACHE_SIZE = int(os.getenv('MEDIA_CACHE_SIZE', '512'))
+MEDIA_CACHE_TTL = float(os.getenv('MEDIA_CACHE_TTL', str(24 * 60 * 60)))
+# A cached audio URL must stay valid this much longer than the track
+STREAM_EXPIRY_MARGIN = 60
+
+YOUTUBE_HOSTS = ('youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com')
+
+
+def normalize_query(query: str) -> str:
+    """
+    Returns the cache key for a $play argument. YouTube links to the
+    same video share a key; other text is compared case-insensitively.
+    """
+    query = query.strip()
+    if query.startswith(('http://', 'https://', 'www.', 'youtube.com', 'youtu.be')):
+        parts = urlsplit(query if '://' in query else f'https://{query}')
+        host = parts.netloc.lower()
+        if host in YOUTUBE_HOSTS:
+            video_id = parse_qs(parts.query).get('v', [None])[0]
+            if video_id is None and parts.path.startswith('/shorts/'):
+                video_id = parts.path.split('/')[2]
+            if video_id:
+                return f'youtube:{video_id}'
+        elif host == 'youtu.be' and parts.path.strip('/'):
+            return f'youtube:{parts.path.strip("/")}'
+        return f'url:{host}{parts.path}?{parts.query}'
+    return 'search:' + ' '.join(query.lower().split())
+
+
+def stream_expiry(audio_url: str | None) -> int | None:
+    """
+    Returns the epoch seconds at which a googlevideo URL stops working,
+    or None when the URL does not say.
+    """
+    if not audio_url:
+        return None
+    expire = parse_qs(urlsplit(audio_url).query).get('expire')
+    if expire and expire[0].isdigit():
+        return int(expire[0])
+    return None
+
+
+def stream_usable(expires: int | None, duration: int | None) -> bool:
+    """
+    Returns whether an audio URL expiring at `expires` will last
+    through a track of `duration` seconds started now.
+    """
+    return expires is not None and expires - time.time() >= (duration or 0) + STREAM_EXPIRY_MARGIN
+
+
+class MediaCache:
+    """
+    Bounded cache of track metadata and, until they expire, audio URLs.
+    Tracks are dicts with title, duration, thumbnail, webpage_url,
+    audio_url and expires.
+    """
+    def __init__(self, maxsize: int = MEDIA_CACHE_SIZE, ttl: float = MEDIA_CACHE_TTL):
+        self._tracks = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.stream_hits = 0
+        self.stream_expired = 0
+
+    def get(self, query: str) -> dict | None:
+        """
+        Returns the cached track for a query, or None. `audio_url` is
+        None when the cached stream URL has expired or would expire
+        before the track finishes.
+        """
+        track = self._tracks.get(normalize_query(query))
+        if track is MISSING:
+            return None
+
+        track = dict(track)
+        if not stream_usable(track['expires'], track['duration']):
+            track['audio_url'] = None
+            self.stream_expired += 1
+        else:
+            self.stream_hits += 1
+        return track
+
+    def put(self, query: str, info: dict, stream: bool = True) -> dict:
+        """
+        Caches the yt-dlp info for a track under the query and under its
+        page URL, and returns the track. `stream=False` is for flat
+        search results, whose `url` is the video page, not the audio;
+        if that page already has a usable stream cached, the query is
+        pointed at it instead.
+        """
+        audio_url = info.get('url') if stream else None
+        if not stream:
+            # A flat result must not replace a known working stream
+            page_url = info.get('webpage_url') or info.get('url', '')
+            known = self._tracks.peek(normalize_query(page_url)) if page_url else MISSING
+            if known is not MISSING and known['audio_url'] and stream_usable(known['expires'], known['duration']):
+                self._tracks.set(normalize_query(query), known)
+                return dict(known)
+        thumbnail = info.get('thumbnail') or (info.get('thumbnails') or [{}])[-1].get('url', '')
+        track = {
+            'title': info.get('title', 'untitled'),
+            'duration': int(info.get('duration') or 0),
+            'thumbnail': thumbnail,
+            'webpage_url': info.get('webpage_url') or ('' if stream else info.get('url', '')),
+            'audio_url': audio_url,
+            'expires': stream_expiry(audio_url),
+        }
+        self._tracks.set(normalize_query(query), track)
+        if track['webpage_url']:
+            self._tracks.set(normalize_query(track['webpage_url']), track)
+        return dict(track)
+
+    def clear(self) -> None:
+        self._tracks.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns the LRU counters plus how often a cached audio URL
+        could be reused.
+        """
+        stats = self._tracks.stats()
+        stats['stream_hits'] = self.stream_hits
+        stats['stream_expired'] = self.stream_expired
+        return stats
+
+
+media_cache = MediaCache()
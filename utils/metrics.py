@@ -0,0 +1,244 @@
+"""
+In-process command metrics: latency histograms per command and per cog,
+error counts, and sub-timings for database, HTTP and yt-dlp calls made
+while a command runs. Exposed in the Prometheus text format on a local
+HTTP endpoint, together with the shard health gauges, and summarised
+by the `$stats` command.
+"""
+import os
+import time
+import bisect
+import logging
+import contextlib
+import contextvars
+
+
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+
+# Upper bounds in seconds, as Prometheus `le` labels
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float('inf'))
+
+_current_command = contextvars.ContextVar('current_command', default=None)
+
+
+class Histogram:
+    """
+    Counts of observations per latency bucket.
+    """
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        """
+        Adds one observation.
+        """
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q: float) -> float | None:
+        """
+        Estimates a quantile by interpolating inside its bucket, the way
+        Prometheus' histogram_quantile does. Returns None when empty.
+        """
+        if not self.count:
+            return None
+
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = BUCKETS[index - 1] if index else 0.0
+                upper = BUCKETS[index]
+                if upper == float('inf'):
+                    return lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return BUCKETS[-2]
+
+
+class Metrics:
+    """
+    Every histogram and counter, keyed by their label values.
+    """
+    def __init__(self):
+        self.commands = {}
+        self.cogs = {}
+        self.errors = {}
+        self.timings = {}
+
+    def _histogram(self, table: dict, key) -> Histogram:
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = Histogram()
+        return histogram
+
+    def observe_command(self, command: str, cog: str | None, seconds: float) -> None:
+        """
+        Records how long a command took.
+        """
+        self._histogram(self.commands, (command, cog or '')).observe(seconds)
+        self._histogram(self.cogs, cog or '').observe(seconds)
+
+    def count_error(self, command: str, error: str) -> None:
+        """
+        Counts a failed command by error type.
+        """
+        key = (command, error)
+        self.errors[key] = self.errors.get(key, 0) + 1
+
+    def observe_timing(self, kind: str, seconds: float, command: str | None = None) -> None:
+        """
+        Records a database, HTTP or yt-dlp call made for a command.
+        """
+        self._histogram(self.timings, (command or '', kind)).observe(seconds)
+
+    def clear(self) -> None:
+        """
+        Drops every observation.
+        """
+        self.__init__()
+
+
+metrics = Metrics()
+
+
+def command_started(ctx) -> None:
+    """
+    Marks the start of a command. Sub-timings recorded until it
+    finishes are attributed to it.
+    """
+    ctx.command_started = time.perf_counter()
+    _current_command.set(ctx.command.qualified_name)
+
+def command_finished(ctx) -> None:
+    """
+    Records the latency of a command that was invoked.
+    """
+    started = getattr(ctx, 'command_started', None)
+    if started is not None:
+        metrics.observe_command(ctx.command.qualified_name, ctx.command.cog_name, time.perf_counter() - started)
+
+def command_failed(ctx, error: Exception) -> None:
+    """
+    Counts a command error.
+    """
+    if ctx.command is not None:
+        metrics.count_error(ctx.command.qualified_name, type(getattr(error, 'original', error)).__name__)
+
+@contextlib.contextmanager
+def timed(kind: str):
+    """
+    Context manager that records the time spent in its block as a
+    `kind` sub-timing of the running command.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe_timing(kind, time.perf_counter() - start, _current_command.get())
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(f'{name}="{value}"' for name, value in labels.items())
+    return '{' + pairs + '}'
+
+def render_histogram(lines: list, name: str, labels: dict, histogram: Histogram) -> None:
+    """
+    Appends the bucket, sum and count lines of a histogram to `lines`
+    in the Prometheus text format.
+    """
+    cumulative = 0
+    for bound, count in zip(BUCKETS, histogram.counts):
+        cumulative += count
+        le = '+Inf' if bound == float('inf') else repr(bound)
+        lines.append(f'{name}_bucket{_labels(**labels, le=le)} {cumulative}')
+    lines.append(f'{name}_sum{_labels(**labels)} {histogram.sum}')
+    lines.append(f'{name}_count{_labels(**labels)} {histogram.count}')
+
+def render_prometheus() -> str:
+    """
+    Returns every metric in the Prometheus text exposition format.
+    """
+    from .extraction import extraction_executor
+    from .shards import shard_monitor
+    from .telemetry import get_command_recorder
+
+    lines = ['# HELP gummybot_command_seconds Command latency.',
+             '# TYPE gummybot_command_seconds histogram']
+    for (command, cog), histogram in sorted(metrics.commands.items()):
+        render_histogram(lines, 'gummybot_command_seconds', {'command': command, 'cog': cog}, histogram)
+
+    lines += ['# HELP gummybot_cog_seconds Command latency per cog.',
+              '# TYPE gummybot_cog_seconds histogram']
+    for cog, histogram in sorted(metrics.cogs.items()):
+        render_histogram(lines, 'gummybot_cog_seconds', {'cog': cog}, histogram)
+
+    lines += ['# HELP gummybot_command_errors_total Failed commands by error type.',
+              '# TYPE gummybot_command_errors_total counter']
+    for (command, error), count in sorted(metrics.errors.items()):
+        lines.append(f'gummybot_command_errors_total{_labels(command=command, error=error)} {count}')
+
+    lines += ['# HELP gummybot_call_seconds Database, HTTP and yt-dlp calls made by commands.',
+              '# TYPE gummybot_call_seconds histogram']
+    for (command, kind), histogram in sorted(metrics.timings.items()):
+        render_histogram(lines, 'gummybot_call_seconds', {'command': command, 'kind': kind}, histogram)
+
+    recorder = get_command_recorder()
+    if recorder is not None:
+        stats = recorder.stats()
+        lines += ['# HELP gummybot_telemetry_dropped_total Command records dropped because the queue was full.',
+                  '# TYPE gummybot_telemetry_dropped_total counter',
+                  f'gummybot_telemetry_dropped_total {stats["dropped"]}',
+                  '# HELP gummybot_telemetry_queued Command records waiting to be written.',
+                  '# TYPE gummybot_telemetry_queued gauge',
+                  f'gummybot_telemetry_queued {stats["queued"]}']
+
+    lines += extraction_executor.prometheus_lines()
+
+    if shard_monitor.bot is not None:
+        lines += shard_monitor.prometheus_lines()
+
+    return '\n'.join(lines) + '\n'
+
+
+_runner = None
+
+async def start_metrics_server(host: str = METRICS_HOST, port: int = METRICS_PORT) -> None:
+    """
+    Serves /metrics over HTTP on a local port.
+    """
+    global _runner
+    from aiohttp import web
+
+    async def handle_metrics(request):
+        return web.Response(text=render_prometheus(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        await runner.cleanup()
+        logging.warning('Metrics endpoint not started on %s:%d: %s', host, port, e)
+        return
+    _runner = runner
+    logging.info('Metrics served at http://%s:%d/metrics', host, port)
+
+async def stop_metrics_server() -> None:
+    """
+    Stops the metrics endpoint, if it is running.
+    """
+    global _runner
+    if _runner is not None:
+        await _runner.cleanup()
+        _runner = None
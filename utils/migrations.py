@@ -0,0 +1,161 @@
+"""
+Versioned schema migrations for the bot database.
+The applied version is stored in SQLite's `user_version` header, and
+every migration newer than it is applied in order on startup.
+Add new migrations to the end of MIGRATIONS; never edit applied ones.
+"""
+import logging
+import sqlite3
+import datetime
+
+from .db_connection import get_manager
+from .db_worker import db_write
+
+
+def column_exists(conn: sqlite3.Connection, table_name: str, col_name: str) -> bool:
+    """
+    Checks whether a table already has a column.
+    """
+    columns = conn.execute(f'PRAGMA table_info({table_name})').fetchall()
+    return any(column[1] == col_name for column in columns)
+
+def _create_base_tables(conn: sqlite3.Connection) -> None:
+    conn.execute('''CREATE TABLE IF NOT EXISTS battlepass (
+                    user_id INTEGER PRIMARY KEY,
+                    guild_id INTEGER,
+                    points INTEGER DEFAULT 20,
+                    redemption_time TIMESTAMP,
+                    level INTEGER DEFAULT 1,
+                    user_name TEXT
+                )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS inventory (
+                    user_id INTEGER,
+                    guild_id INTEGER,
+                    item_name TEXT,
+                    value INTEGER,
+                    rarity TEXT,
+                    img_url TEXT,
+                    purchase_date TIMESTAMP,
+                    FOREIGN KEY (user_id) REFERENCES battlepass (user_id)
+                )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS shop (
+                    item_name TEXT,
+                    rarity TEXT,
+                    img_url TEXT
+                )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS shop_submissions (
+                    item_id INTEGER PRIMARY KEY,
+                    user_id INTEGER,
+                    user_name TEXT,
+                    submit_time TIMESTAMP,
+                    item_name TEXT,
+                    rarity TEXT
+                )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS command_requests (
+                    user_id INTEGER,
+                    guild_id INTEGER,
+                    command TEXT,
+                    cog TEXT,
+                    command_time TIMESTAMP
+                )''')
+
+def _add_daily_redemption(conn: sqlite3.Connection) -> None:
+    # Older databases had this column added by hand with change_tables
+    if not column_exists(conn, 'battlepass', 'daily_redemption'):
+        conn.execute('ALTER TABLE battlepass ADD COLUMN daily_redemption TIMESTAMP')
+
+def _add_hot_path_indexes(conn: sqlite3.Connection) -> None:
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_inventory_user_item ON inventory (user_id, item_name)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_battlepass_guild_rank ON battlepass (guild_id, level DESC, points DESC)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_battlepass_user_name ON battlepass (user_name)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_shop_rarity ON shop (rarity)')
+
+def _to_epoch(value) -> int | None:
+    """
+    Converts a stored timestamp to integer epoch seconds. Text values are
+    the local-time strings sqlite3 wrote for datetime objects, with or
+    without microseconds.
+    """
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value)
+    try:
+        return int(datetime.datetime.fromisoformat(value).timestamp())
+    except ValueError:
+        logging.warning('Dropping unparseable timestamp %r', value)
+        return None
+
+def _timestamps_to_epoch(conn: sqlite3.Connection) -> None:
+    rows = conn.execute('SELECT user_id, redemption_time, daily_redemption FROM battlepass').fetchall()
+    conn.executemany('UPDATE battlepass SET redemption_time = ?, daily_redemption = ? WHERE user_id = ?',
+                     [(_to_epoch(redemption), _to_epoch(daily), user_id) for user_id, redemption, daily in rows])
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_battlepass_redemption_time ON battlepass (redemption_time)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_battlepass_daily_redemption ON battlepass (daily_redemption)')
+
+def _track_shop_changes(conn: sqlite3.Connection) -> None:
+    # Bumped by triggers so the bot can tell the shop changed without scanning it
+    conn.execute('CREATE TABLE IF NOT EXISTS shop_version (version INTEGER NOT NULL)')
+    conn.execute('INSERT INTO shop_version SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM shop_version)')
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS shop_version_{event.lower()}
+                         AFTER {event} ON shop
+                         BEGIN UPDATE shop_version SET version = version + 1; END''')
+
+
+def _add_command_request_timing(conn: sqlite3.Connection) -> None:
+    if not column_exists(conn, 'command_requests', 'latency_ms'):
+        conn.execute('ALTER TABLE command_requests ADD COLUMN latency_ms REAL')
+    if not column_exists(conn, 'command_requests', 'outcome'):
+        conn.execute('ALTER TABLE command_requests ADD COLUMN outcome TEXT')
+
+
+# (version, description, function)
+MIGRATIONS = [
+    (1, 'Create base tables', _create_base_tables),
+    (2, 'Add battlepass.daily_redemption', _add_daily_redemption),
+    (3, 'Index inventory, battlepass and shop lookups', _add_hot_path_indexes),
+    (4, 'Store redemption timestamps as epoch seconds', _timestamps_to_epoch),
+    (5, 'Track shop table changes', _track_shop_changes),
+    (6, 'Add command_requests.latency_ms and outcome', _add_command_request_timing),
+]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    """
+    Returns the schema version recorded in the database.
+    """
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(conn: sqlite3.Connection) -> list:
+    """
+    Applies every pending migration, each in its own transaction.
+    Returns the versions that were applied.
+    """
+    applied = []
+    current = schema_version(conn)
+
+    for version, description, func in MIGRATIONS:
+        if version <= current:
+            continue
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            func(conn)
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        logging.info('Applied database migration %d: %s', version, description)
+        applied.append(version)
+
+    return applied
+
+@db_write
+def run_migrations() -> list:
+    """
+    Brings the bot database up to the latest schema version.
+    """
+    return migrate(get_manager().writer())
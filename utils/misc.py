@@ -1,9 +1,17 @@
 """
 Helper functions that don't fit into other categories.
 """
+import datetime
+
 
 def decimal_to_hex(decimal: int) -> str:
     """
     Converts decimal number to hexadecimal string.
     """
     return hex(decimal).split('x')[-1]
+
+def format_epoch(epoch: int) -> str:
+    """
+    Formats epoch seconds as local time: YYYY-MM-DD HH:MM AM/PM.
+    """
+    return datetime.datetime.fromtimestamp(epoch).strftime('%Y-%m-%d %I:%M %p')
@@ -13,9 +13,10 @@ def set_daily_redemption() -> None:
     conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
 
+    # Timestamps are stored as epoch seconds
     yesterday = datetime.datetime.now() - datetime.timedelta(days=1)
     query = 'UPDATE battlepass SET daily_redemption = ?'
-    cursor.execute(query, (yesterday,))
+    cursor.execute(query, (int(yesterday.timestamp()),))
 
     conn.commit()
     cursor.close()
@@ -0,0 +1,51 @@
+"""
+Lightweight row types returned by the database interface.
+"""
+
+
+class BattlepassRecord:
+    """
+    One row of the battlepass table.
+    """
+    __slots__ = ('user_id', 'guild_id', 'points', 'level', 'redemption_time', 'daily_redemption', 'user_name')
+
+    def __init__(self, user_id: int, guild_id: int, points: int, level: int,
+                 redemption_time, daily_redemption, user_name: str):
+        self.user_id = user_id
+        self.guild_id = guild_id
+        self.points = points
+        self.level = level
+        self.redemption_time = redemption_time
+        self.daily_redemption = daily_redemption
+        self.user_name = user_name
+
+    def replace(self, **changes) -> 'BattlepassRecord':
+        """
+        Returns a copy with the given fields changed.
+        """
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(changes)
+        return BattlepassRecord(**values)
+
+    def __repr__(self) -> str:
+        return f'BattlepassRecord(user_id={self.user_id}, level={self.level}, points={self.points})'
+
+
+class PurchaseResult:
+    """
+    Outcome of a shop purchase. `points` is the user's balance after
+    the attempt, or None if the user is not registered.
+    """
+    PURCHASED = 'purchased'
+    ALREADY_OWNED = 'already_owned'
+    INSUFFICIENT_POINTS = 'insufficient_points'
+    NOT_REGISTERED = 'not_registered'
+
+    __slots__ = ('status', 'points')
+
+    def __init__(self, status: str, points: int | None):
+        self.status = status
+        self.points = points
+
+    def __repr__(self) -> str:
+        return f'PurchaseResult(status={self.status!r}, points={self.points})'
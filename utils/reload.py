@@ -0,0 +1,60 @@
+"""
+Hot reload of cog extensions with a state handoff, so an updated cog
+keeps its live state without restarting the bot or reconnecting to the
+gateway or voice.
+
+A cog takes part by defining two methods:
+
+    def export_state(self) -> dict      called on the instance being replaced
+    def import_state(self, state: dict) called on the new instance
+
+and calling `utils.restore_state(self)` from its `cog_load`, which runs
+import_state before the cog starts handling commands or tasks. If the
+new version fails to load, the previous version is restored and gets
+the state back the same way.
+"""
+import time
+import logging
+
+
+_handoff = {}
+
+
+def restore_state(cog) -> bool:
+    """
+    Passes the state exported by the instance `cog` replaces to
+    `cog.import_state`. Returns False when nothing was handed off.
+    """
+    state = _handoff.get(cog.qualified_name)
+    if state is None:
+        return False
+    cog.import_state(state)
+    return True
+
+
+async def reload_cog(bot, extension: str) -> dict:
+    """
+    Reloads a loaded extension, e.g. 'cogs.music', handing each of its
+    cogs' state to the new instances. Returns the reload time and the
+    names of the cogs that handed off state.
+    """
+    start = time.perf_counter()
+    cogs = [cog for cog in bot.cogs.values() if type(cog).__module__ == extension]
+
+    handed_off = []
+    for cog in cogs:
+        export_state = getattr(cog, 'export_state', None)
+        if export_state is not None:
+            _handoff[cog.qualified_name] = export_state()
+            handed_off.append(cog.qualified_name)
+
+    try:
+        await bot.reload_extension(extension)
+    finally:
+        # State nobody claimed would otherwise leak into a later load
+        _handoff.clear()
+
+    elapsed = time.perf_counter() - start
+    logging.info('Reloaded %s in %.1fms (state handed off: %s)',
+                 extension, elapsed * 1000, ', '.join(handed_off) or 'none')
+    return {'seconds': elapsed, 'handed_off': handed_off}
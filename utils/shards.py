@@ -0,0 +1,321 @@
+"""
+Sharding support: builds a single, auto-sharded or fixed-shard bot from
+environment settings, limits how many shards IDENTIFY at once, and
+tracks per-shard health (latency, guild counts, message rates and
+connection churn).
+
+SHARD_MODE=none   one gateway connection (default)
+SHARD_MODE=auto   AutoShardedBot; SHARD_COUNT and SHARD_IDS are optional,
+                  SHARD_IDS=0,1 runs a subset of shards in this process
+SHARD_MODE=fixed  one shard per process, given by SHARD_ID and SHARD_COUNT
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+
+import yarl
+from discord.ext import commands
+from discord.gateway import DiscordWebSocket
+
+
+SHARD_MODE = os.getenv('SHARD_MODE', 'none')
+SHARD_COUNT = os.getenv('SHARD_COUNT')
+SHARD_ID = os.getenv('SHARD_ID')
+SHARD_IDS = os.getenv('SHARD_IDS')
+# Shards allowed to IDENTIFY per 5 seconds. Unset uses the limit Discord
+# reports for the bot (session_start_limit.max_concurrency) when it is
+# asked for the shard count, and 1 otherwise
+SHARD_IDENTIFY_CONCURRENCY = os.getenv('SHARD_IDENTIFY_CONCURRENCY')
+
+IDENTIFY_WINDOW = 5.0
+
+
+class IdentifyLimiter:
+    """
+    Paces IDENTIFYs the way Discord rate-limits them: shards fall into
+    `concurrency` buckets by shard_id % concurrency, and each bucket may
+    IDENTIFY once every IDENTIFY_WINDOW seconds, across startup and
+    later re-identifies.
+    """
+    def __init__(self, concurrency: int = 1, window: float = IDENTIFY_WINDOW):
+        self.concurrency = max(1, concurrency)
+        self.window = window
+        self._last_sent = {}
+        self._locks = {}
+
+    def bucket(self, shard_id: int | None) -> int:
+        """
+        Returns the rate limit bucket of a shard.
+        """
+        return (shard_id or 0) % self.concurrency
+
+    async def acquire(self, shard_id: int | None = None) -> None:
+        """
+        Waits until the shard's bucket may send another IDENTIFY.
+        """
+        bucket = self.bucket(shard_id)
+        lock = self._locks.setdefault(bucket, asyncio.Lock())
+        async with lock:
+            last_sent = self._last_sent.get(bucket)
+            if last_sent is not None:
+                delay = last_sent + self.window - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            self._last_sent[bucket] = time.monotonic()
+
+    def sent(self, shard_id: int | None = None) -> None:
+        """
+        Restarts the shard's bucket window after an IDENTIFY that was
+        paced with acquire() before its connection was opened.
+        """
+        self._last_sent[self.bucket(shard_id)] = time.monotonic()
+
+
+class _LimitedIdentify:
+    """
+    Replaces the library's fixed five second wait before every
+    IDENTIFY with IdentifyLimiter.
+    """
+    identify_limiter: IdentifyLimiter
+    # Shards whose first IDENTIFY launch_shards already paced
+    _paced_shards = frozenset()
+
+    async def before_identify_hook(self, shard_id, *, initial: bool = False) -> None:
+        if initial and shard_id in self._paced_shards:
+            return
+        await self.identify_limiter.acquire(shard_id)
+
+
+class GummyBot(_LimitedIdentify, commands.Bot):
+    """
+    Bot with a single gateway connection, or one fixed shard.
+    """
+
+
+class GummyShardedBot(_LimitedIdentify, commands.AutoShardedBot):
+    """
+    Bot running several shards in this process. Each IDENTIFY bucket
+    launches its shards in turn and the buckets launch together. A
+    shard waits for the limiter before its connection is opened, since
+    waiting inside the identify hook counts against
+    shard_connect_timeout.
+    """
+    async def launch_shards(self) -> None:
+        # Adapted from AutoShardedClient.launch_shards in discord.py 2.5.2,
+        # which launches shards one at a time. Recheck on upgrade.
+        if self.is_closed():
+            return
+
+        if self.shard_count is None:
+            self.shard_count, gateway_url, session_start_limit = await self.http.get_bot_gateway()
+            gateway = yarl.URL(gateway_url)
+            if SHARD_IDENTIFY_CONCURRENCY is None:
+                self.identify_limiter.concurrency = max(1, session_start_limit['max_concurrency'])
+        else:
+            gateway = DiscordWebSocket.DEFAULT_GATEWAY
+
+        self._connection.shard_count = self.shard_count
+        shard_ids = self.shard_ids or range(self.shard_count)
+        self._connection.shard_ids = shard_ids
+
+        limiter = self.identify_limiter
+        buckets = {}
+        for shard_id in shard_ids:
+            buckets.setdefault(limiter.bucket(shard_id), []).append(shard_id)
+        self._paced_shards = set()
+
+        async def launch_bucket(bucket_shard_ids):
+            for shard_id in bucket_shard_ids:
+                await limiter.acquire(shard_id)
+                self._paced_shards.add(shard_id)
+                try:
+                    await self.launch_shard(gateway, shard_id, initial=True)
+                finally:
+                    self._paced_shards.discard(shard_id)
+                # The IDENTIFY went out once launch_shard returned
+                limiter.sent(shard_id)
+
+        logging.info('Launching %d shards in %d IDENTIFY buckets, one per bucket every %.0fs',
+                     len(shard_ids), len(buckets), IDENTIFY_WINDOW)
+        await asyncio.gather(*(launch_bucket(bucket_shard_ids) for bucket_shard_ids in buckets.values()))
+
+
+def create_bot(**kwargs) -> commands.Bot:
+    """
+    Builds the bot for the configured SHARD_MODE.
+    """
+    if SHARD_MODE == 'auto':
+        if SHARD_COUNT:
+            kwargs['shard_count'] = int(SHARD_COUNT)
+        if SHARD_IDS:
+            kwargs['shard_ids'] = [int(shard_id) for shard_id in SHARD_IDS.split(',')]
+        bot = GummyShardedBot(**kwargs)
+    elif SHARD_MODE == 'fixed':
+        if SHARD_ID is None or SHARD_COUNT is None:
+            raise ValueError('SHARD_MODE=fixed needs SHARD_ID and SHARD_COUNT')
+        bot = GummyBot(shard_id=int(SHARD_ID), shard_count=int(SHARD_COUNT), **kwargs)
+    elif SHARD_MODE == 'none':
+        bot = GummyBot(**kwargs)
+    else:
+        raise ValueError(f'Unknown SHARD_MODE {SHARD_MODE!r}')
+
+    bot.identify_limiter = IdentifyLimiter(int(SHARD_IDENTIFY_CONCURRENCY or 1))
+    return bot
+
+
+class RateCounter:
+    """
+    Event count over the last `window` seconds, in one-second buckets.
+    """
+    __slots__ = ('window', 'total', '_buckets')
+
+    def __init__(self, window: int = 60):
+        self.window = window
+        self.total = 0
+        self._buckets = deque()
+
+    def add(self, count: int = 1) -> None:
+        second = int(time.monotonic())
+        if self._buckets and self._buckets[-1][0] == second:
+            self._buckets[-1][1] += count
+        else:
+            self._buckets.append([second, count])
+        self.total += count
+
+    def rate(self) -> float:
+        """
+        Returns events per second over the window.
+        """
+        cutoff = int(time.monotonic()) - self.window
+        while self._buckets and self._buckets[0][0] <= cutoff:
+            self._buckets.popleft()
+        return sum(count for _, count in self._buckets) / self.window
+
+
+class ShardHealth:
+    """
+    Connection history and message rate for one shard.
+    """
+    def __init__(self):
+        self.connects = 0
+        self.disconnects = 0
+        self.resumes = 0
+        self.ready_at = None
+        self.messages = RateCounter()
+
+
+class ShardMonitor:
+    """
+    Per-shard health for a bot, fed by gateway event listeners.
+    Gateway events are only attributed to shards when they carry a
+    guild, so the all-events rate is kept for the whole process.
+    """
+    def __init__(self):
+        self.bot = None
+        self.shards = {}
+        self.gateway_events = RateCounter()
+
+    def shard(self, shard_id: int | None) -> ShardHealth:
+        """
+        Returns the health record for a shard, creating it if needed.
+        """
+        shard_id = shard_id or 0
+        health = self.shards.get(shard_id)
+        if health is None:
+            health = self.shards[shard_id] = ShardHealth()
+        return health
+
+    def install(self, bot: commands.Bot) -> None:
+        """
+        Registers the listeners that keep this monitor current.
+        """
+        self.bot = bot
+        sharded = isinstance(bot, commands.AutoShardedBot)
+
+        async def on_connect(shard_id=None):
+            self.shard(shard_id if sharded else bot.shard_id).connects += 1
+
+        async def on_disconnect(shard_id=None):
+            self.shard(shard_id if sharded else bot.shard_id).disconnects += 1
+
+        async def on_resumed(shard_id=None):
+            self.shard(shard_id if sharded else bot.shard_id).resumes += 1
+
+        async def on_ready(shard_id=None):
+            self.shard(shard_id if sharded else bot.shard_id).ready_at = time.time()
+
+        async def on_message(message):
+            guild = message.guild
+            self.shard(guild.shard_id if guild is not None else bot.shard_id).messages.add()
+
+        async def on_socket_event_type(event_type):
+            self.gateway_events.add()
+
+        prefix = 'on_shard_' if sharded else 'on_'
+        bot.add_listener(on_connect, prefix + 'connect')
+        bot.add_listener(on_disconnect, prefix + 'disconnect')
+        bot.add_listener(on_resumed, prefix + 'resumed')
+        bot.add_listener(on_ready, prefix + 'ready')
+        bot.add_listener(on_message, 'on_message')
+        bot.add_listener(on_socket_event_type, 'on_socket_event_type')
+
+    def snapshot(self) -> list:
+        """
+        Returns one dict per shard with latency, guild count,
+        message rate and connection counters.
+        """
+        if self.bot is None:
+            return []
+
+        if isinstance(self.bot, commands.AutoShardedBot):
+            latencies = dict(self.bot.latencies)
+        else:
+            latencies = {self.bot.shard_id or 0: self.bot.latency}
+
+        guilds = {}
+        for guild in self.bot.guilds:
+            guilds[guild.shard_id] = guilds.get(guild.shard_id, 0) + 1
+
+        rows = []
+        for shard_id in sorted(set(latencies) | set(self.shards)):
+            health = self.shard(shard_id)
+            rows.append({
+                'shard_id': shard_id,
+                'latency': latencies.get(shard_id),
+                'guilds': guilds.get(shard_id, 0),
+                'messages_per_sec': health.messages.rate(),
+                'connects': health.connects,
+                'disconnects': health.disconnects,
+                'resumes': health.resumes,
+                'ready_at': health.ready_at,
+            })
+        return rows
+
+    def prometheus_lines(self) -> list:
+        """
+        Returns the shard gauges in the Prometheus text format.
+        """
+        rows = self.snapshot()
+        lines = []
+        for name, key, help_text, kind in (
+                ('gummybot_shard_latency_seconds', 'latency', 'Gateway heartbeat latency.', 'gauge'),
+                ('gummybot_shard_guilds', 'guilds', 'Guilds served by the shard.', 'gauge'),
+                ('gummybot_shard_messages_per_second', 'messages_per_sec', 'Messages per second over the last minute.', 'gauge'),
+                ('gummybot_shard_connects_total', 'connects', 'Gateway connections.', 'counter'),
+                ('gummybot_shard_disconnects_total', 'disconnects', 'Gateway disconnections.', 'counter'),
+                ('gummybot_shard_resumes_total', 'resumes', 'Resumed gateway sessions.', 'counter')):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            for row in rows:
+                value = row[key]
+                # A shard that has not heartbeated yet reports inf or nan
+                if value is not None and value == value and value != float('inf'):
+                    lines.append(f'{name}{{shard="{row["shard_id"]}"}} {value}')
+        lines += ['# HELP gummybot_gateway_events_per_second Gateway events per second over the last minute.',
+                  '# TYPE gummybot_gateway_events_per_second gauge',
+                  f'gummybot_gateway_events_per_second {self.gateway_events.rate()}']
+        return lines
+
+
+shard_monitor = ShardMonitor()
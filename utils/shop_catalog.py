@@ -0,0 +1,63 @@
+"""
+In-memory copy of the shop table, grouped by rarity.
+Shop rotations sample from these pools instead of sorting the
+table with ORDER BY RANDOM() on every refresh.
+"""
+import random
+
+
+# Can be rarity counts can be changed at any time
+RARITY_COUNTS = {
+    'Legendary': 1,
+    'Exotic': 1,
+    'Very Rare': 1,
+    'Rare': 2,
+    'Uncommon': 2,
+    'Common': 3
+}
+
+
+class ShopCatalog:
+    """
+    Shop items split into one list per rarity. `signature` identifies
+    the version of the table the pools were loaded from; None means the
+    pools must be (re)loaded before the next rotation.
+    """
+    def __init__(self):
+        self.pools = {}
+        self.signature = None
+
+    def __len__(self) -> int:
+        return sum(len(pool) for pool in self.pools.values())
+
+    def load(self, rows, signature) -> None:
+        """
+        Replaces the pools with shop rows of the form (item_name, rarity, img_url).
+        """
+        pools = {}
+        for row in rows:
+            pools.setdefault(row[1], []).append(row)
+        self.pools = pools
+        self.signature = signature
+
+    def invalidate(self) -> None:
+        """
+        Forces a reload before the next rotation.
+        """
+        self.signature = None
+
+    def sample(self, rarity_counts: dict = None, rng: random.Random = random) -> list:
+        """
+        Picks items at random without repeats, `count` per rarity.
+        Costs O(count) per rarity regardless of catalog size.
+        """
+        rarity_counts = rarity_counts or RARITY_COUNTS
+
+        selected_items = []
+        for rarity, count in rarity_counts.items():
+            pool = self.pools.get(rarity, ())
+            selected_items.extend(rng.sample(pool, min(count, len(pool))))
+        return selected_items
+
+
+shop_catalog = ShopCatalog()
@@ -0,0 +1,69 @@
+"""
+Startup timing: how long each phase from process start to the first
+READY took, logged once when the bot is ready.
+"""
+import time
+import logging
+import contextlib
+
+
+class StartupTimer:
+    """
+    Ordered durations of the startup phases.
+    """
+    def __init__(self, started: float | None = None):
+        self.started = time.perf_counter() if started is None else started
+        self.phases = []
+        self.ready = None
+        self._last = self.started
+
+    def record(self, name: str, seconds: float) -> None:
+        """
+        Adds a phase that just finished after `seconds`.
+        """
+        self.phases.append((name, seconds))
+        self._last = time.perf_counter()
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """
+        Context manager that records the time spent in its block.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def mark_ready(self) -> bool:
+        """
+        Records the time since the last phase as `gateway` (login,
+        connecting and receiving guilds) and the total time to READY.
+        Returns False if the bot was already ready once, i.e. this is
+        a reconnect.
+        """
+        if self.ready is not None:
+            return False
+        now = time.perf_counter()
+        self.phases.append(('gateway', now - self._last))
+        self.ready = now - self.started
+        return True
+
+    def report(self) -> str:
+        """
+        Returns a one-line breakdown of the phases.
+        """
+        total = self.ready if self.ready is not None else time.perf_counter() - self.started
+        phases = ', '.join(f'{name} {seconds * 1000:.0f}ms' for name, seconds in self.phases)
+        return f'Startup took {total * 1000:.0f}ms: {phases}'
+
+
+startup_timer = StartupTimer()
+
+
+def log_startup_report() -> None:
+    """
+    Logs the startup breakdown the first time the bot is ready.
+    """
+    if startup_timer.mark_ready():
+        logging.info(startup_timer.report())
@@ -0,0 +1,377 @@
+"""
+State that has to be shared when several bot processes serve the same
+guilds: the current shop rotation, cooldown stamps and the battlepass
+and inventory caches. MemoryState keeps it in process (the default,
+for a single process); RedisState keeps it in Redis so every process
+sees the same values. Select one with STATE_BACKEND=memory|redis.
+"""
+import os
+import abc
+import json
+import time
+import uuid
+import logging
+
+from .cache import LRUCache, MISSING
+from .cooldowns import CooldownEngine
+from .records import BattlepassRecord
+
+
+STATE_BACKEND = os.getenv('STATE_BACKEND', 'memory')
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+REDIS_KEY_PREFIX = os.getenv('REDIS_KEY_PREFIX', 'gummybot:')
+
+# name: (maxsize, ttl). Redis only uses the ttl.
+CACHES = {
+    'battlepass': (int(os.getenv('BATTLEPASS_CACHE_SIZE', '5000')), float(os.getenv('BATTLEPASS_CACHE_TTL', '300'))),
+    'inventory': (int(os.getenv('INVENTORY_CACHE_SIZE', '2000')), float(os.getenv('INVENTORY_CACHE_TTL', '300'))),
+}
+
+
+def _encode_record(record):
+    return None if record is None else [getattr(record, name) for name in BattlepassRecord.__slots__]
+
+def _decode_record(values):
+    return None if values is None else BattlepassRecord(*values)
+
+def _decode_inventory(values):
+    return tuple(tuple(item) for item in values)
+
+# name: (encode, decode) for values stored as JSON in Redis
+CODECS = {
+    'battlepass': (_encode_record, _decode_record),
+    'inventory': (list, _decode_inventory),
+}
+
+
+class StateBackend(abc.ABC):
+    """
+    Interface shared by the state backends. Every method is a
+    coroutine so cogs do not depend on where the state lives, and a
+    backend must implement all of them except close.
+    """
+    shared = False
+
+    @abc.abstractmethod
+    async def get_shop(self) -> tuple:
+        """
+        Returns (items, refresh_time) for the current rotation, where
+        items maps item_name to [rarity, value] and refresh_time is
+        epoch seconds (None before the first rotation).
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def set_shop(self, items: dict, refresh_time: int) -> None:
+        """
+        Replaces the current rotation.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def claim(self, name: str, ttl: float) -> bool:
+        """
+        Returns True if this process may run the job `name`, which
+        nobody else can claim for the next `ttl` seconds.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_cooldown(self, command: str, user_id: int) -> int | None:
+        """
+        Returns the epoch a running cooldown ends, or None.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def acquire_cooldown(self, command: str, user_id: int, until: int) -> int | None:
+        """
+        Starts a cooldown lasting until epoch `until` unless one is
+        already running. Returns None if it was started, otherwise
+        the epoch the running cooldown ends.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def load_cooldowns(self, command: str, entries) -> None:
+        """
+        Adds cooldowns from (user_id, until) pairs, keeping any that
+        are already running.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def cache_get(self, name: str, key):
+        """
+        Returns the cached value, or MISSING.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def cache_token(self, name: str, key):
+        """
+        Returns a token to pass to cache_fill for a read of `key`
+        starting now.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def cache_fill(self, name: str, key, value, token) -> None:
+        """
+        Caches a value read from the database unless it was changed
+        since `token` was taken.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def cache_update(self, name: str, key, func) -> None:
+        """
+        Applies func to a cached value after its row was written.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def cache_invalidate(self, name: str, *keys) -> None:
+        """
+        Drops cached values.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def cache_stats(self) -> dict:
+        """
+        Returns counters for each cache.
+        """
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        """
+        Releases any connections.
+        """
+
+
+class MemoryState(StateBackend):
+    """
+    Keeps all state in this process.
+    """
+    def __init__(self):
+        self.caches = {name: LRUCache(maxsize=maxsize, ttl=ttl) for name, (maxsize, ttl) in CACHES.items()}
+        self._shop = {}
+        self._refresh_time = None
+        self._claims = {}
+        self.cooldowns = CooldownEngine()
+
+    async def get_shop(self) -> tuple:
+        return self._shop, self._refresh_time
+
+    async def set_shop(self, items: dict, refresh_time: int) -> None:
+        self._shop = dict(items)
+        self._refresh_time = refresh_time
+
+    async def claim(self, name: str, ttl: float) -> bool:
+        now = time.monotonic()
+        if self._claims.get(name, 0) > now:
+            return False
+        self._claims[name] = now + ttl
+        return True
+
+    async def get_cooldown(self, command: str, user_id: int) -> int | None:
+        return self.cooldowns.get(command, user_id)
+
+    async def acquire_cooldown(self, command: str, user_id: int, until: int) -> int | None:
+        return self.cooldowns.acquire(command, user_id, until)
+
+    async def load_cooldowns(self, command: str, entries) -> None:
+        now = time.time()
+        for user_id, until in entries:
+            if until > now:
+                self.cooldowns.acquire(command, user_id, until)
+
+    async def cache_get(self, name: str, key):
+        return self.caches[name].get(key)
+
+    async def cache_token(self, name: str, key):
+        return self.caches[name].generation
+
+    async def cache_fill(self, name: str, key, value, token) -> None:
+        self.caches[name].fill(key, value, token)
+
+    async def cache_update(self, name: str, key, func) -> None:
+        self.caches[name].update(key, func)
+
+    async def cache_invalidate(self, name: str, *keys) -> None:
+        for key in keys:
+            self.caches[name].invalidate(key)
+
+    def cache_stats(self) -> dict:
+        return {name: cache.stats() for name, cache in self.caches.items()}
+
+
+class RedisState(StateBackend):
+    """
+    Keeps state in Redis. `client` is a redis.asyncio.Redis (or a
+    fakeredis stand-in). Calls touching several keys are pipelined
+    into one round trip.
+    Cached rows are dropped on write rather than patched. Every write
+    also bumps a generation counter for the row, and a fill is only
+    stored if the counter has not moved since its read started, so a
+    row read before another process's write is never cached.
+    """
+    shared = True
+
+    def __init__(self, client, prefix: str = REDIS_KEY_PREFIX):
+        self.client = client
+        self.prefix = prefix
+        self.hits = dict.fromkeys(CACHES, 0)
+        self.misses = dict.fromkeys(CACHES, 0)
+        self._token = uuid.uuid4().hex
+
+    @classmethod
+    def from_url(cls, url: str = REDIS_URL, **kwargs) -> 'RedisState':
+        """
+        Creates a backend connected to the Redis server at `url`.
+        """
+        import redis.asyncio
+
+        return cls(redis.asyncio.from_url(url), **kwargs)
+
+    def _key(self, *parts) -> str:
+        return self.prefix + ':'.join(str(part) for part in parts)
+
+    async def get_shop(self) -> tuple:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hgetall(self._key('shop', 'items'))
+            pipe.get(self._key('shop', 'refresh_time'))
+            items, refresh_time = await pipe.execute()
+
+        items = {name.decode(): json.loads(value) for name, value in items.items()}
+        return items, int(refresh_time) if refresh_time is not None else None
+
+    async def set_shop(self, items: dict, refresh_time: int) -> None:
+        items_key = self._key('shop', 'items')
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(items_key)
+            if items:
+                pipe.hset(items_key, mapping={name: json.dumps(value) for name, value in items.items()})
+            pipe.set(self._key('shop', 'refresh_time'), refresh_time)
+            await pipe.execute()
+
+    async def claim(self, name: str, ttl: float) -> bool:
+        return bool(await self.client.set(self._key('claim', name), self._token, nx=True, px=int(ttl * 1000)))
+
+    async def get_cooldown(self, command: str, user_id: int) -> int | None:
+        until = await self.client.get(self._key('cooldown', command, user_id))
+        return int(until) if until is not None else None
+
+    async def load_cooldowns(self, command: str, entries) -> None:
+        now = int(time.time())
+        async with self.client.pipeline(transaction=False) as pipe:
+            for user_id, until in entries:
+                if until > now:
+                    pipe.set(self._key('cooldown', command, user_id), until, nx=True, ex=until - now)
+            await pipe.execute()
+
+    async def acquire_cooldown(self, command: str, user_id: int, until: int) -> int | None:
+        key = self._key('cooldown', command, user_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.set(key, until, nx=True, ex=max(1, until - int(time.time())))
+            pipe.get(key)
+            acquired, current = await pipe.execute()
+        return None if acquired else int(current)
+
+    async def cache_get(self, name: str, key):
+        raw = await self.client.get(self._key('cache', name, key))
+        if raw is None:
+            self.misses[name] += 1
+            return MISSING
+        self.hits[name] += 1
+        value = json.loads(raw)
+        return None if value is None else CODECS[name][1](value)
+
+    async def cache_token(self, name: str, key):
+        generation = await self.client.get(self._key('cache-gen', name, key))
+        return int(generation or 0)
+
+    async def cache_fill(self, name: str, key, value, token) -> None:
+        from redis.exceptions import WatchError
+
+        encoded = json.dumps(CODECS[name][0](value) if value is not None else None)
+        generation_key = self._key('cache-gen', name, key)
+        async with self.client.pipeline(transaction=True) as pipe:
+            # A write from any process between the token and here
+            # bumps the generation and aborts the fill
+            await pipe.watch(generation_key)
+            if int(await pipe.get(generation_key) or 0) != token:
+                return
+            pipe.multi()
+            pipe.set(self._key('cache', name, key), encoded, nx=True, px=int(CACHES[name][1] * 1000))
+            try:
+                await pipe.execute()
+            except WatchError:
+                pass
+
+    async def cache_update(self, name: str, key, func) -> None:
+        await self.cache_invalidate(name, key)
+
+    async def cache_invalidate(self, name: str, *keys) -> None:
+        if not keys:
+            return
+        # The generation outlives any read that could still fill the row
+        ttl = int(CACHES[name][1] * 1000)
+        async with self.client.pipeline(transaction=True) as pipe:
+            for key in keys:
+                generation_key = self._key('cache-gen', name, key)
+                pipe.incr(generation_key)
+                pipe.pexpire(generation_key, ttl)
+                pipe.delete(self._key('cache', name, key))
+            await pipe.execute()
+
+    def cache_stats(self) -> dict:
+        stats = {}
+        for name in CACHES:
+            lookups = self.hits[name] + self.misses[name]
+            stats[name] = {
+                'backend': 'redis',
+                'hits': self.hits[name],
+                'misses': self.misses[name],
+                'hit_rate': self.hits[name] / lookups if lookups else 0.0,
+            }
+        return stats
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+_state = None
+
+def configure_state(backend: StateBackend) -> StateBackend:
+    """
+    Replaces the shared state backend.
+    """
+    global _state
+    _state = backend
+    return backend
+
+def get_state() -> StateBackend:
+    """
+    Returns the shared state backend, creating the one named by
+    STATE_BACKEND on first use.
+    """
+    if _state is None:
+        if STATE_BACKEND == 'redis':
+            logging.info('Using Redis state backend at %s', REDIS_URL)
+            configure_state(RedisState.from_url(REDIS_URL))
+        elif STATE_BACKEND == 'memory':
+            configure_state(MemoryState())
+        else:
+            raise ValueError(f'Unknown STATE_BACKEND {STATE_BACKEND!r}')
+    return _state
+
+async def close_state() -> None:
+    """
+    Closes the shared state backend, if one was created.
+    """
+    global _state
+    if _state is not None:
+        await _state.close()
+        _state = None
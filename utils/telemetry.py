@@ -0,0 +1,166 @@
+"""
+Command telemetry: every invocation is recorded in the command_requests
+table. Records are appended to a bounded in-memory queue and a
+background task writes them with executemany, so recording never waits
+on the database. When the queue is full new records are dropped and
+counted rather than queued.
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+
+from .db_connection import get_manager
+from .db_worker import db_write
+
+
+COMMAND_TELEMETRY = os.getenv('COMMAND_TELEMETRY', '1') == '1'
+TELEMETRY_QUEUE_SIZE = int(os.getenv('TELEMETRY_QUEUE_SIZE', '10000'))
+TELEMETRY_FLUSH_INTERVAL = float(os.getenv('TELEMETRY_FLUSH_INTERVAL', '5.0'))
+TELEMETRY_BATCH_SIZE = int(os.getenv('TELEMETRY_BATCH_SIZE', '500'))
+
+
+class CommandRecorder:
+    """
+    Bounded queue of command_requests rows waiting to be written.
+    Rows are (user_id, guild_id, command, cog, command_time, latency_ms, outcome).
+    """
+    def __init__(self, maxsize: int = TELEMETRY_QUEUE_SIZE):
+        self.maxsize = maxsize
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self._queue = deque()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def record(self, row: tuple) -> bool:
+        """
+        Queues a row. Returns False if it was dropped because the
+        queue is full.
+        """
+        if len(self._queue) >= self.maxsize:
+            self.dropped += 1
+            return False
+        self._queue.append(row)
+        self.recorded += 1
+        return True
+
+    def take(self, count: int) -> list:
+        """
+        Removes and returns up to `count` of the oldest rows.
+        """
+        queue = self._queue
+        return [queue.popleft() for _ in range(min(count, len(queue)))]
+
+    def stats(self) -> dict:
+        """
+        Returns queue size and recorded/dropped/written counters.
+        """
+        return {
+            'queued': len(self._queue),
+            'maxsize': self.maxsize,
+            'recorded': self.recorded,
+            'dropped': self.dropped,
+            'written': self.written,
+        }
+
+
+@db_write
+def _insert_command_requests(rows: list) -> None:
+    conn = get_manager().writer()
+
+    with conn:
+        conn.executemany('''INSERT INTO command_requests
+                         (user_id, guild_id, command, cog, command_time, latency_ms, outcome)
+                         VALUES (?, ?, ?, ?, ?, ?, ?)''', rows)
+
+
+_recorder = None
+_drain_task = None
+
+def get_command_recorder() -> CommandRecorder | None:
+    """
+    Returns the active recorder, or None when telemetry is off.
+    """
+    return _recorder
+
+def record_command(ctx, outcome: str) -> None:
+    """
+    Records one command invocation. `ctx.command_started`, set when the
+    command was invoked, gives the latency; commands rejected before
+    that are recorded without one. Never blocks.
+    """
+    if _recorder is None or ctx.command is None:
+        return
+
+    started = getattr(ctx, 'command_started', None)
+    latency_ms = (time.perf_counter() - started) * 1000 if started is not None else None
+    guild = getattr(ctx.author, 'guild', None)
+
+    _recorder.record((
+        ctx.author.id,
+        guild.id if guild is not None else None,
+        ctx.command.qualified_name,
+        ctx.command.cog_name,
+        int(time.time()),
+        latency_ms,
+        outcome
+    ))
+
+async def flush_command_requests(batch_size: int = TELEMETRY_BATCH_SIZE) -> int:
+    """
+    Writes every queued record in batches. Returns the number written.
+    Batches that fail to write are dropped, not retried.
+    """
+    if _recorder is None:
+        return 0
+
+    written = 0
+    while len(_recorder):
+        rows = _recorder.take(batch_size)
+        try:
+            await _insert_command_requests(rows)
+        except Exception as e:
+            _recorder.dropped += len(rows)
+            logging.error('Dropped %d command telemetry records: %s', len(rows), e)
+            continue
+        _recorder.written += len(rows)
+        written += len(rows)
+    return written
+
+async def _drain_periodically(interval: float) -> None:
+    dropped = 0
+    while True:
+        await asyncio.sleep(interval)
+        await flush_command_requests()
+        if _recorder.dropped != dropped:
+            logging.warning('Command telemetry queue full, %d records dropped so far', _recorder.dropped)
+            dropped = _recorder.dropped
+
+async def start_command_telemetry(interval: float = TELEMETRY_FLUSH_INTERVAL,
+                                  maxsize: int = TELEMETRY_QUEUE_SIZE) -> CommandRecorder:
+    """
+    Starts recording commands, with a background write every
+    `interval` seconds.
+    """
+    global _recorder, _drain_task
+    if _recorder is None:
+        _recorder = CommandRecorder(maxsize=maxsize)
+        _drain_task = asyncio.create_task(_drain_periodically(interval))
+        logging.info('Command telemetry enabled (interval %.1fs, max %d queued).', interval, maxsize)
+    return _recorder
+
+async def stop_command_telemetry() -> None:
+    """
+    Writes out queued records and stops recording.
+    """
+    global _recorder, _drain_task
+    if _drain_task is not None:
+        _drain_task.cancel()
+        _drain_task = None
+    if _recorder is not None:
+        await flush_command_requests()
+        _recorder = None
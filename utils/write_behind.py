@@ -0,0 +1,251 @@
+"""
+Optional write-behind buffering for battlepass column updates.
+When enabled, point, level and redemption time updates are coalesced
+per user in memory and written with executemany in one transaction,
+either on a short interval or once enough users are pending. Point
+awards are buffered as amounts to add, so they are applied on top of
+whatever balance the row holds when they are written.
+"""
+import os
+import asyncio
+import logging
+import threading
+import contextlib
+from collections import defaultdict
+
+from .db_connection import get_manager
+from .db_worker import db_write
+
+
+DB_WRITE_BEHIND = os.getenv('DB_WRITE_BEHIND', '0') == '1'
+DB_FLUSH_INTERVAL = float(os.getenv('DB_FLUSH_INTERVAL', '2.0'))
+DB_FLUSH_MAX_PENDING = int(os.getenv('DB_FLUSH_MAX_PENDING', '200'))
+
+
+class WriteBehindBuffer:
+    """
+    Pending battlepass updates keyed by user id. Each pending column
+    is either set to a value ('=') or has an amount added to it ('+'),
+    so point changes stay relative to the stored balance. Readers hold
+    `lock` while reading a row and overlaying pending values, and a
+    flush holds it until its batch is committed, so a row is never
+    seen with a change both written and still pending.
+    """
+    COLUMNS = ('points', 'level', 'redemption_time', 'daily_redemption')
+    SET = '='
+    ADD = '+'
+
+    def __init__(self, max_pending: int = DB_FLUSH_MAX_PENDING):
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.flushes = 0
+        self.rows_flushed = 0
+        self._pending = {}
+        # Guards _pending only, so staging never waits on a commit
+        self._stage_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @classmethod
+    def _merge(cls, columns: dict, column: str, op: str, value) -> None:
+        current = columns.get(column)
+        if op == cls.ADD and current is not None:
+            # Adding to a pending value keeps its operation
+            value = current[1] + value
+            op = current[0]
+        columns[column] = (op, value)
+
+    def _stage(self, user_id: int, column: str, op: str, value) -> bool:
+        if column not in self.COLUMNS:
+            raise ValueError(f'{column} cannot be buffered')
+        with self._stage_lock:
+            self._merge(self._pending.setdefault(user_id, {}), column, op, value)
+            return len(self._pending) >= self.max_pending
+
+    def stage(self, user_id: int, column: str, value) -> bool:
+        """
+        Records a column being set to `value`. Returns True once the
+        buffer is large enough that it should be flushed.
+        """
+        return self._stage(user_id, column, self.SET, value)
+
+    def stage_delta(self, user_id: int, column: str, amount: int) -> bool:
+        """
+        Records `amount` being added to a column, coalesced with any
+        other pending change to it.
+        """
+        return self._stage(user_id, column, self.ADD, amount)
+
+    def pending_for(self, user_id: int) -> dict:
+        """
+        Returns the unwritten changes for a user as column: (op, value).
+        Callers must hold `lock`.
+        """
+        with self._stage_lock:
+            return dict(self._pending.get(user_id, ()))
+
+    @classmethod
+    def apply(cls, values: dict, pending: dict) -> dict:
+        """
+        Returns `values` (column: value) with pending changes applied.
+        """
+        values = dict(values)
+        for column, (op, value) in pending.items():
+            values[column] = values[column] + value if op == cls.ADD else value
+        return values
+
+    def _restore(self, batch: dict) -> None:
+        # Put a failed batch back underneath anything staged since
+        with self._stage_lock:
+            for user_id, columns in batch.items():
+                for column, (op, value) in self._pending.get(user_id, {}).items():
+                    self._merge(columns, column, op, value)
+                self._pending[user_id] = columns
+
+    @staticmethod
+    def _write(conn, batch: dict) -> None:
+        # Users with the same kind of change to the same columns share one statement
+        groups = defaultdict(list)
+        for user_id, columns in batch.items():
+            shape = tuple(sorted((column, op) for column, (op, _) in columns.items()))
+            groups[shape].append(tuple(columns[column][1] for column, _ in shape) + (user_id,))
+
+        for shape, rows in groups.items():
+            assignments = ', '.join(f'{column} = {column} + ?' if op == WriteBehindBuffer.ADD else f'{column} = ?'
+                                    for column, op in shape)
+            conn.executemany(f'UPDATE battlepass SET {assignments} WHERE user_id = ?', rows)
+
+    def flush(self, conn) -> int:
+        """
+        Writes every pending update in one transaction.
+        Returns the number of users written.
+        """
+        with self.lock:
+            with self._stage_lock:
+                if not self._pending:
+                    return 0
+                batch = self._pending
+                self._pending = {}
+
+            try:
+                with conn:
+                    self._write(conn, batch)
+            except Exception:
+                self._restore(batch)
+                raise
+
+        self.flushes += 1
+        self.rows_flushed += len(batch)
+        return len(batch)
+
+    @contextlib.contextmanager
+    def claim(self, conn, user_id: int):
+        """
+        Writes one user's pending changes on `conn` without committing,
+        for a transaction that must read that row. The caller commits
+        inside the block; if the block raises, the changes go back into
+        the buffer. Other users' changes stay buffered.
+        """
+        with self.lock:
+            with self._stage_lock:
+                columns = self._pending.pop(user_id, None)
+            try:
+                if columns:
+                    self._write(conn, {user_id: columns})
+                yield
+            except BaseException:
+                if columns:
+                    self._restore({user_id: columns})
+                raise
+
+
+_buffer = None
+_flush_task = None
+_background_flushes = set()
+
+def get_write_behind() -> WriteBehindBuffer | None:
+    """
+    Returns the active buffer, or None when writes go straight to disk.
+    """
+    return _buffer
+
+@db_write
+def flush_write_behind() -> int:
+    """
+    Writes any buffered updates on the writer thread.
+    """
+    if _buffer is None:
+        return 0
+    return _buffer.flush(get_manager().writer())
+
+def claim_pending(conn, user_id: int):
+    """
+    Context manager for code already running on the writer thread: a
+    transaction that reads or changes a user's row first writes that
+    user's buffered changes on `conn`, and commits them with its own.
+    """
+    if _buffer is None:
+        return contextlib.nullcontext()
+    return _buffer.claim(conn, user_id)
+
+async def _flush_logged() -> None:
+    try:
+        await flush_write_behind()
+    except Exception as e:
+        logging.error('Write-behind flush failed, will retry: %s', e)
+
+async def _flush_periodically(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        await _flush_logged()
+
+async def start_write_behind(interval: float = DB_FLUSH_INTERVAL,
+                             max_pending: int = DB_FLUSH_MAX_PENDING) -> WriteBehindBuffer:
+    """
+    Turns on write-behind buffering with a background flush every
+    `interval` seconds.
+    """
+    global _buffer, _flush_task
+    if _buffer is None:
+        _buffer = WriteBehindBuffer(max_pending=max_pending)
+        _flush_task = asyncio.create_task(_flush_periodically(interval))
+        logging.info('Write-behind enabled (interval %.1fs, max %d users).', interval, max_pending)
+    return _buffer
+
+async def stop_write_behind() -> None:
+    """
+    Flushes everything still buffered and goes back to direct writes.
+    """
+    global _buffer, _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        _flush_task = None
+    if _buffer is not None:
+        await flush_write_behind()
+        _buffer = None
+
+def _staged(full: bool) -> bool:
+    if full and not _background_flushes:
+        task = asyncio.create_task(_flush_logged())
+        _background_flushes.add(task)
+        task.add_done_callback(_background_flushes.discard)
+    return True
+
+def stage_update(user_id: int, column: str, value) -> bool:
+    """
+    Stages a battlepass column update if write-behind is active.
+    Returns False when the caller should write it directly instead.
+    """
+    if _buffer is None:
+        return False
+    return _staged(_buffer.stage(user_id, column, value))
+
+def stage_delta(user_id: int, column: str, amount: int) -> bool:
+    """
+    Stages an amount to add to a battlepass column if write-behind is
+    active. Returns False when the caller should write it directly.
+    """
+    if _buffer is None:
+        return False
+    return _staged(_buffer.stage_delta(user_id, column, amount))
@@ -0,0 +1,81 @@
+"""
+Long-lived yt-dlp instances for media extraction. Creating a YoutubeDL
+loads every extractor and opens a new HTTP session, so instead each
+worker thread keeps one instance and reuses it for every job it runs.
+A YoutubeDL is not thread-safe, so an instance is never shared between
+threads.
+"""
+import threading
+
+
+class YoutubeDLPool:
+    """
+    One YoutubeDL per thread, created on first use and closed by
+    `close()`. Instances still running a job when the pool is closed
+    are closed as soon as that job finishes.
+    """
+    def __init__(self, options: dict):
+        self.options = dict(options)
+        self.created = 0
+        self.jobs = 0
+        self._local = threading.local()
+        self._instances = set()
+        self._busy = set()
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._instances)
+
+    def _acquire(self):
+        ydl = getattr(self._local, 'ydl', None)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('YoutubeDLPool is closed')
+            if ydl is None:
+                # Imported here so the bot starts without loading yt-dlp
+                import yt_dlp
+
+                ydl = self._local.ydl = yt_dlp.YoutubeDL(self.options)
+                self._instances.add(ydl)
+                self.created += 1
+            self._busy.add(ydl)
+            self.jobs += 1
+        return ydl
+
+    def _release(self, ydl) -> None:
+        with self._lock:
+            self._busy.discard(ydl)
+            if not self._closed:
+                return
+            self._instances.discard(ydl)
+        ydl.close()
+
+    def extract_info(self, query: str, **kwargs) -> dict:
+        """
+        Runs `extract_info` on this thread's instance. Blocking; call it
+        from a worker thread.
+        """
+        kwargs.setdefault('download', False)
+        ydl = self._acquire()
+        try:
+            return ydl.extract_info(query, **kwargs)
+        finally:
+            self._release(ydl)
+
+    def close(self) -> None:
+        """
+        Closes every idle instance and stops handing out new ones.
+        """
+        with self._lock:
+            self._closed = True
+            idle = self._instances - self._busy
+            self._instances -= idle
+        for ydl in idle:
+            ydl.close()
+
+    def stats(self) -> dict:
+        """
+        Returns the number of live instances, instances created and jobs run.
+        """
+        return {'instances': len(self._instances), 'created': self.created, 'jobs': self.jobs}